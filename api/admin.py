@@ -1,23 +1,37 @@
 from django.contrib import admin
 from .models import (
     Shop,
+    CatalogItem,
     FoodItems,
     ElectronicsItems,
     GroceryItems,
     Order,
     OrderItem,
     Payment,
-    UserProfile
+    UserProfile,
+    DailyShopSales,
+    DailyItemSales,
+    OutboundEmail,
+    PaystackEvent,
+    IdempotencyKey,
 )
 
 @admin.register(Shop)
 class ShopAdmin(admin.ModelAdmin):
-    list_display = ('name', 'is_active', 'created_at')
-    list_filter = ('is_active', 'created_at')
+    list_display = ('name', 'catalog_type', 'is_active', 'created_at')
+    list_filter = ('catalog_type', 'is_active', 'created_at')
     search_fields = ('name', 'description')
     readonly_fields = ('created_at', 'updated_at')
 
 
+@admin.register(CatalogItem)
+class CatalogItemAdmin(admin.ModelAdmin):
+    list_display = ('name', 'kind', 'shop', 'price', 'status', 'stock', 'created_at')
+    list_filter = ('kind', 'shop', 'status', 'created_at')
+    search_fields = ('name', 'extras', 'shop__name')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(FoodItems)
 class FoodItemsAdmin(admin.ModelAdmin):
     list_display = ('name', 'shop', 'price', 'status', 'created_at')
@@ -58,7 +72,8 @@ class OrderAdmin(admin.ModelAdmin):
 class OrderItemAdmin(admin.ModelAdmin):
     list_display  = ('order', 'get_item_name', 'get_item_type', 'quantity', 'price')
     list_filter = ('order__shop',)
-    search_fields = ('food_item__name', 'electronics_item__name', 'grocery_item__name', 'order__id')
+    search_fields = ('catalog_item__name', 'order__id')
+    list_select_related = ('order', 'catalog_item')
     
     def get_item_name(self, obj):
         """Display the name of the item regardless of type"""
@@ -67,12 +82,8 @@ class OrderItemAdmin(admin.ModelAdmin):
     
     def get_item_type(self, obj):
         """Display the type of item"""
-        if obj.food_item:
-            return 'Food'
-        elif obj.electronics_item:
-            return 'Electronics'
-        elif obj.grocery_item:
-            return 'Grocery'
+        if obj.catalog_item:
+            return obj.catalog_item.get_kind_display()
         return 'Unknown'
     get_item_type.short_description = 'Item Type'
 
@@ -83,6 +94,22 @@ class PaymentAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'order__id', 'paystack_reference')
 
 
+@admin.register(PaystackEvent)
+class PaystackEventAdmin(admin.ModelAdmin):
+    list_display = ('event_id', 'event', 'reference', 'received_at')
+    list_filter = ('event', 'received_at')
+    search_fields = ('event_id', 'reference')
+    readonly_fields = ('received_at',)
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ('key', 'endpoint', 'user', 'response_status', 'created_at', 'expires_at')
+    list_filter = ('endpoint', 'response_status')
+    search_fields = ('key', 'user__username')
+    readonly_fields = ('created_at',)
+
+
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
     list_display = ('user', 'role', 'shop', 'phone_number', 'hostel_or_office_name', 'room_or_office_number')
@@ -90,5 +117,26 @@ class UserProfileAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'user__email', 'hostel_or_office_name', 'shop__name')
 
 
+@admin.register(DailyShopSales)
+class DailyShopSalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'shop', 'order_count', 'total_sales')
+    list_filter = ('shop', 'date')
+
+
+@admin.register(DailyItemSales)
+class DailyItemSalesAdmin(admin.ModelAdmin):
+    list_display = ('date', 'shop', 'item_type', 'name', 'quantity', 'revenue')
+    list_filter = ('shop', 'item_type', 'date')
+    search_fields = ('name',)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'to')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+
 # —–– or, equivalently —––—
 # admin.site.register(FoodItems, FoodItemsAdmin)
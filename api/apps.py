@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def _ensure_search_indexes(sender, using, **kwargs):
+    from .search import ensure_postgres_indexes
+    ensure_postgres_indexes(using)
 
 
 class ApiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "api"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        post_migrate.connect(_ensure_search_indexes, sender=self)
@@ -0,0 +1,144 @@
+"""
+Request principal: who is calling, as (user id, role, shop id).
+
+PrincipalJWTAuthentication resolves it once per request and permission
+classes and view scoping read it through get_principal(request), so a staff
+request no longer goes back to UserProfile for every check.
+
+By default the principal costs one profile lookup per request, so a role
+or shop change applies to the very next request. With PRINCIPAL_TOKEN_CLAIMS
+on, tokens issued by /api/token/ carry `role` and `shop_id` claims and the
+principal costs no query at all; claims are refreshed from the profile
+whenever the access token is refreshed, so a demoted user keeps their old
+access for up to ACCESS_TOKEN_LIFETIME. Tokens without the claims fall back
+to the profile lookup.
+"""
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import UserProfile
+
+ROLE_CLAIM = 'role'
+SHOP_CLAIM = 'shop_id'
+
+STAFF_ROLES = frozenset({
+    UserProfile.ROLE_SUPER_ADMIN,
+    UserProfile.ROLE_SHOP_MANAGER,
+    UserProfile.ROLE_EMPLOYEE,
+    UserProfile.ROLE_COOK,
+})
+
+
+class Principal:
+    """The caller's user id, role and shop; role and shop are None without a profile."""
+
+    __slots__ = ('user_id', 'role', 'shop_id')
+
+    def __init__(self, user_id, role=None, shop_id=None):
+        self.user_id = user_id
+        self.role = role
+        self.shop_id = shop_id
+
+    def __repr__(self):
+        return f"Principal(user_id={self.user_id!r}, role={self.role!r}, shop_id={self.shop_id!r})"
+
+    @classmethod
+    def for_user(cls, user):
+        if user is None or not user.is_authenticated:
+            return ANONYMOUS
+        profile = getattr(user, 'userprofile', None)
+        if profile is None:
+            return cls(user.pk)
+        return cls(user.pk, profile.role, profile.shop_id)
+
+    @property
+    def is_authenticated(self):
+        return self.user_id is not None
+
+    @property
+    def is_super_admin(self):
+        return self.role == UserProfile.ROLE_SUPER_ADMIN
+
+    @property
+    def is_shop_manager(self):
+        return self.role == UserProfile.ROLE_SHOP_MANAGER
+
+    @property
+    def is_staff(self):
+        return self.role in STAFF_ROLES
+
+    @property
+    def managed_shop_id(self):
+        """The shop a shop manager is restricted to, or None."""
+        return self.shop_id if self.is_shop_manager else None
+
+
+ANONYMOUS = Principal(None)
+
+
+def _http_request(request):
+    # DRF's Request wraps the HttpRequest that plain Django views receive
+    return getattr(request, '_request', request)
+
+
+def set_principal(request, principal):
+    _http_request(request).principal = principal
+
+
+def get_principal(request):
+    """The request's principal, resolved from request.user if no authentication hook set it."""
+    http_request = _http_request(request)
+    principal = getattr(http_request, 'principal', None)
+    if principal is None:
+        principal = http_request.principal = Principal.for_user(getattr(request, 'user', None))
+    return principal
+
+
+def claims_enabled():
+    return getattr(settings, 'PRINCIPAL_TOKEN_CLAIMS', False)
+
+
+def add_claims(token, principal):
+    token[ROLE_CLAIM] = principal.role
+    token[SHOP_CLAIM] = principal.shop_id
+    return token
+
+
+class PrincipalJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that also resolves the request's Principal."""
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is not None:
+            set_principal(request, self.get_principal(*result))
+        return result
+
+    def get_principal(self, user, token):
+        if claims_enabled() and ROLE_CLAIM in token:
+            return Principal(user.pk, token[ROLE_CLAIM], token.get(SHOP_CLAIM))
+        return Principal.for_user(user)
+
+
+class PrincipalTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        return add_claims(token, Principal.for_user(user)) if claims_enabled() else token
+
+
+class PrincipalTokenRefreshSerializer(TokenRefreshSerializer):
+    """Re-reads role and shop on refresh, so claims are never older than one access token."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if claims_enabled():
+            access = AccessToken(data['access'], verify=False)
+            profile = UserProfile.objects.filter(user_id=access[jwt_settings.USER_ID_CLAIM]).first()
+            principal = Principal(access[jwt_settings.USER_ID_CLAIM], *(
+                (profile.role, profile.shop_id) if profile else (None, None)
+            ))
+            data['access'] = str(add_claims(access, principal))
+        return data
@@ -0,0 +1,96 @@
+"""
+Versioned cache for the public catalog served by FoodListView.
+
+Every catalog scope (a single shop, or the default "all food items" listing)
+has a version token stored in the cache.  Rendered responses are cached under
+a key that includes that token, so invalidating a scope is a single write:
+bumping the version makes every older payload unreachable and it simply ages
+out of the cache.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+ALL_SCOPE = 'all'
+
+_VERSION_KEY = 'catalog:version:{scope}'
+_PAYLOAD_KEY = 'catalog:payload:{scope}:{version}'
+
+
+def _timeout():
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60 * 60)
+
+
+def _new_version():
+    # Random tokens rather than counters, so an evicted version key can never
+    # be re-initialised to a value that still has a stale payload behind it.
+    return uuid.uuid4().hex
+
+
+def scope_for_shop(shop_id):
+    """Return the cache scope for a ?shop_id= value, or None if it isn't cacheable."""
+    if shop_id is None or shop_id == '':
+        return ALL_SCOPE
+    shop_id = str(shop_id)
+    if not shop_id.isdigit():
+        return None
+    return f'shop:{int(shop_id)}'
+
+
+def get_version(scope):
+    key = _VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _new_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump(*scopes):
+    """Invalidate the given scopes immediately."""
+    cache.set_many({_VERSION_KEY.format(scope=scope): _new_version() for scope in scopes}, None)
+
+
+def invalidate_shop(shop_id):
+    """
+    Invalidate a shop's catalog and the default listing once the current
+    transaction commits, so a concurrent request can't re-cache the old rows
+    under the new version.
+    """
+    scopes = [ALL_SCOPE]
+    if shop_id is not None:
+        scopes.append(scope_for_shop(shop_id))
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def make_etag(body):
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def get_payload(scope, version):
+    """Return the cached ``(etag, body)`` pair for a scope/version, or None."""
+    return cache.get(_PAYLOAD_KEY.format(scope=scope, version=version))
+
+
+def set_payload(scope, version, body):
+    etag = make_etag(body)
+    cache.set(_PAYLOAD_KEY.format(scope=scope, version=version), (etag, body), _timeout())
+    return etag
+
+
+def etag_matches(if_none_match, etag):
+    """Evaluate an If-None-Match header against a strong ETag (weak comparison)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
@@ -0,0 +1,195 @@
+"""
+Bulk catalog import and export for shop managers and super admins.
+
+An upload is a CSV file or NDJSON stream with the columns of the export, so
+an exported catalog can be edited and sent back. Rows with an `id` update
+that item; rows without one create a new item.
+
+Stock is live: orders take units between an export and its re-import. So
+`stock` only sets the stock of new items, and an optional `restock` column
+adds units to existing ones in a single UPDATE (api.inventory.release), the
+same way returned units go back. `status` is exported as whether the shop
+lists the item, counting items that are only off because they sold out, and
+availability is then derived from stock as on every save
+(CatalogItem.sync_availability).
+
+Rows are read CHUNK_SIZE at a
+time, and each chunk is validated and then written with one bulk_create and
+one bulk_update in its own transaction. A chunk with any invalid row is
+skipped whole, and the response lists the offending lines. Reading stops at
+the first line that isn't valid CSV/NDJSON at all.
+
+Shop managers can only import and export the items of their own shop.
+"""
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
+from rest_framework import serializers
+
+from . import catalog_cache, inventory, search
+from .models import Shop
+from .tabular import TabularError
+
+CHUNK_SIZE = 500
+
+# rows a single export query fetches from the database at a time
+EXPORT_CHUNK_SIZE = 2000
+
+# the response lists at most this many invalid rows
+MAX_ERRORS = 100
+
+_NOT_COLUMNS = ('shop', 'created_at')
+
+
+def columns(serializer_class):
+    """Export/import columns for an item type, in its serializer's field order."""
+    return [name for name in serializer_class.Meta.fields if name not in _NOT_COLUMNS]
+
+
+def _row_serializer(serializer_class):
+    # the plain shop_id column instead of a per-row lookup of the shop;
+    # shops are checked once per chunk instead
+    class RowSerializer(serializer_class):
+        id = serializers.IntegerField(required=False, allow_null=True)
+        shop_id = serializers.IntegerField(required=False, allow_null=True)
+        restock = serializers.IntegerField(required=False, allow_null=True, min_value=1)
+
+        class Meta(serializer_class.Meta):
+            fields = columns(serializer_class) + ['restock']
+
+    return RowSerializer
+
+
+def scoped_items(model, principal, shop_id=None):
+    """Items of `model` a caller may bulk edit, optionally for a single ?shop_id=."""
+    queryset = model.objects.all()
+    if principal.managed_shop_id:
+        queryset = queryset.filter(shop_id=principal.managed_shop_id)
+    if shop_id:
+        try:
+            queryset = queryset.filter(shop_id=int(shop_id))
+        except (TypeError, ValueError):
+            queryset = queryset.none()
+    return queryset
+
+
+def export_rows(model, serializer_class, principal, shop_id=None):
+    """Column tuples for every item in scope, read from a server-side cursor."""
+    # sold-out items are still listed by the shop; re-importing the file must not switch them off for good
+    listed = ExpressionWrapper(Q(status=True) | Q(sold_out=True), output_field=BooleanField())
+    return (scoped_items(model, principal, shop_id)
+            .annotate(listed=listed)
+            .order_by('pk')
+            .values_list(*['listed' if name == 'status' else name for name in columns(serializer_class)])
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.errors = []
+
+    def add_errors(self, errors):
+        self.errors.extend(errors[:MAX_ERRORS - len(self.errors)])
+
+    def as_dict(self):
+        return {'created': self.created, 'updated': self.updated, 'skipped': self.skipped, 'errors': self.errors}
+
+
+def import_rows(model, serializer_class, principal, rows, chunk_size=CHUNK_SIZE):
+    """Apply (line number, row dict) pairs chunk by chunk; returns an ImportResult."""
+    row_serializer = _row_serializer(serializer_class)
+    result = ImportResult()
+    rows = iter(rows)
+    while True:
+        try:
+            chunk = list(islice(rows, chunk_size))
+        except TabularError as exc:
+            # chunks before the unreadable part stay applied
+            result.add_errors([{'line': None, 'errors': f"Could not read the upload: {exc}"}])
+            return result
+        if not chunk:
+            return result
+        _import_chunk(model, row_serializer, principal, chunk, result)
+
+
+def _import_chunk(model, row_serializer, principal, chunk, result):
+    line_numbers = [number for number, _ in chunk]
+    serializer = row_serializer(data=[row for _, row in chunk], many=True)
+    if not serializer.is_valid():
+        result.skipped += len(chunk)
+        result.add_errors([{'line': number, 'errors': errors}
+                           for number, errors in zip(line_numbers, serializer.errors) if errors])
+        return
+
+    rows = serializer.validated_data
+    errors = {}
+    managed_shop_id = principal.managed_shop_id
+    for index, row in enumerate(rows):
+        if managed_shop_id:
+            if row.get('shop_id') is None:
+                row['shop_id'] = managed_shop_id
+            if row['shop_id'] != managed_shop_id:
+                errors[index] = {'shop_id': ["You can only import items for your own shop."]}
+    shop_ids = {row.get('shop_id') for row in rows} - {None}
+    active_shop_ids = set(Shop.objects.filter(pk__in=shop_ids, is_active=True).values_list('pk', flat=True))
+    item_ids = {row['id'] for row in rows if row.get('id') is not None}
+    existing = scoped_items(model, principal).in_bulk(item_ids) if item_ids else {}
+    for index, row in enumerate(rows):
+        if index in errors:
+            continue
+        if row.get('shop_id') is not None and row['shop_id'] not in active_shop_ids:
+            errors[index] = {'shop_id': [f"No active shop with id {row['shop_id']}."]}
+        elif row.get('id') is not None and row['id'] not in existing:
+            errors[index] = {'id': [f"No item with id {row['id']} to update."]}
+        elif row.get('restock') and row.get('id') is not None and existing[row['id']].stock is None:
+            errors[index] = {'restock': ["This item's stock isn't tracked."]}
+    if errors:
+        result.skipped += len(chunk)
+        result.add_errors([{'line': line_numbers[index], 'errors': errors[index]} for index in sorted(errors)])
+        return
+
+    fields = [name for name in row_serializer.Meta.fields if name not in ('id', 'restock')]
+    # the uploaded stock of an existing item is as old as the export
+    update_fields = [name for name in fields if name != 'stock'] + ['sold_out']
+    new_items, changed_items, restocks, touched_shops = [], [], {}, set()
+    for row in rows:
+        # columns left out of an NDJSON row keep their default (or current) value
+        values = {name: value for name, value in row.items() if name in fields}
+        item = existing.get(row.get('id'))
+        if item is None:
+            if row.get('restock'):
+                values['stock'] = (values.get('stock') or 0) + row['restock']
+            item = model(**values)
+            new_items.append(item)
+        else:
+            touched_shops.add(item.shop_id)
+            values.pop('stock', None)
+            for name, value in values.items():
+                setattr(item, name, value)
+            changed_items.append(item)
+            if row.get('restock'):
+                restocks[item.pk] = row['restock']
+        # bulk writes skip save(), which keeps status in line with stock
+        item.sync_availability()
+        touched_shops.add(values.get('shop_id'))
+
+    with transaction.atomic():
+        created = model.objects.bulk_create(new_items)
+        model.objects.bulk_update(changed_items, update_fields)
+        # added to the live count, re-enabling items that had sold out
+        inventory.release(restocks)
+        # bulk writes skip the model signals that keep the catalog cache and
+        # the search index current
+        for shop_id in touched_shops:
+            catalog_cache.invalidate_shop(shop_id)
+        if any(item.pk is None for item in created):
+            transaction.on_commit(search.invalidate)
+        else:
+            search.refresh_items([item.pk for item in created + changed_items])
+    result.created += len(new_items)
+    result.updated += len(changed_items)
+
@@ -0,0 +1,75 @@
+"""
+Compact order lists (GET ...?view=compact), built from values() rows.
+
+Instead of a nested item and shop serializer per line, each line carries its
+item's kind and id, and every shop on the page is listed once in a top-level
+`shops` map keyed by id:
+
+    {"next": ..., "previous": ..., "results": [
+        {"id": 7, "status": "RECEIVED", "shop_id": 1, "customer": {...}, "order_items": [
+            {"kind": "food", "item_id": 3, "item_name": "Waakye", "quantity": 2, "price": "30.00", ...}]}],
+     "shops": {"1": {"id": 1, "name": "Cassa Bella Cuisine", ...}}}
+"""
+from rest_framework import serializers
+
+from .models import OrderItem, Shop
+from .serializers import CustomerResolver, ShopListSerializer
+
+ORDER_FIELDS = ('id', 'created_at', 'total_price', 'status', 'user_id', 'shop_id')
+LINE_FIELDS = {
+    'order_id': 'order_id',
+    'kind': 'catalog_item__kind',
+    'item_id': 'catalog_item_id',
+    'item_name': 'catalog_item__name',
+    'image': 'catalog_item__image',
+    'shop_id': 'catalog_item__shop_id',
+    'quantity': 'quantity',
+    'price': 'price',
+}
+SHOP_FIELDS = ShopListSerializer.Meta.fields
+
+# reused to format values() rows exactly as the full serializers do
+_datetime = serializers.DateTimeField()
+_decimal = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def requested(request):
+    return request.query_params.get('view') == 'compact'
+
+
+def order_rows(queryset):
+    """`queryset` as plain dict rows (the nested prefetches are not needed)."""
+    return queryset.prefetch_related(None).values(*ORDER_FIELDS)
+
+
+def serialize(rows, context):
+    """Return (orders, shops) for a page of order_rows(); two queries plus the customers."""
+    orders = list(rows)
+    lines_by_order = {row['id']: [] for row in orders}
+    line_rows = OrderItem.objects.filter(order_id__in=lines_by_order).order_by('pk').values_list(*LINE_FIELDS.values())
+    shop_ids = {row['shop_id'] for row in orders}
+    for values in line_rows:
+        line = dict(zip(LINE_FIELDS, values))
+        line['price'] = _decimal.to_representation(line['price'])
+        lines_by_order[line.pop('order_id')].append(line)
+        shop_ids.add(line['shop_id'])
+    shop_ids.discard(None)
+
+    customers = CustomerResolver.for_context(context)
+    customers.load_users(row['user_id'] for row in orders)
+    results = [
+        {
+            'id': row['id'],
+            'created_at': _datetime.to_representation(row['created_at']),
+            'total_price': _decimal.to_representation(row['total_price']),
+            'status': row['status'],
+            'customer': customers.customer_for(row['user_id']),
+            'shop_id': row['shop_id'],
+            'order_items': lines_by_order[row['id']],
+        }
+        for row in orders
+    ]
+    shops = {
+        str(shop['id']): shop for shop in Shop.objects.filter(pk__in=shop_ids).values(*SHOP_FIELDS)
+    } if shop_ids else {}
+    return results, shops
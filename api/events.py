@@ -0,0 +1,209 @@
+"""
+Publish/subscribe for pushing order changes to streaming (SSE) clients.
+
+Publishers are ordinary sync code (views, signal handlers); subscribers are
+async stream views running on the ASGI event loop. The backend is chosen
+with the ORDER_EVENTS_BACKEND setting. The default InProcessBackend only
+reaches subscribers in the same process. DatabaseBackend, for deployments
+with several worker processes, writes each event to the OrderEvent table and
+has one thread per process poll it for the subscribers of that process.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class Subscription:
+    """
+    A subscriber's queue, bound to the event loop that created it.
+    put() may be called from any thread.
+    """
+
+    def __init__(self, backend, channel, maxsize=100):
+        self.backend = backend
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def put(self, message):
+        self.loop.call_soon_threadsafe(self._put_nowait, message)
+
+    def _put_nowait(self, message):
+        if self.queue.full():
+            # a slow consumer loses its oldest events rather than blocking publishers
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Next message, or asyncio.TimeoutError after `timeout` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+    def close(self):
+        self.backend.unsubscribe(self)
+
+
+class InProcessBackend:
+    def __init__(self):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def has_subscribers(self, channels):
+        with self._lock:
+            return any(channel in self._subscribers for channel in channels)
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put(message)
+            except RuntimeError:
+                # the subscriber's event loop has already shut down
+                self.unsubscribe(subscription)
+
+
+class DatabaseBackend(InProcessBackend):
+    """
+    Events reach subscribers in every process sharing the database, up to
+    ORDER_EVENTS_POLL_SECONDS late. A process starts polling (one indexed
+    query per interval) when it gets its first subscriber. Subscribers may
+    miss events published while that first poll is being set up; the order
+    stream's keepalive re-read catches those up. Both publishing and polling
+    delete rows older than ORDER_EVENTS_RETENTION_SECONDS, at most once per
+    retention period per process, so the table stays small with no listeners.
+    """
+
+    def __init__(self, poll=True):
+        super().__init__()
+        self.poll_interval = getattr(settings, 'ORDER_EVENTS_POLL_SECONDS', 1.0)
+        self.retention = getattr(settings, 'ORDER_EVENTS_RETENTION_SECONDS', 5 * 60)
+        self.last_id = None
+        self._autostart = poll
+        self._poller = None
+        self._next_purge = 0.0
+
+    def subscribe(self, channel):
+        # called on the event loop, so no queries here
+        subscription = super().subscribe(channel)
+        if self._autostart and self._poller is None:
+            with self._lock:
+                if self._poller is None:
+                    self._poller = threading.Thread(target=self._run, name='order-events-poller', daemon=True)
+                    self._poller.start()
+        return subscription
+
+    def has_subscribers(self, channels):
+        # subscribers may be connected to any process
+        return True
+
+    def publish(self, channel, message):
+        from .models import OrderEvent
+        OrderEvent.objects.create(channel=channel, payload=message)
+        self._purge_if_due()
+
+    def poll(self):
+        """Hand events published since the last poll to this process's subscribers."""
+        from .models import OrderEvent
+        if self.last_id is None:
+            # start from now; earlier events are already reflected in what subscribers read
+            self.last_id = OrderEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            return
+        rows = OrderEvent.objects.filter(pk__gt=self.last_id).order_by('pk').values_list('pk', 'channel', 'payload')
+        for pk, channel, payload in rows:
+            self.last_id = pk
+            super().publish(channel, payload)
+        self._purge_if_due()
+
+    def purge(self):
+        """Delete events older than the retention period; returns how many."""
+        from .models import OrderEvent
+        cutoff = timezone.now() - timedelta(seconds=self.retention)
+        return OrderEvent.objects.filter(created_at__lt=cutoff).delete()[0]
+
+    def _purge_if_due(self):
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.retention
+        self.purge()
+
+    def _run(self):
+        while True:
+            try:
+                self.poll()
+            except DatabaseError:
+                logger.exception("Polling order events failed")
+                close_old_connections()
+            time.sleep(self.poll_interval)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                path = getattr(settings, 'ORDER_EVENTS_BACKEND', 'api.events.InProcessBackend')
+                _backend = import_string(path)()
+    return _backend
+
+
+def order_channel(order_id):
+    return f"order:{order_id}"
+
+
+def subscribe(channel):
+    return get_backend().subscribe(channel)
+
+
+def has_subscribers(*channels):
+    """
+    Whether anyone is listening on any of `channels`. Backends that cannot
+    tell (e.g. a shared broker) may leave this out and are assumed to have
+    listeners.
+    """
+    backend = get_backend()
+    if not hasattr(backend, 'has_subscribers'):
+        return True
+    return backend.has_subscribers(channels)
+
+
+def publish(channel, message):
+    get_backend().publish(channel, message)
+
+
+def publish_on_commit(channel, message):
+    """Publish once the current transaction commits, so subscribers never see rolled-back state."""
+    transaction.on_commit(lambda: publish(channel, message))
+
+
+def publish_order_status(order):
+    publish_on_commit(order_channel(order.pk), {"id": order.pk, "status": order.status})
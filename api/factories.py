@@ -0,0 +1,188 @@
+"""
+Synthetic data at configurable scale, for benchmarks and load tests.
+
+    dataset = build_dataset(items_per_shop=1000, orders=100_000)
+
+Rows are written with bulk_create, so model signals (catalog cache, sales
+rollups, order feed) do not fire; build_dataset rebuilds the sales rollups
+itself once everything is in place.
+"""
+import random
+import uuid
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from io import StringIO
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+
+from .models import CatalogItem, Order, OrderItem, Payment, Shop, UserProfile
+
+# every synthetic user has this password
+PASSWORD = 'Bench-Pass-123!'
+
+SHOP_TYPES = [Shop.CATALOG_FOOD, Shop.CATALOG_ELECTRONICS, Shop.CATALOG_GROCERY]
+
+# item names are built from these, so text search sees a realistic spread of words
+NAME_WORDS = {
+    Shop.CATALOG_FOOD: (['Spicy', 'Grilled', 'Fried', 'Smoky', 'Classic', 'Jumbo', 'Mini', 'Veggie'],
+                        ['Jollof', 'Waakye', 'Banku', 'Kenkey', 'Fufu', 'Kelewele', 'Chicken', 'Tilapia',
+                         'Noodles', 'Burger', 'Shawarma', 'Pizza', 'Plantain', 'Yam', 'Rice', 'Beans']),
+    Shop.CATALOG_ELECTRONICS: (['USB', 'Wireless', 'Portable', 'Fast', 'Mini', 'Smart', 'Gaming', 'Solar'],
+                               ['Charger', 'Cable', 'Earbuds', 'Speaker', 'Mouse', 'Keyboard', 'Adapter',
+                                'Power Bank', 'Headphones', 'Lamp', 'Extension', 'Router', 'Fan', 'Webcam']),
+    Shop.CATALOG_GROCERY: (['Fresh', 'Organic', 'Local', 'Family', 'Sweet', 'Low Fat', 'Whole', 'Spiced'],
+                           ['Milk', 'Bread', 'Eggs', 'Sugar', 'Tea', 'Coffee', 'Biscuits', 'Cereal', 'Juice',
+                            'Water', 'Soap', 'Tomatoes', 'Onions', 'Oats', 'Peanut Butter', 'Sardines']),
+}
+
+# share of orders in each status; older orders are mostly delivered
+STATUS_WEIGHTS = [
+    (Order.STATUS_RECEIVED, 1),
+    (Order.STATUS_PREPARING, 1),
+    (Order.STATUS_OUT_FOR_DELIVERY, 1),
+    (Order.STATUS_DELIVERED, 7),
+]
+
+
+class Dataset:
+    """The rows benchmark scenarios refer to, by role."""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def make_shops(count):
+    shops = [
+        Shop(name=f"Bench Shop {i + 1}", description="Synthetic shop", catalog_type=SHOP_TYPES[i % len(SHOP_TYPES)])
+        for i in range(count)
+    ]
+    return Shop.objects.bulk_create(shops)
+
+
+def make_users(count, role, prefix, shop=None, is_active=True):
+    """Create `count` users with profiles; all share PASSWORD (hashed once)."""
+    password = make_password(PASSWORD)
+    users = User.objects.bulk_create([
+        User(username=f"{prefix}{i + 1}", email=f"{prefix}{i + 1}@example.com", password=password,
+             first_name=prefix.title(), last_name=str(i + 1), is_active=is_active)
+        for i in range(count)
+    ])
+    UserProfile.objects.bulk_create([
+        UserProfile(user=user, phone_number='0200000000', hostel_or_office_name='Bench Hall',
+                    room_or_office_number=str(user.pk), role=role, shop=shop)
+        for user in users
+    ])
+    return users
+
+
+def make_items(shops, per_shop, rng):
+    """Create `per_shop` catalog items of each shop's catalog type; returns {shop_id: [item, ...]}."""
+    items = []
+    for shop in shops:
+        adjectives, nouns = NAME_WORDS[shop.catalog_type]
+        items += [
+            CatalogItem(shop=shop, kind=shop.catalog_type,
+                        name=f"{rng.choice(adjectives)} {rng.choice(nouns)} {i + 1}",
+                        extras=f"With {rng.choice(nouns).lower()}" if rng.random() < 0.3 else None,
+                        price=round(rng.uniform(1, 200), 2), image=f"https://example.com/{shop.pk}/{i + 1}.jpg",
+                        status=rng.random() < 0.9)
+            for i in range(per_shop)
+        ]
+    by_shop = {}
+    for item in CatalogItem.objects.bulk_create(items, batch_size=1000):
+        by_shop.setdefault(item.shop_id, []).append(item)
+    return by_shop
+
+
+def make_orders(students, shops, items_by_shop, count, rng, days=30, batch_size=500):
+    """
+    Create `count` orders spread evenly over the last `days` days, each with
+    one to three lines and a payment (successful unless still pending).
+    """
+    statuses = [status for status, _ in STATUS_WEIGHTS]
+    weights = [weight for _, weight in STATUS_WEIGHTS]
+    shops = [shop for shop in shops if items_by_shop.get(shop.pk)]
+    now = timezone.now()
+    created = 0
+    for day in range(days):
+        day_count = count // days + (1 if day < count % days else 0)
+        for start in range(0, day_count, batch_size):
+            size = min(batch_size, day_count - start)
+            created_at = now - timedelta(days=days - 1 - day, minutes=rng.randint(0, 600))
+            _make_order_batch(students, shops, items_by_shop, size, rng, statuses, weights, created_at)
+            created += size
+    return created
+
+
+def _make_order_batch(students, shops, items_by_shop, size, rng, statuses, weights, created_at):
+    orders, lines_per_order = [], []
+    for _ in range(size):
+        shop = rng.choice(shops)
+        lines = []
+        for item in rng.sample(items_by_shop[shop.pk], min(rng.randint(1, 3), len(items_by_shop[shop.pk]))):
+            quantity = rng.randint(1, 3)
+            price = (Decimal(str(item.price)) * quantity).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            lines.append(OrderItem(catalog_item=item, quantity=quantity, price=price))
+        total = sum(line.price for line in lines)
+        total += Decimal('0.00') if total > Decimal('150.00') else Decimal('5.00')
+        orders.append(Order(user=rng.choice(students), shop=shop, total_price=total,
+                            status=rng.choices(statuses, weights)[0]))
+        lines_per_order.append(lines)
+
+    orders = Order.objects.bulk_create(orders)
+    # created_at is auto_now_add, so backdate the batch afterwards
+    Order.objects.filter(pk__in=[order.pk for order in orders]).update(created_at=created_at)
+
+    items, payments = [], []
+    for order, lines in zip(orders, lines_per_order):
+        for line in lines:
+            line.order = order
+            items.append(line)
+        paid = order.status != Order.STATUS_RECEIVED or rng.random() < 0.5
+        payments.append(Payment(user=order.user, order=order, amount=order.total_price, payment_method='momo',
+                                status='success' if paid else 'pending', paystack_reference=uuid.uuid4().hex))
+    OrderItem.objects.bulk_create(items)
+    Payment.objects.bulk_create(payments)
+
+
+def build_dataset(shops=3, items_per_shop=1000, orders=10_000, students=200, days=30, seed=0):
+    """Populate the current database and return a Dataset of handles into it."""
+    rng = random.Random(seed)
+    shop_rows = make_shops(shops)
+    items_by_shop = make_items(shop_rows, items_per_shop, rng)
+    student_rows = make_users(students, UserProfile.ROLE_STUDENT, 'student')
+    make_orders(student_rows, shop_rows, items_by_shop, orders, rng, days=days)
+    call_command('backfill_daily_sales', stdout=StringIO())
+
+    managers = {}
+    for shop in shop_rows:
+        if shop.catalog_type not in managers:
+            managers[shop.catalog_type] = make_users(1, UserProfile.ROLE_SHOP_MANAGER,
+                                                     f'manager_{shop.catalog_type}_', shop=shop)[0]
+    student = student_rows[0]
+    food_shop = next(shop for shop in shop_rows if shop.catalog_type == Shop.CATALOG_FOOD)
+
+    # one open order and one paid payment that the student scenarios can use
+    open_order = Order.objects.create(user=student, shop=food_shop, total_price=Decimal('45.00'))
+    OrderItem.objects.create(order=open_order, catalog_item=items_by_shop[food_shop.pk][0], quantity=1,
+                             price=Decimal('40.00'))
+    paid = Payment.objects.create(user=student, order=open_order, amount=open_order.total_price,
+                                  payment_method='momo', status='success', paystack_reference=uuid.uuid4().hex)
+
+    return Dataset(
+        shops=shop_rows,
+        shop_by_type={shop.catalog_type: shop for shop in reversed(shop_rows)},
+        items_by_shop=items_by_shop,
+        students=student_rows,
+        student=student,
+        managers=managers,
+        super_admin=make_users(1, UserProfile.ROLE_SUPER_ADMIN, 'admin')[0],
+        cook=make_users(1, UserProfile.ROLE_COOK, 'cook')[0],
+        unverified=make_users(1, UserProfile.ROLE_STUDENT, 'unverified', is_active=False)[0],
+        open_order=open_order,
+        paid_payment=paid,
+        days=days,
+    )
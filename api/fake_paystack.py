@@ -0,0 +1,138 @@
+"""
+A local stand-in for the Paystack API, for tests and load testing.
+
+    with FakePaystack(latency=0.05) as paystack:
+        with override_settings(PAYSTACK_BASE_URL=paystack.url):
+            ...
+
+It serves POST /transaction/initialize and GET /transaction/verify/<ref> on
+127.0.0.1 over keep-alive HTTP/1.1, and can inject latency and failures.
+"""
+import json
+import sys
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # clients that time out or hang up mid-response are expected here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class FakePaystack:
+    def __init__(self, latency=0.0, verify_status='success', port=0):
+        self.latency = latency
+        self.port = port
+        self.verify_status = verify_status
+        self.transactions = {}
+        self.requests = []
+        self.connections = 0
+        self._failures = []
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self.url = None
+
+    def fail_next(self, count=1, status=500):
+        """Answer the next `count` requests with an HTTP `status` error."""
+        with self._lock:
+            self._failures.extend([status] * count)
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = json.loads(self.rfile.read(length) or b'{}')
+                self._handle('POST', body)
+
+            def do_GET(self):
+                self._handle('GET', None)
+
+            def _handle(self, method, body):
+                status, payload = fake.respond(method, self.path, body)
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self._server = _Server(('127.0.0.1', self.port), Handler)
+        host, port = self._server.server_address[:2]
+        self.url = f"http://{host}:{port}"
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def respond(self, method, path, body):
+        with self._lock:
+            self.requests.append((method, path))
+            failure = self._failures.pop(0) if self._failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure is not None:
+            return failure, {"status": False, "message": "Simulated Paystack failure"}
+
+        if method == 'POST' and path == '/transaction/initialize':
+            reference = uuid.uuid4().hex[:16]
+            with self._lock:
+                transaction_id = len(self.transactions) + 1
+                self.transactions[reference] = dict(body, id=transaction_id, reference=reference)
+            return 200, {
+                "status": True,
+                "message": "Authorization URL created",
+                "data": {
+                    "authorization_url": f"{self.url}/checkout/{reference}",
+                    "access_code": reference,
+                    "reference": reference,
+                },
+            }
+
+        if method == 'GET' and path.startswith('/transaction/verify/'):
+            reference = path.rsplit('/', 1)[-1]
+            transaction = self.transactions.get(reference)
+            if transaction is None:
+                return 400, {"status": False, "message": "Transaction reference not found"}
+            return 200, {
+                "status": True,
+                "message": "Verification successful",
+                "data": {
+                    "id": transaction["id"],
+                    "reference": reference,
+                    "status": self.verify_status,
+                    "amount": transaction.get("amount"),
+                    "currency": transaction.get("currency", "GHS"),
+                },
+            }
+
+        return 404, {"status": False, "message": "Not found"}
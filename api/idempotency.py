@@ -0,0 +1,107 @@
+"""
+Idempotency-Key support for POST endpoints that must not run twice.
+
+A client that may retry a POST (flaky Wi-Fi, a double tap) sends a unique
+``Idempotency-Key`` header. The first request with that key claims a row in
+IdempotencyKey, runs, and stores its response. Any retry with the same key
+gets that stored response back (marked ``Idempotent-Replayed: true``) without
+running the view again. A retry that arrives while the first request is still
+running gets 409, and one that reuses the key with a different body gets 422.
+
+5xx responses and exceptions are not stored, so those requests can be retried
+for real.
+"""
+import functools
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+
+# a claim older than this without a stored response belongs to a request that
+# died mid-way, and the next retry takes it over
+PROCESSING_TIMEOUT = timedelta(seconds=60)
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+
+def fingerprint(request):
+    return hashlib.sha256(request.method.encode() + b' ' + request.path.encode() + b'\n' + request.body).hexdigest()
+
+
+def _claim(user, endpoint, key, digest):
+    """Return (row, created) for this key, replacing an expired row."""
+    now = timezone.now()
+    row = IdempotencyKey.objects.filter(user=user, endpoint=endpoint, key=key).first()
+    if row is None:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(user=user, endpoint=endpoint, key=key, fingerprint=digest,
+                                                     expires_at=now + _ttl()), True
+        except IntegrityError:
+            # a concurrent request with the same key got there first
+            return _claim(user, endpoint, key, digest)
+    if row.expires_at <= now:
+        IdempotencyKey.objects.filter(pk=row.pk, expires_at__lte=now).delete()
+        return _claim(user, endpoint, key, digest)
+    if row.response_status is None and row.created_at <= now - PROCESSING_TIMEOUT and row.fingerprint == digest:
+        taken = IdempotencyKey.objects.filter(
+            pk=row.pk, response_status__isnull=True, created_at=row.created_at
+        ).update(created_at=now)
+        return row, bool(taken)
+    return row, False
+
+
+def idempotent(handler):
+    """Decorate a view's post() so requests carrying an Idempotency-Key run at most once."""
+
+    @functools.wraps(handler)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(view, request, *args, **kwargs)
+        if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+            return Response({"error": f"{HEADER} is too long."}, status=status.HTTP_400_BAD_REQUEST)
+
+        digest = fingerprint(request)
+        row, created = _claim(request.user, f"{request.method} {request.path}", key, digest)
+        if not created:
+            if row.fingerprint != digest:
+                return Response({"error": f"{HEADER} was already used for a different request."},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if row.response_status is None:
+                return Response({"error": "A request with this key is still being processed."},
+                                status=status.HTTP_409_CONFLICT)
+            response = Response(row.response_body, status=row.response_status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = handler(view, request, *args, **kwargs)
+        except Exception:
+            row.delete()
+            raise
+        if response.status_code >= 500:
+            row.delete()
+        else:
+            row.response_status = response.status_code
+            row.response_body = response.data
+            row.save(update_fields=['response_status', 'response_body'])
+        return response
+
+    return wrapper
+
+
+def purge_expired(now=None):
+    """Delete expired keys; returns how many were removed."""
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=now or timezone.now()).delete()
+    return deleted
@@ -0,0 +1,117 @@
+"""
+Stock reservations for stock-tracked catalog items.
+
+Orders take their units with a single conditional UPDATE
+(``SET stock = stock - n WHERE stock >= n``), so concurrent orders for the last
+units can never oversell and nothing is read and written back. Items whose
+stock reaches zero become unavailable (status=False, sold_out=True) in the
+same statement, and become available again when units are released, unless
+the shop had switched them off itself (CatalogItem.sync_availability applies
+the same rules to saves).
+
+Items with stock=NULL are not tracked: they always pass and are left alone.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from . import catalog_cache, search
+from .models import CatalogItem, Order, OrderItem
+
+
+class InsufficientStock(Exception):
+    def __init__(self, items):
+        self.items = items
+        super().__init__("Not enough stock for: " + ", ".join(item.name for item in items))
+
+
+def quantities_for(lines):
+    """Total units per catalog item id for (item_id, quantity) pairs."""
+    quantities = Counter()
+    for item_id, quantity in lines:
+        quantities[item_id] += quantity
+    return dict(quantities)
+
+
+def _per_item(quantities):
+    return Case(*[When(pk=pk, then=Value(quantity)) for pk, quantity in quantities.items()],
+                output_field=IntegerField())
+
+
+def reserve(quantities):
+    """
+    Take {item_id: units} from stock in one UPDATE, or raise
+    InsufficientStock without taking anything. Call inside a transaction, so
+    the caller's rollback also undoes the reservation.
+    """
+    if not quantities:
+        return
+    wanted = _per_item(quantities)
+    # every SET expression reads the row as it was before this UPDATE
+    updated = CatalogItem.objects.filter(pk__in=quantities).filter(
+        Q(stock__isnull=True) | Q(stock__gte=wanted)
+    ).update(
+        stock=F('stock') - wanted,
+        status=Case(When(stock=wanted, then=Value(False)), default=F('status')),
+        sold_out=Case(When(stock=wanted, status=True, then=Value(True)), default=F('sold_out')),
+    )
+    if updated != len(quantities):
+        short = CatalogItem.objects.filter(pk__in=quantities).exclude(
+            Q(stock__isnull=True) | Q(stock__gte=wanted)
+        ).order_by('pk')
+        raise InsufficientStock(list(short))
+    _invalidate(quantities)
+
+
+def release(quantities):
+    """Put {item_id: units} back into stock, making items that sold out available again."""
+    if not quantities:
+        return
+    given = _per_item(quantities)
+    CatalogItem.objects.filter(pk__in=quantities, stock__isnull=False).update(
+        stock=F('stock') + given,
+        status=Case(When(sold_out=True, then=Value(True)), default=F('status')),
+        sold_out=Value(False),
+    )
+    _invalidate(quantities)
+
+
+def _invalidate(quantities):
+    # update() skips the model signals that normally invalidate the catalog
+    shop_ids = set(CatalogItem.objects.filter(pk__in=quantities, stock__isnull=False)
+                   .values_list('shop_id', flat=True))
+    for shop_id in shop_ids:
+        catalog_cache.invalidate_shop(shop_id)
+    # sold-out items drop out of search results, restocked ones come back
+    search.refresh_items(quantities)
+
+
+def _order_quantities(order_id):
+    return quantities_for(OrderItem.objects.filter(order_id=order_id, catalog_item__isnull=False)
+                          .values_list('catalog_item_id', 'quantity'))
+
+
+@transaction.atomic
+def release_order(order_id):
+    """Give back an order's reservation. Safe to call more than once; returns True if anything was released."""
+    if not Order.objects.filter(pk=order_id, stock_reserved=True).update(stock_reserved=False):
+        return False
+    release(_order_quantities(order_id))
+    return True
+
+
+def reserve_order(order_id):
+    """
+    Reserve stock again for an order whose reservation was released (its
+    payment failed, then a later one succeeded). Returns False if the units
+    are gone by now; the order itself is left as it is.
+    """
+    try:
+        with transaction.atomic():
+            if not Order.objects.filter(pk=order_id, stock_reserved=False).update(stock_reserved=True):
+                return True
+            reserve(_order_quantities(order_id))
+    except InsufficientStock:
+        return False
+    return True
@@ -0,0 +1,34 @@
+"""Helpers shared by the benchmark and loadtest commands."""
+import math
+from contextlib import contextmanager
+
+from django.db import connection
+from django.test import override_settings
+
+
+def unthrottled(rest_framework):
+    """REST_FRAMEWORK settings that keep every throttle check but never trip one."""
+    rates = rest_framework.get('DEFAULT_THROTTLE_RATES', {})
+    return {**rest_framework, 'DEFAULT_THROTTLE_RATES': {scope: '1000000/s' for scope in rates}}
+
+
+@contextmanager
+def scratch_database(use_current=False):
+    """Run inside a throwaway test database (in memory for SQLite), or the configured one if use_current."""
+    if use_current:
+        yield
+        return
+    # The api migration history cannot be replayed on an empty database,
+    # so (as in the test runner) its tables are created from the models
+    with override_settings(MIGRATION_MODULES={'api': None}):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
@@ -0,0 +1,57 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from api.models import DailyItemSales, DailyShopSales, Order
+from api.sales import day_bounds, rebuild_day
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the DailyShopSales/DailyItemSales rollups from the order and payment tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to rebuild (YYYY-MM-DD). Defaults to the first order.')
+        parser.add_argument('--end', help='Last date to rebuild (YYYY-MM-DD). Defaults to today.')
+
+    def handle(self, *args, **options):
+        start = self.parse_date(options['start'], 'start')
+        end = self.parse_date(options['end'], 'end') or timezone.localdate()
+        if start is None:
+            first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+            if first is None:
+                self.stdout.write("No orders to roll up.")
+                return
+            start = timezone.localdate(first)
+        if end < start:
+            raise CommandError("--end cannot be earlier than --start.")
+
+        # Drop every bucket in range, then rebuild the ones that have sales
+        DailyShopSales.objects.filter(date__range=(start, end)).delete()
+        DailyItemSales.objects.filter(date__range=(start, end)).delete()
+
+        buckets = (
+            Order.objects.filter(
+                created_at__range=day_bounds(start, end),
+                status=Order.STATUS_DELIVERED,
+                payments__status='success',
+            )
+            .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+            .values_list('shop_id', 'day')
+            .distinct()
+            .order_by('day')
+        )
+        count = 0
+        for shop_id, day in buckets:
+            rebuild_day(shop_id, day)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} shop-day bucket(s) from {start} to {end}."))
+
+    def parse_date(self, value, name):
+        if not value:
+            return None
+        try:
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise CommandError(f"--{name}: invalid date format. Use YYYY-MM-DD.")
@@ -0,0 +1,375 @@
+import hashlib
+import hmac
+import json
+import platform
+import statistics
+import time
+from datetime import timedelta
+
+import django
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from django.utils import timezone
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from api.authentication import PrincipalTokenObtainPairSerializer
+from api.factories import PASSWORD, build_dataset
+from api.fake_paystack import FakePaystack
+from api.models import Order, Shop
+
+from ._util import percentile, scratch_database, unthrottled
+
+WEBHOOK_SECRET = 'sk_benchmark'
+
+# URL namespaces that belong to Django/DRF rather than this project
+SKIPPED_NAMESPACES = {'admin', 'rest_framework'}
+
+
+class Scenario:
+    """
+    One benchmarked request. `url_kwargs`, `query` and `data` may be callables
+    taking (dataset, iteration) so repeated requests can vary; `user` names the
+    role the request is authenticated as.
+    """
+
+    def __init__(self, label, url_name, method='get', user=None, url_kwargs=None, query=None, data=None,
+                 status=200, stream=False, signed=False, content_type='application/json'):
+        self.label = label
+        self.url_name = url_name
+        self.method = method
+        self.user = user
+        self.url_kwargs = url_kwargs
+        self.query = query
+        self.data = data
+        self.status = status
+        self.stream = stream
+        self.signed = signed
+        self.content_type = content_type
+
+    @staticmethod
+    def resolve(value, dataset, iteration):
+        return value(dataset, iteration) if callable(value) else value
+
+
+def _food_shop(d):
+    return d.shop_by_type[Shop.CATALOG_FOOD]
+
+
+def _first_item(d, catalog_type):
+    return d.items_by_shop[d.shop_by_type[catalog_type].pk][0]
+
+
+def _import_upload(catalog_type, rows=100):
+    """NDJSON creating `rows` items in the shop of that catalog type, for its manager."""
+    def upload(d, i):
+        shop_id = d.shop_by_type[catalog_type].pk
+        return ''.join(json.dumps({'shop_id': shop_id, 'name': f'Imported {i}-{n}', 'price': 10, 'image': 'x.jpg',
+                                   'status': True}) + '\n' for n in range(rows))
+    return upload
+
+
+def _webhook_payload(d, i):
+    reference = d.paid_payment.paystack_reference
+    return {"event": "charge.success", "data": {"id": 1, "reference": reference,
+                                                "amount": int(d.paid_payment.amount * 100)}}
+
+
+SCENARIOS = [
+    Scenario('catalog (one shop, cached)', 'foodItem-list', query=lambda d, i: {'shop_id': _food_shop(d).pk}),
+    Scenario('catalog (all shops)', 'foodItem-list'),
+    Scenario('catalog search (prefix)', 'catalog-search', query=lambda d, i: {'q': ['spicy jol', 'char', 'fresh'][i % 3]}),
+    Scenario('catalog search (no match)', 'catalog-search', query={'q': 'zzzz'}),
+    Scenario('food admin list', 'foodItem-manage', user='manager_food'),
+    Scenario('food admin detail', 'foodItem-manage-detail', user='manager_food',
+             url_kwargs=lambda d, i: {'pk': _first_item(d, Shop.CATALOG_FOOD).pk}),
+    Scenario('food export (csv)', 'foodItem-export', user='manager_food'),
+    Scenario('food import (100 rows)', 'foodItem-import', method='post', user='manager_food',
+             data=_import_upload(Shop.CATALOG_FOOD), content_type='application/x-ndjson'),
+    Scenario('electronics admin list', 'electronics-manage', user='manager_electronics'),
+    Scenario('electronics admin detail', 'electronics-manage-detail', user='manager_electronics',
+             url_kwargs=lambda d, i: {'pk': _first_item(d, Shop.CATALOG_ELECTRONICS).pk}),
+    Scenario('electronics export (ndjson)', 'electronics-export', user='manager_electronics',
+             query={'output': 'ndjson'}),
+    Scenario('electronics import (100 rows)', 'electronics-import', method='post', user='manager_electronics',
+             data=_import_upload(Shop.CATALOG_ELECTRONICS), content_type='application/x-ndjson'),
+    Scenario('grocery admin list', 'groceries-manage', user='manager_grocery'),
+    Scenario('grocery admin detail', 'groceries-manage-detail', user='manager_grocery',
+             url_kwargs=lambda d, i: {'pk': _first_item(d, Shop.CATALOG_GROCERY).pk}),
+    Scenario('grocery export (csv)', 'groceries-export', user='manager_grocery'),
+    Scenario('grocery import (100 rows)', 'groceries-import', method='post', user='manager_grocery',
+             data=_import_upload(Shop.CATALOG_GROCERY), content_type='application/x-ndjson'),
+    Scenario('shop list', 'shop-list'),
+    Scenario('shop detail', 'shop-detail', url_kwargs=lambda d, i: {'pk': _food_shop(d).pk}),
+    Scenario('profile', 'profile', user='student'),
+    Scenario('my orders', 'order-list-create', user='student'),
+    Scenario('my orders (compact)', 'order-list-create', user='student', query={'view': 'compact'}),
+    Scenario('place order', 'order-list-create', method='post', user='student', status=201,
+             data=lambda d, i: {'items': [{'food_item': _first_item(d, Shop.CATALOG_FOOD).pk, 'quantity': 1}]}),
+    Scenario('staff orders', 'order-manage', user='cook', query={'status': Order.STATUS_RECEIVED}),
+    Scenario('staff orders (compact)', 'order-manage', user='cook',
+             query={'status': Order.STATUS_RECEIVED, 'view': 'compact'}),
+    Scenario('order export (30 days, csv)', 'order-export', user='super_admin',
+             query=lambda d, i: {'start': str(timezone.localdate() - timedelta(days=d.days - 1))}),
+    Scenario('kitchen feed (snapshot)', 'order-manage-events', user='cook', stream=True),
+    Scenario('order detail', 'order-detail', user='student', url_kwargs=lambda d, i: {'order_id': d.open_order.pk}),
+    Scenario('order status update', 'order-detail', method='patch', user='cook',
+             url_kwargs=lambda d, i: {'order_id': d.open_order.pk},
+             data=lambda d, i: {'status': [Order.STATUS_PREPARING, Order.STATUS_RECEIVED][i % 2]}),
+    Scenario('order status', 'order-status', user='student', url_kwargs=lambda d, i: {'order_id': d.open_order.pk}),
+    Scenario('order status stream', 'order-events', user='student', stream=True,
+             url_kwargs=lambda d, i: {'order_id': d.open_order.pk}),
+    Scenario('password reset (lookup)', 'password-reset', method='post', data=lambda d, i: {'email': d.student.email}),
+    Scenario('payment initiate', 'payment-initiate', method='post', user='student',
+             data=lambda d, i: {'order_id': d.open_order.pk, 'payment_method': 'card', 'email': d.student.email,
+                                'amount': str(d.open_order.total_price)}),
+    Scenario('payment verify (settled)', 'payment-verify', method='post', user='student',
+             data=lambda d, i: {'reference': d.paid_payment.paystack_reference}),
+    Scenario('paystack webhook (replayed)', 'payment-webhook', method='post', data=_webhook_payload, signed=True),
+    Scenario('dashboard summary', 'dashboard-summary', user='super_admin',
+             query=lambda d, i: {'start_date': str(timezone.localdate() - timedelta(days=d.days - 1)),
+                                 'end_date': str(timezone.localdate())}),
+    Scenario('register', 'register', method='post', status=201,
+             data=lambda d, i: {'username': f'bench_new_{i}', 'email': f'bench_new_{i}@example.com',
+                                'password': PASSWORD, 'confirm_password': PASSWORD, 'first_name': 'New',
+                                'last_name': 'Student', 'phone_number': '0200000000',
+                                'hostel_or_office_name': 'Bench Hall', 'room_or_office_number': '1'}),
+    Scenario('email verify', 'email-verify', status=302,
+             query=lambda d, i: {'uid': urlsafe_base64_encode(force_bytes(d.unverified.pk)),
+                                 'token': default_token_generator.make_token(d.unverified)}),
+    Scenario('token obtain', 'get_token', method='post',
+             data=lambda d, i: {'username': d.student.username, 'password': PASSWORD}),
+    Scenario('token refresh', 'refresh', method='post',
+             data=lambda d, i: {'refresh': str(PrincipalTokenObtainPairSerializer.get_token(d.student))}),
+]
+
+
+def named_routes(resolver=None, namespace=None):
+    """Names of every URL pattern in the project, leaving out admin and DRF's login views."""
+    names = set()
+    for pattern in (resolver or get_resolver()).url_patterns:
+        if isinstance(pattern, URLResolver):
+            if pattern.namespace in SKIPPED_NAMESPACES:
+                continue
+            names |= named_routes(pattern, pattern.namespace)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(f"{namespace}:{pattern.name}" if namespace else pattern.name)
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks every API route on synthetic data: queries per request, p50/p95 latency and response "
+        "size. Runs in a scratch database (in memory for SQLite). --output writes a JSON baseline; "
+        "--compare fails on regressions against one recorded on the same machine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--shops', type=int, default=3)
+        parser.add_argument('--items', type=int, default=1000, help='Catalog items per shop.')
+        parser.add_argument('--orders', type=int, default=10_000)
+        parser.add_argument('--students', type=int, default=200)
+        parser.add_argument('--days', type=int, default=30, help='Days of order history.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--repeat', type=int, default=20, help='Measured requests per scenario.')
+        parser.add_argument('--warmup', type=int, default=1, help='Unmeasured requests per scenario.')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only run scenarios whose label or route name contains this text.')
+        parser.add_argument('--output', help='Write results to this JSON file.')
+        parser.add_argument('--compare', help='Compare with this JSON baseline and fail on regressions.')
+        parser.add_argument('--latency-tolerance', type=float, default=0.25,
+                            help='Allowed p95 slowdown as a fraction of the baseline (default 0.25).')
+        parser.add_argument('--min-latency-delta', type=float, default=2.0,
+                            help='Ignore p95 slowdowns smaller than this many milliseconds.')
+        parser.add_argument('--bytes-tolerance', type=float, default=0.10,
+                            help='Allowed response size growth as a fraction of the baseline.')
+        parser.add_argument('--max-p95', type=float,
+                            help='Fail if any scenario has a p95 latency above this many milliseconds.')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Use the configured database instead of a scratch one. It must be disposable.')
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['only'] or any(text in scenario.label or text in scenario.url_name
+                                          for text in options['only'])
+        ]
+        if not scenarios:
+            raise CommandError("No scenario matches --only.")
+
+        uncovered = named_routes() - {scenario.url_name for scenario in SCENARIOS}
+        if uncovered:
+            self.stderr.write(f"Routes without a benchmark scenario: {', '.join(sorted(uncovered))}")
+
+        with scratch_database(options['current_db']), FakePaystack() as paystack, override_settings(
+            PAYSTACK_BASE_URL=paystack.url, PAYSTACK_SECRET_KEY=WEBHOOK_SECRET,
+            REST_FRAMEWORK=unthrottled(settings.REST_FRAMEWORK),
+        ):
+            cache.clear()
+            started = time.perf_counter()
+            dataset = build_dataset(shops=options['shops'], items_per_shop=options['items'],
+                                    orders=options['orders'], students=options['students'],
+                                    days=options['days'], seed=options['seed'])
+            self.stdout.write(f"Built dataset in {time.perf_counter() - started:.1f}s.")
+            # the tokens /api/token/ would issue, role and shop claims included
+            tokens = {role: str(PrincipalTokenObtainPairSerializer.get_token(user).access_token)
+                      for role, user in self.users(dataset).items()}
+            results = {}
+            for scenario in scenarios:
+                results[scenario.label] = self.run_scenario(scenario, dataset, tokens, options)
+
+        report = {
+            'meta': {
+                'shops': options['shops'], 'items_per_shop': options['items'], 'orders': options['orders'],
+                'students': options['students'], 'repeat': options['repeat'],
+                'database': connection.vendor, 'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        self.print_results(results)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+                handle.write('\n')
+            self.stdout.write(f"Wrote {options['output']}.")
+        if options['compare']:
+            self.compare(results, options)
+        if options['max_p95'] is not None:
+            slow = [f"{label}: p95 {result['p95_ms']} ms" for label, result in results.items()
+                    if result['p95_ms'] > options['max_p95']]
+            for line in slow:
+                self.stderr.write(line)
+            if slow:
+                raise CommandError(f"{len(slow)} scenario(s) over the {options['max_p95']} ms p95 budget.")
+
+    def users(self, dataset):
+        users = {
+            'student': dataset.student,
+            'cook': dataset.cook,
+            'super_admin': dataset.super_admin,
+        }
+        for catalog_type, manager in dataset.managers.items():
+            users[f'manager_{catalog_type}'] = manager
+        return users
+
+    def run_scenario(self, scenario, dataset, tokens, options):
+        client = Client()
+        timings, queries, sizes, errors = [], [], [], 0
+        for iteration in range(options['warmup'] + options['repeat']):
+            request = self.build_request(scenario, dataset, tokens, iteration)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                status, size = self.send(client, scenario, request)
+                elapsed = (time.perf_counter() - started) * 1000
+            if iteration < options['warmup']:
+                continue
+            timings.append(elapsed)
+            queries.append(len(captured.captured_queries))
+            sizes.append(size)
+            if status != scenario.status:
+                errors += 1
+        if errors:
+            self.stderr.write(f"{scenario.label}: {errors} response(s) were not HTTP {scenario.status}.")
+        return {
+            'route': scenario.url_name,
+            'method': scenario.method.upper(),
+            'requests': len(timings),
+            'errors': errors,
+            'queries': max(queries),
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'bytes': int(statistics.median(sizes)),
+        }
+
+    def build_request(self, scenario, dataset, tokens, iteration):
+        path = reverse(scenario.url_name, kwargs=Scenario.resolve(scenario.url_kwargs, dataset, iteration))
+        headers = {}
+        if scenario.user:
+            headers['Authorization'] = f"Bearer {tokens[scenario.user]}"
+        data = Scenario.resolve(scenario.data, dataset, iteration)
+        if data is None:
+            body = None
+        elif isinstance(data, str):
+            body = data.encode()
+        else:
+            body = json.dumps(data).encode()
+        if scenario.signed:
+            headers['X-Paystack-Signature'] = hmac.new(WEBHOOK_SECRET.encode(), body, hashlib.sha512).hexdigest()
+        return {
+            'path': path,
+            'query': Scenario.resolve(scenario.query, dataset, iteration) or {},
+            'body': body,
+            'headers': headers,
+        }
+
+    def send(self, client, scenario, request):
+        """Make the request and return (status, response bytes)."""
+        if scenario.stream:
+            return async_to_sync(self.first_event)(request)
+        if scenario.method == 'get':
+            response = client.get(request['path'], request['query'], headers=request['headers'])
+        else:
+            response = getattr(client, scenario.method)(
+                request['path'], request['body'], content_type=scenario.content_type, headers=request['headers']
+            )
+        if response.streaming:
+            return response.status_code, sum(len(chunk) for chunk in response.streaming_content)
+        return response.status_code, len(response.content)
+
+    async def first_event(self, request):
+        """Open an event stream, read its first event and hang up, as a client that reconnects would."""
+        response = await AsyncClient().get(request['path'], request['query'], headers=request['headers'])
+        if not response.streaming:
+            return response.status_code, len(response.content)
+        stream = response.streaming_content
+        try:
+            first = await anext(stream)
+        finally:
+            await stream.aclose()
+        return response.status_code, len(first)
+
+    def print_results(self, results):
+        width = max(len(label) for label in results)
+        self.stdout.write(f"{'scenario'.ljust(width)}  queries   p50 ms   p95 ms    bytes  errors")
+        for label, result in results.items():
+            self.stdout.write(
+                f"{label.ljust(width)}  {result['queries']:7d}  {result['p50_ms']:7.2f}  {result['p95_ms']:7.2f}"
+                f"  {result['bytes']:7d}  {result['errors']:6d}"
+            )
+
+    def compare(self, results, options):
+        try:
+            with open(options['compare']) as handle:
+                baseline = json.load(handle)['results']
+        except (OSError, ValueError, KeyError) as exc:
+            raise CommandError(f"Could not read baseline {options['compare']}: {exc}")
+
+        regressions = []
+        for label, result in results.items():
+            before = baseline.get(label)
+            if before is None:
+                self.stdout.write(f"{label}: not in baseline")
+                continue
+            if result['queries'] > before['queries']:
+                regressions.append(f"{label}: {before['queries']} → {result['queries']} queries")
+            slower = result['p95_ms'] - before['p95_ms']
+            if slower > options['min_latency_delta'] and slower > before['p95_ms'] * options['latency_tolerance']:
+                regressions.append(f"{label}: p95 {before['p95_ms']} → {result['p95_ms']} ms")
+            if result['bytes'] > before['bytes'] * (1 + options['bytes_tolerance']):
+                regressions.append(f"{label}: {before['bytes']} → {result['bytes']} bytes")
+            if result['errors'] > before.get('errors', 0):
+                regressions.append(f"{label}: {result['errors']} error response(s)")
+
+        if regressions:
+            for line in regressions:
+                self.stderr.write(line)
+            raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}.")
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}."))
@@ -0,0 +1,138 @@
+import re
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.request import Request
+
+from api.models import (
+    DailyItemSales,
+    DailyShopSales,
+    ElectronicsItems,
+    FoodItems,
+    GroceryItems,
+    Order,
+    Payment,
+    Shop,
+    UserProfile,
+)
+from api.pagination import OrderCursorPagination
+from api.sales import day_bounds, delivered_orders
+from api.views import (
+    FoodListView,
+    OrderListCreateView,
+    StaffOrderListView,
+)
+
+# PostgreSQL: "Seq Scan on api_order  (cost=...)"
+POSTGRES_SEQ_SCAN = re.compile(r'Seq Scan on (\w+)')
+# SQLite: "SCAN api_order" (or "SCAN TABLE api_order" on older versions);
+# "SCAN api_order USING INDEX ..." walks an index and is not a table scan.
+SQLITE_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(.*)$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Runs EXPLAIN on the querysets behind the hot API views and fails if any of them "
+        "falls back to a sequential scan on a table larger than --min-rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to explain against.')
+        parser.add_argument(
+            '--min-rows', type=int, default=1000,
+            help='Only report sequential scans on tables with at least this many rows (default: 1000).',
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database']
+        connection = connections[alias]
+        if connection.vendor not in ('postgresql', 'sqlite'):
+            raise CommandError(f"Unsupported database vendor: {connection.vendor}")
+
+        row_counts = {}
+        failures = []
+        for label, queryset in self.hot_querysets():
+            if queryset.query.is_empty():
+                # e.g. no shop of this catalog type exists yet
+                self.stdout.write(f"-- {label}: skipped (no rows to match)")
+                continue
+            plan = queryset.using(alias).explain()
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"-- {label}\n{plan}\n")
+            for table in self.sequential_scans(connection.vendor, plan):
+                if table not in row_counts:
+                    row_counts[table] = self.count_rows(connection, table)
+                if row_counts[table] >= options['min_rows']:
+                    failures.append(f"{label}: sequential scan on {table} ({row_counts[table]} rows)")
+
+        if failures:
+            raise CommandError("Sequential scans found:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("All hot querysets use an index."))
+
+    def sequential_scans(self, vendor, plan):
+        tables = []
+        for line in plan.splitlines():
+            if vendor == 'postgresql':
+                match = POSTGRES_SEQ_SCAN.search(line)
+                if match:
+                    tables.append(match.group(1))
+            else:
+                match = SQLITE_SCAN.search(line)
+                if match and 'USING' not in match.group(2):
+                    tables.append(match.group(1))
+        return tables
+
+    def count_rows(self, connection, table):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {connection.ops.quote_name(table)}")
+            return cursor.fetchone()[0]
+
+    def hot_querysets(self):
+        """Yield (label, queryset) for each hot path, built through the views themselves."""
+        shop_ids = {
+            kind: model.objects.values_list('shop_id', flat=True).filter(shop__isnull=False).first() or 0
+            for kind, model in (('food', FoodItems), ('electronics', ElectronicsItems), ('grocery', GroceryItems))
+        }
+        page = OrderCursorPagination.ordering
+        limit = OrderCursorPagination.page_size + 1
+
+        # FoodListView picks the item table from the shop, so explain each catalog type
+        for kind, shop_id in shop_ids.items():
+            yield f"FoodListView ({kind})", self.view_queryset(FoodListView, query={'shop_id': shop_id})
+
+        student = self.fake_user(UserProfile.ROLE_STUDENT)
+        yield "OrderListCreateView", self.view_queryset(OrderListCreateView, student).order_by(*page)[:limit]
+
+        shop_id = Shop.objects.values_list('id', flat=True).first() or 0
+        manager = self.fake_user(UserProfile.ROLE_SHOP_MANAGER, shop_id=shop_id)
+        yield "StaffOrderListView", self.view_queryset(
+            StaffOrderListView, manager, query={'status': Order.STATUS_RECEIVED}
+        ).order_by(*page)[:limit]
+
+        today = timezone.localdate()
+        start_dt, end_dt = day_bounds(today, today)
+        yield "DashboardSummaryView (today)", delivered_orders(start_dt, end_dt)
+        yield "DashboardSummaryView (shop rollups)", DailyShopSales.objects.filter(date__range=(today, today))
+        yield "DashboardSummaryView (item rollups)", DailyItemSales.objects.filter(date__range=(today, today))
+
+        yield "PaymentVerifyView", Payment.objects.filter(paystack_reference='', user_id=student.id)
+
+    def view_queryset(self, view_class, user=None, query=None):
+        request = Request(RequestFactory().get('/', query or {}))
+        if user is not None:
+            request.user = user
+        view = view_class()
+        view.setup(request)
+        view.request = request
+        view.format_kwarg = None
+        return view.get_queryset()
+
+    def fake_user(self, role, shop_id=None):
+        """An unsaved user/profile pair; only its ids and role feed the view filters."""
+        user = User(id=User.objects.values_list('id', flat=True).first() or 0)
+        profile = UserProfile(user=user, role=role, shop=Shop(id=shop_id) if shop_id is not None else None)
+        user.userprofile = profile
+        return user
@@ -0,0 +1,436 @@
+import http.client
+import json
+import random
+import statistics
+import threading
+import time
+import uuid
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from api import throttling
+from api.factories import PASSWORD, build_dataset
+from api.fake_paystack import FakePaystack
+from api.models import Order, Shop, UserProfile
+
+from ._util import percentile, scratch_database, unthrottled
+
+
+class Request:
+    """One request of a journey; `name` is the endpoint it is reported under."""
+
+    def __init__(self, name, method, path, query=None, data=None, token=None, expect=200):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.query = query or {}
+        self.data = data
+        self.token = token
+        self.expect = expect
+
+
+class Reply:
+    def __init__(self, status, body):
+        self.status = status
+        try:
+            self.json = json.loads(body) if body else None
+        except ValueError:
+            self.json = None
+
+
+class World:
+    """What journeys need to know about the data they run against."""
+
+    def __init__(self, food_shop_id, students, cook, options):
+        self.food_shop_id = food_shop_id
+        self.students = students
+        self.cook = cook
+        self.new_user_ratio = options['new_users']
+        self.browse = options['browse']
+        self.polls = options['polls']
+        self.updates = options['updates']
+        self.run_id = uuid.uuid4().hex[:6]
+        self._registered = 0
+        self._lock = threading.Lock()
+
+    def new_username(self):
+        with self._lock:
+            self._registered += 1
+            return f"load_{self.run_id}_{self._registered}"
+
+
+def _token(username):
+    return Request('POST get_token', 'post', reverse('get_token'), data={'username': username, 'password': PASSWORD})
+
+
+def student_journey(world, rng):
+    """Register (sometimes) → token → browse the catalog → order → pay → poll the order's status."""
+    if rng.random() < world.new_user_ratio:
+        username = world.new_username()
+        reply = yield Request('POST register', 'post', reverse('register'), expect=201, data={
+            'username': username, 'email': f'{username}@example.com', 'password': PASSWORD,
+            'confirm_password': PASSWORD, 'first_name': 'Load', 'last_name': 'Test', 'phone_number': '0200000000',
+            'hostel_or_office_name': 'Load Hall', 'room_or_office_number': '1',
+        })
+        if reply.status != 201:
+            return
+        # the link from the verification email
+        user = User.objects.get(username=username)
+        yield Request('GET email-verify', 'get', reverse('email-verify'), expect=302, query={
+            'uid': urlsafe_base64_encode(force_bytes(user.pk)), 'token': default_token_generator.make_token(user),
+        })
+    else:
+        username = rng.choice(world.students)
+
+    reply = yield _token(username)
+    if reply.status != 200:
+        return
+    token = reply.json['access']
+
+    items = []
+    for _ in range(world.browse):
+        reply = yield Request('GET foodItem-list', 'get', reverse('foodItem-list'),
+                              query={'shop_id': world.food_shop_id})
+        items = reply.json if reply.status == 200 and isinstance(reply.json, list) else []
+    if not items:
+        return
+
+    lines = [{'food_item': item['id'], 'quantity': rng.randint(1, 2)}
+             for item in rng.sample(items, min(len(items), rng.randint(1, 3)))]
+    reply = yield Request('POST order-list-create', 'post', reverse('order-list-create'), token=token, expect=201,
+                          data={'items': lines})
+    if reply.status != 201:
+        return
+    order = reply.json
+
+    reply = yield Request('POST payment-initiate', 'post', reverse('payment-initiate'), token=token, data={
+        'order_id': order['id'], 'payment_method': 'card', 'email': f'{username}@example.com',
+        'amount': order['total_price'],
+    })
+    if reply.status == 200:
+        yield Request('POST payment-verify', 'post', reverse('payment-verify'), token=token,
+                      data={'reference': reply.json['reference']})
+
+    for _ in range(world.polls):
+        yield Request('GET order-status', 'get', reverse('order-status', kwargs={'order_id': order['id']}),
+                      token=token)
+
+
+def staff_journey(world, rng):
+    """Token → the kitchen's list of new orders → move some of them along."""
+    reply = yield _token(world.cook)
+    if reply.status != 200:
+        return
+    token = reply.json['access']
+    reply = yield Request('GET order-manage', 'get', reverse('order-manage'), token=token,
+                          query={'status': Order.STATUS_RECEIVED, 'page_size': 20})
+    orders = reply.json['results'] if reply.status == 200 else []
+    for order in rng.sample(orders, min(len(orders), world.updates)):
+        yield Request('PATCH order-detail', 'patch', reverse('order-detail', kwargs={'order_id': order['id']}),
+                      token=token, data={'status': Order.STATUS_PREPARING})
+
+
+class Stats:
+    def __init__(self):
+        self.timings = []
+        self.errors = 0
+        self.queries = 0
+        self.statuses = {}
+
+    def add(self, elapsed, status, ok, queries):
+        self.timings.append(elapsed)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if not ok:
+            self.errors += 1
+        if queries is not None:
+            self.queries += queries
+
+
+class VirtualUser:
+    """Runs journeys back to back; each step sends the journey's next request."""
+
+    def __init__(self, world, staff, seed, deadline, iterations):
+        self.world = world
+        self.journey = staff_journey if staff else student_journey
+        self.rng = random.Random(seed)
+        self.deadline = deadline
+        self.iterations = iterations
+        self.completed = 0
+        self._current = None
+        self._reply = None
+
+    def next_request(self):
+        """The next request to send, or None once this user is done."""
+        while True:
+            if self._current is None:
+                if time.monotonic() >= self.deadline or (self.iterations and self.completed >= self.iterations):
+                    return None
+                self._current = self.journey(self.world, self.rng)
+                self._reply = None
+            try:
+                request = self._current.send(self._reply) if self._reply is not None else next(self._current)
+            except StopIteration:
+                self._current = None
+                self.completed += 1
+                continue
+            return request
+
+    def answer(self, reply):
+        self._reply = reply
+
+
+class InProcessDriver:
+    """
+    Sends every request through Django's test client, one at a time, counting
+    each request's queries. Virtual users take turns, like clients of a single
+    synchronous worker.
+    """
+
+    counts_queries = True
+
+    def run(self, users, record):
+        client = Client()
+        active = list(users)
+        while active:
+            for user in list(active):
+                request = user.next_request()
+                if request is None:
+                    active.remove(user)
+                    continue
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    status, body = self.send(client, request)
+                    elapsed = time.perf_counter() - started
+                record(request, elapsed, status, len(captured.captured_queries))
+                user.answer(Reply(status, body))
+
+    @staticmethod
+    def send(client, request):
+        headers = {'Authorization': f'Bearer {request.token}'} if request.token else {}
+        if request.method == 'get':
+            response = client.get(request.path, request.query, headers=headers)
+        else:
+            response = getattr(client, request.method)(request.path, json.dumps(request.data),
+                                                       content_type='application/json', headers=headers)
+        return response.status_code, response.content
+
+
+class HttpDriver:
+    """One thread and keep-alive connection per virtual user, against a running server."""
+
+    counts_queries = False
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise CommandError("--url must look like http://127.0.0.1:8000")
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+
+    def run(self, users, record):
+        threads = [threading.Thread(target=self.run_user, args=(user, record)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_user(self, user, record):
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            while True:
+                request = user.next_request()
+                if request is None:
+                    return
+                started = time.perf_counter()
+                try:
+                    status, body = self.send(conn, request)
+                except (OSError, http.client.HTTPException):
+                    conn.close()
+                    status, body = 0, b''
+                record(request, time.perf_counter() - started, status, None)
+                user.answer(Reply(status, body))
+        finally:
+            conn.close()
+            # journeys read users from the database in this thread
+            connection.close()
+
+    def send(self, conn, request):
+        path = self.prefix + request.path
+        if request.query:
+            path += '?' + urlencode(request.query)
+        headers = {'Content-Type': 'application/json'}
+        if request.token:
+            headers['Authorization'] = f'Bearer {request.token}'
+        body = json.dumps(request.data) if request.method != 'get' else None
+        conn.request(request.method.upper(), path, body=body, headers=headers)
+        response = conn.getresponse()
+        return response.status, response.read()
+
+
+class Command(BaseCommand):
+    help = (
+        "Replays lunch-hour traffic: virtual students register, log in, browse the catalog, order, pay "
+        "(against a local fake Paystack) and poll their orders while staff move orders along. Reports "
+        "requests/sec, latency percentiles, error rates and (in-process) database queries per endpoint. "
+        "Without --url it runs through the test client on a scratch database; with --url it drives a "
+        "running server, which must use this database (filled by `sync_fixtures generate`) and "
+        "PAYSTACK_BASE_URL pointing at --paystack-port."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20, help='Virtual users.')
+        parser.add_argument('--staff', type=float, default=0.1, help='Share of virtual users that are kitchen staff.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run for.')
+        parser.add_argument('--iterations', type=int, default=0,
+                            help='Stop each virtual user after this many journeys (0 = only --duration).')
+        parser.add_argument('--new-users', type=float, default=0.2,
+                            help='Share of student journeys that start by registering.')
+        parser.add_argument('--browse', type=int, default=2, help='Catalog requests per student journey.')
+        parser.add_argument('--polls', type=int, default=3, help='Order status polls per student journey.')
+        parser.add_argument('--updates', type=int, default=3, help='Orders a staff journey moves along.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--url', help='Drive the server at this URL instead of the test client.')
+        parser.add_argument('--paystack-port', type=int, default=0,
+                            help='Port for the fake Paystack (with --url, the server must be started with '
+                                 'PAYSTACK_BASE_URL=http://127.0.0.1:<port>).')
+        parser.add_argument('--paystack-latency', type=float, default=0.0,
+                            help='Seconds the fake Paystack takes to answer.')
+        parser.add_argument('--items', type=int, default=200, help='Scratch database: catalog items per shop.')
+        parser.add_argument('--orders', type=int, default=2000, help='Scratch database: existing orders.')
+        parser.add_argument('--students', type=int, default=200, help='Scratch database: existing students.')
+        parser.add_argument('--output', help='Write results to this JSON file.')
+        parser.add_argument('--current-db', action='store_true',
+                            help='Build the dataset in the configured database instead of a scratch one.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError("--users must be at least 1.")
+        paystack = FakePaystack(latency=options['paystack_latency'], port=options['paystack_port'])
+        with paystack:
+            if options['url']:
+                self.stdout.write(f"Fake Paystack listening on {paystack.url}.")
+                report = self.run(HttpDriver(options['url']), self.existing_world(options), options)
+            else:
+                with scratch_database(options['current_db']), override_settings(
+                    PAYSTACK_BASE_URL=paystack.url, PAYSTACK_SECRET_KEY='sk_loadtest',
+                    REST_FRAMEWORK=unthrottled(settings.REST_FRAMEWORK),
+                ):
+                    # buckets filled at the real rates would still hold requests back
+                    cache.clear()
+                    throttling.get_store().clear()
+                    report = self.run(InProcessDriver(), self.scratch_world(options), options)
+
+        self.print_report(report)
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2, sort_keys=True)
+                handle.write('\n')
+            self.stdout.write(f"Wrote {options['output']}.")
+
+    def scratch_world(self, options):
+        started = time.perf_counter()
+        dataset = build_dataset(shops=3, items_per_shop=options['items'], orders=options['orders'],
+                                students=options['students'], seed=options['seed'])
+        self.stdout.write(f"Built dataset in {time.perf_counter() - started:.1f}s.")
+        return World(dataset.shop_by_type[Shop.CATALOG_FOOD].pk, [user.username for user in dataset.students],
+                     dataset.cook.username, options)
+
+    def existing_world(self, options):
+        students = list(User.objects.filter(userprofile__role=UserProfile.ROLE_STUDENT, username__startswith='student',
+                                            is_active=True).values_list('username', flat=True)[:1000])
+        cook = User.objects.filter(userprofile__role=UserProfile.ROLE_COOK).values_list('username', flat=True).first()
+        shop = Shop.objects.filter(catalog_type=Shop.CATALOG_FOOD, is_active=True).order_by('pk').first()
+        if not students or cook is None or shop is None:
+            raise CommandError("No synthetic users here; run `manage.py sync_fixtures generate` first.")
+        return World(shop.pk, students, cook, options)
+
+    def run(self, driver, world, options):
+        rng = random.Random(options['seed'])
+        staff = round(options['users'] * options['staff'])
+        deadline = time.monotonic() + options['duration']
+        users = [VirtualUser(world, staff=n < staff, seed=rng.random(), deadline=deadline,
+                             iterations=options['iterations'])
+                 for n in range(options['users'])]
+
+        stats = {}
+        lock = threading.Lock()
+
+        def record(request, elapsed, status, queries):
+            expected = status == request.expect
+            with lock:
+                stats.setdefault(request.name, Stats()).add(elapsed, status, expected, queries)
+
+        started = time.perf_counter()
+        driver.run(users, record)
+        elapsed = time.perf_counter() - started
+        return self.summarize(stats, elapsed, driver.counts_queries, sum(user.completed for user in users), options)
+
+    @staticmethod
+    def summarize(stats, elapsed, counts_queries, journeys, options):
+        endpoints = {}
+        for name, stat in sorted(stats.items()):
+            timings = [value * 1000 for value in stat.timings]
+            endpoints[name] = {
+                'requests': len(timings),
+                'rps': round(len(timings) / elapsed, 2),
+                'errors': stat.errors,
+                'error_rate': round(stat.errors / len(timings), 4),
+                'statuses': {str(status): count for status, count in sorted(stat.statuses.items())},
+                'p50_ms': round(percentile(timings, 0.50), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'p99_ms': round(percentile(timings, 0.99), 2),
+                'mean_ms': round(statistics.mean(timings), 2),
+                'queries': stat.queries if counts_queries else None,
+            }
+        requests = sum(endpoint['requests'] for endpoint in endpoints.values())
+        errors = sum(endpoint['errors'] for endpoint in endpoints.values())
+        return {
+            'meta': {'users': options['users'], 'staff': options['staff'], 'url': options['url'],
+                     'database': connection.vendor, 'seconds': round(elapsed, 2), 'journeys': journeys},
+            'total': {
+                'requests': requests,
+                'rps': round(requests / elapsed, 2) if elapsed else 0,
+                'errors': errors,
+                'error_rate': round(errors / requests, 4) if requests else 0,
+                'queries': sum(endpoint['queries'] for endpoint in endpoints.values()) if counts_queries else None,
+            },
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        endpoints = report['endpoints']
+        if not endpoints:
+            self.stdout.write("No requests were sent.")
+            return
+        width = max(len(name) for name in endpoints)
+        self.stdout.write(f"{'endpoint'.ljust(width)}  requests     rps  errors   p50 ms   p95 ms   p99 ms  "
+                          f"queries  q/req")
+        for name, result in endpoints.items():
+            queries = result['queries']
+            per_request = f"{queries / result['requests']:5.1f}" if queries is not None else '    -'
+            self.stdout.write(
+                f"{name.ljust(width)}  {result['requests']:8d}  {result['rps']:6.1f}  {result['error_rate']:6.1%}"
+                f"  {result['p50_ms']:7.2f}  {result['p95_ms']:7.2f}  {result['p99_ms']:7.2f}"
+                f"  {queries if queries is not None else '-':>7}  {per_request}"
+            )
+        total, meta = report['total'], report['meta']
+        self.stdout.write(
+            f"{total['requests']} requests ({meta['journeys']} journeys) in {meta['seconds']}s: "
+            f"{total['rps']} requests/s, {total['error_rate']:.1%} errors"
+            + (f", {total['queries']} queries." if total['queries'] is not None else ".")
+        )
+        throttled = sum(result['statuses'].get('429', 0) for result in endpoints.values())
+        if throttled:
+            self.stderr.write(f"{throttled} requests were throttled (429); start the target server with "
+                              "THROTTLE_UNLIMITED=1 so the run measures the endpoints, not the rate limits.")
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = "Deletes Idempotency-Key records older than IDEMPOTENCY_KEY_TTL."
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        if deleted or options['verbosity'] >= 2:
+            self.stdout.write(f"Deleted {deleted} expired idempotency key(s).")
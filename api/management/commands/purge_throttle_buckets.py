@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api.throttling import DatabaseStore
+
+
+class Command(BaseCommand):
+    help = "Deletes ThrottleBucket rows that have refilled completely (DatabaseStore only)."
+
+    def handle(self, *args, **options):
+        deleted = DatabaseStore().purge()
+        if deleted or options['verbosity'] >= 2:
+            self.stdout.write(f"Deleted {deleted} idle throttle bucket(s).")
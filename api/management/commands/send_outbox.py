@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.outbox import deliver_due
+
+
+class Command(BaseCommand):
+    help = "Delivers queued OutboundEmail messages, batching them over one SMTP connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Messages sent per SMTP connection.')
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting.')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait between polls with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            total_sent = total_failed = 0
+            # drain everything that is due, one batch at a time
+            while True:
+                sent, failed = deliver_due(batch_size=options['batch_size'])
+                total_sent += sent
+                total_failed += failed
+                if sent + failed < options['batch_size']:
+                    break
+            if total_sent or total_failed or options['verbosity'] >= 2:
+                self.stdout.write(f"Sent {total_sent} email(s), {total_failed} failed and will be retried or dropped.")
+            if not options['loop']:
+                return
+            try:
+                time.sleep(options['interval'])
+            except KeyboardInterrupt:
+                return
@@ -0,0 +1,155 @@
+import hashlib
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import DateTimeField
+
+from api import catalog_cache, search, shop_registry
+from api.factories import PASSWORD, build_dataset
+from api.models import CatalogItem, FixtureSync, Shop
+
+# fixture file → model, in load order (items refer to shops)
+FIXTURES = [
+    ('shops.json', Shop),
+    ('catalog_items.json', CatalogItem),
+]
+
+BATCH_SIZE = 1000
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def fixture_timestamps(model):
+    """
+    Store the fixture's created_at/updated_at values as loaddata would,
+    instead of letting auto_now/auto_now_add overwrite them with the time of loading.
+    """
+    fields = [field for field in model._meta.concrete_fields if isinstance(field, DateTimeField)]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def refresh_catalogs():
+    """Invalidate every cached catalog, the shop registry and the search index."""
+    shop_ids = Shop.objects.values_list('pk', flat=True)
+    catalog_cache.bump(catalog_cache.ALL_SCOPE, *(catalog_cache.scope_for_shop(pk) for pk in shop_ids))
+    shop_registry.invalidate()
+    search.invalidate()
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports shops and catalog items to fixtures/, imports them back in one process with bulk upserts "
+        "(skipping files whose content hasn't changed since the last import), or generates synthetic data "
+        "at load-test scale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['export', 'import', 'generate'])
+        parser.add_argument('--dir', default=os.path.join(settings.BASE_DIR, 'fixtures'),
+                            help='Fixture directory (default: fixtures/ in the project).')
+        parser.add_argument('--force', action='store_true', help='import: load files even if they are unchanged.')
+        parser.add_argument('--shops', type=int, default=3, help='generate: number of shops.')
+        parser.add_argument('--items', type=int, default=1000, help='generate: catalog items per shop.')
+        parser.add_argument('--orders', type=int, default=100_000, help='generate: number of orders.')
+        parser.add_argument('--students', type=int, default=1000, help='generate: number of students.')
+        parser.add_argument('--days', type=int, default=30, help='generate: days of order history.')
+        parser.add_argument('--seed', type=int, default=0, help='generate: random seed.')
+
+    def handle(self, *args, **options):
+        getattr(self, f"handle_{options['action']}")(options)
+
+    def handle_export(self, options):
+        os.makedirs(options['dir'], exist_ok=True)
+        for name, model in FIXTURES:
+            path = os.path.join(options['dir'], name)
+            temporary = f"{path}.tmp"
+            with open(temporary, 'w') as handle:
+                serializers.serialize('json', model._base_manager.order_by('pk').iterator(chunk_size=BATCH_SIZE),
+                                      indent=2, stream=handle)
+                handle.write('\n')
+            if os.path.exists(path) and file_hash(path) == file_hash(temporary):
+                os.remove(temporary)
+                self.stdout.write(f"{name}: unchanged.")
+            else:
+                os.replace(temporary, path)
+                self.stdout.write(f"{name}: written.")
+
+    def handle_import(self, options):
+        loaded = []
+        for name, model in FIXTURES:
+            path = os.path.join(options['dir'], name)
+            if not os.path.exists(path):
+                raise CommandError(f"{path} does not exist.")
+            digest = file_hash(path)
+            if not options['force'] and FixtureSync.objects.filter(name=name, sha256=digest).exists():
+                self.stdout.write(f"{name}: unchanged, skipped.")
+                continue
+            with transaction.atomic(), fixture_timestamps(model):
+                count = self.load(path, model)
+                FixtureSync.objects.update_or_create(name=name, defaults={'sha256': digest, 'objects_loaded': count})
+            loaded.append(model)
+            self.stdout.write(f"{name}: {count} object(s) loaded.")
+
+        if loaded:
+            # explicit primary keys leave PostgreSQL sequences behind
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), loaded):
+                    cursor.execute(sql)
+            # bulk upserts skip the signals that keep these current
+            refresh_catalogs()
+
+    def load(self, path, model):
+        """Upsert every object of `model` in the fixture at `path`; returns how many there were."""
+        update_fields = [field.name for field in model._meta.concrete_fields if not field.primary_key]
+        batch, count = [], 0
+        with open(path) as handle:
+            for deserialized in serializers.deserialize('json', handle, ignorenonexistent=True):
+                obj = deserialized.object
+                if not isinstance(obj, model):
+                    raise CommandError(f"{path} contains {obj._meta.label} objects; expected {model._meta.label}.")
+                batch.append(obj)
+                if len(batch) == BATCH_SIZE:
+                    count += self.upsert(model, batch, update_fields)
+                    batch = []
+        return count + self.upsert(model, batch, update_fields)
+
+    @staticmethod
+    def upsert(model, objects, update_fields):
+        if objects:
+            model._base_manager.bulk_create(objects, update_conflicts=True, unique_fields=['id'],
+                                            update_fields=update_fields)
+        return len(objects)
+
+    def handle_generate(self, options):
+        if User.objects.filter(username='student1').exists():
+            raise CommandError("Synthetic users already exist here; generate into a fresh database.")
+        dataset = build_dataset(shops=options['shops'], items_per_shop=options['items'], orders=options['orders'],
+                                students=options['students'], days=options['days'], seed=options['seed'])
+        refresh_catalogs()
+        self.stdout.write(
+            f"Generated {options['shops']} shop(s), {options['shops'] * options['items']} item(s), "
+            f"{options['orders']} order(s) and {options['students']} student(s). "
+            f"Log in as {dataset.student.username}, {dataset.super_admin.username}, {dataset.cook.username} or "
+            f"{', '.join(manager.username for manager in dataset.managers.values())}; "
+            f"every password is {PASSWORD}."
+        )
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_merge_20260219_0356'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['shop', 'status', '-created_at'], name='order_shop_status_created_idx'),
+        ),
+    ]
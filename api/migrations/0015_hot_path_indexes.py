@@ -0,0 +1,37 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_order_shop_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='electronicsitems',
+            index=models.Index(condition=models.Q(('status', True)), fields=['shop', 'name'], name='electronics_active_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fooditems',
+            index=models.Index(condition=models.Q(('status', True)), fields=['shop', 'name'], name='fooditem_active_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='groceryitems',
+            index=models.Index(condition=models.Q(('status', True)), fields=['shop', 'name'], name='grocery_active_shop_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['order', 'status'], name='payment_order_status_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyItemSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('item_type', models.CharField(choices=[('food', 'Food'), ('electronics', 'Electronics'), ('grocery', 'Grocery')], max_length=20)),
+                ('item_id', models.PositiveBigIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('shop', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_item_sales', to='api.shop')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyShopSales',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('shop', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_sales', to='api.shop')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], name='daily_shop_sales_date_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyshopsales',
+            constraint=models.UniqueConstraint(fields=('shop', 'date'), name='daily_shop_sales_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyitemsales',
+            index=models.Index(fields=['date'], name='daily_item_sales_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='dailyitemsales',
+            index=models.Index(fields=['shop', 'date'], name='daily_item_sales_shop_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaystackEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=100, unique=True)),
+                ('event', models.CharField(max_length=50)),
+                ('reference', models.CharField(blank=True, max_length=100)),
+                ('payload', models.JSONField()),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,116 @@
+from django.core.management.color import no_style
+from django.db import migrations, models
+from django.db.models import F, Max
+import django.db.models.deletion
+
+
+# (legacy model, CatalogItem kind, legacy OrderItem FK), in id order
+LEGACY_ITEMS = [
+    ('FoodItems', 'food', 'food_item'),
+    ('ElectronicsItems', 'electronics', 'electronics_item'),
+    ('GroceryItems', 'grocery', 'grocery_item'),
+]
+
+
+def move_items_to_catalog(apps, schema_editor):
+    """
+    Copy every legacy item into CatalogItem. Food items keep their ids; each
+    later kind is shifted past the highest id of the kinds before it, and
+    order lines and item rollups are remapped by the same offset.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    CatalogItem = apps.get_model('api', 'CatalogItem')
+    OrderItem = apps.get_model('api', 'OrderItem')
+    DailyItemSales = apps.get_model('api', 'DailyItemSales')
+
+    offset = 0
+    for model_name, kind, field in LEGACY_ITEMS:
+        Legacy = apps.get_model('api', model_name)
+        has_extras = any(f.name == 'extras' for f in Legacy._meta.fields)
+        with connection.cursor() as cursor:
+            # INSERT ... SELECT keeps created_at, which auto_now_add would overwrite
+            cursor.execute(
+                f"INSERT INTO {quote(CatalogItem._meta.db_table)} "
+                f"(id, shop_id, kind, name, price, image, status, extras, created_at) "
+                f"SELECT id + %s, shop_id, %s, name, price, image, status, "
+                f"{'extras' if has_extras else 'NULL'}, created_at "
+                f"FROM {quote(Legacy._meta.db_table)}",
+                [offset, kind],
+            )
+        OrderItem.objects.filter(**{f'{field}__isnull': False}).update(catalog_item_id=F(f'{field}_id') + offset)
+        DailyItemSales.objects.filter(item_type=kind).update(item_id=F('item_id') + offset)
+        offset += Legacy.objects.aggregate(Max('id'))['id__max'] or 0
+
+    # explicit ids leave the Postgres sequence behind
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), [CatalogItem]):
+            cursor.execute(statement)
+
+
+def move_items_back(apps, schema_editor):
+    """
+    Copy CatalogItem rows back into the (re-created, empty) legacy tables.
+    Items keep their CatalogItem ids, which are unique across all kinds, so
+    order lines and item rollups need no remapping; electronics and grocery
+    items don't get their original pre-0019 ids back. Legacy tables without
+    an `extras` column lose that field.
+    """
+    connection = schema_editor.connection
+    quote = connection.ops.quote_name
+    CatalogItem = apps.get_model('api', 'CatalogItem')
+    OrderItem = apps.get_model('api', 'OrderItem')
+
+    legacy_models = []
+    for model_name, kind, field in LEGACY_ITEMS:
+        Legacy = apps.get_model('api', model_name)
+        legacy_models.append(Legacy)
+        legacy_columns = {f.column for f in Legacy._meta.concrete_fields}
+        columns = [column for column in ('id', 'shop_id', 'name', 'price', 'image', 'status', 'extras', 'created_at')
+                   if column in legacy_columns]
+        column_list = ', '.join(quote(column) for column in columns)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {quote(Legacy._meta.db_table)} ({column_list}) "
+                f"SELECT {column_list} FROM {quote(CatalogItem._meta.db_table)} WHERE kind = %s",
+                [kind],
+            )
+        OrderItem.objects.filter(catalog_item__kind=kind).update(**{f'{field}_id': F('catalog_item_id')})
+
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), legacy_models):
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_paystackevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('food', 'Food'), ('electronics', 'Electronics'), ('grocery', 'Grocery')], default='food', max_length=20)),
+                ('name', models.CharField(max_length=100)),
+                ('price', models.FloatField()),
+                ('image', models.TextField()),
+                ('status', models.BooleanField(default=False)),
+                ('extras', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('shop', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='catalog_items', to='api.shop')),
+            ],
+            options={
+                'ordering': ['name'],
+                'indexes': [models.Index(condition=models.Q(('status', True)), fields=['shop', 'kind', 'name'], name='catalogitem_active_shop_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='catalog_item',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.catalogitem'),
+        ),
+        migrations.RunPython(move_items_to_catalog, move_items_back, elidable=False),
+    ]
@@ -0,0 +1,70 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separate from 0019 so Postgres does not alter orderitem in the same
+    # transaction that rewrote its rows (pending deferred FK trigger events)
+
+    dependencies = [
+        ('api', '0019_catalogitem'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='electronics_item',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='food_item',
+        ),
+        migrations.RemoveField(
+            model_name='orderitem',
+            name='grocery_item',
+        ),
+        migrations.DeleteModel(
+            name='ElectronicsItems',
+        ),
+        migrations.DeleteModel(
+            name='FoodItems',
+        ),
+        migrations.DeleteModel(
+            name='GroceryItems',
+        ),
+        migrations.CreateModel(
+            name='ElectronicsItems',
+            fields=[
+            ],
+            options={
+                'ordering': ['name'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('api.catalogitem',),
+        ),
+        migrations.CreateModel(
+            name='FoodItems',
+            fields=[
+            ],
+            options={
+                'ordering': ['name'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('api.catalogitem',),
+        ),
+        migrations.CreateModel(
+            name='GroceryItems',
+            fields=[
+            ],
+            options={
+                'ordering': ['name'],
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('api.catalogitem',),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.20 on 2026-10-17 20:57
+
+from django.db import migrations, models
+
+
+def catalog_type_from_name(name):
+    """The shop-name rules FoodListView used before catalog_type existed."""
+    name = name.lower()
+    if 'tech' in name or 'electronics' in name:
+        return 'electronics'
+    if 'giyark' in name or 'mart' in name or 'grocery' in name:
+        return 'grocery'
+    return 'food'
+
+
+def backfill_catalog_type(apps, schema_editor):
+    Shop = apps.get_model('api', 'Shop')
+    for shop in Shop.objects.only('id', 'name'):
+        catalog_type = catalog_type_from_name(shop.name)
+        if catalog_type != 'food':
+            Shop.objects.filter(pk=shop.pk).update(catalog_type=catalog_type)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_remove_legacy_item_models'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='shop',
+            name='catalog_type',
+            field=models.CharField(choices=[('food', 'Food'), ('electronics', 'Electronics'), ('grocery', 'Grocery')], default='food', max_length=20),
+        ),
+        migrations.RunPython(backfill_catalog_type, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-17 21:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_shop_catalog_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogitem',
+            name='stock',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='stock_reserved',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.20 on 2026-10-17 21:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThrottleBucket',
+            fields=[
+                ('key', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('tat', models.FloatField()),
+            ],
+        ),
+    ]
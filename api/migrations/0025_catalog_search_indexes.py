@@ -0,0 +1,45 @@
+from django.db import migrations
+
+# Only PostgreSQL searches in the database (see api/search.py); other
+# backends use the in-process index and need nothing here.
+SEARCH_INDEX = 'catalogitem_search_idx'
+TRIGRAM_INDEX = 'catalogitem_name_trgm_idx'
+
+
+def _indexes():
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        # the same expression api.search queries, so the planner can use it
+        GinIndex(SearchVector('name', 'extras', config='simple'), name=SEARCH_INDEX),
+        GinIndex(OpClass('name', name='gin_trgm_ops'), name=TRIGRAM_INDEX),
+    ]
+
+
+def add_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    model = apps.get_model('api', 'CatalogItem')
+    for index in _indexes():
+        schema_editor.add_index(model, index)
+
+
+def remove_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    model = apps.get_model('api', 'CatalogItem')
+    for index in _indexes():
+        schema_editor.remove_index(model, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_throttlebucket'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_indexes, remove_search_indexes),
+    ]
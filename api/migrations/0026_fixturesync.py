@@ -0,0 +1,23 @@
+# Generated by Django 4.2.20 on 2026-10-17 21:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0025_catalog_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FixtureSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('objects_loaded', models.PositiveIntegerField(default=0)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
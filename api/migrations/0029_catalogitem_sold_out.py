@@ -0,0 +1,26 @@
+# Generated by Django 4.2.20 on 2026-10-17 22:09
+
+from django.db import migrations, models
+
+
+def mark_sold_out(apps, schema_editor):
+    # before sold_out existed, releasing stock switched on every item at zero
+    # stock; keep doing that for the ones switched off at zero today
+    CatalogItem = apps.get_model('api', 'CatalogItem')
+    CatalogItem.objects.filter(stock=0, status=False).update(sold_out=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0028_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='catalogitem',
+            name='sold_out',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(mark_sold_out, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,26 @@
 from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.utils import timezone
 
 
 class Shop(models.Model):
     """Shop model representing different stores in the platform"""
+    CATALOG_FOOD        = 'food'
+    CATALOG_ELECTRONICS = 'electronics'
+    CATALOG_GROCERY     = 'grocery'
+
+    CATALOG_TYPE_CHOICES = [
+        (CATALOG_FOOD,        'Food'),
+        (CATALOG_ELECTRONICS, 'Electronics'),
+        (CATALOG_GROCERY,     'Grocery'),
+    ]
+
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True, null=True)
     image = models.TextField(blank=True, null=True)  # URL to shop image
+    # which kind of CatalogItem the shop sells
+    catalog_type = models.CharField(max_length=20, choices=CATALOG_TYPE_CHOICES, default=CATALOG_FOOD)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -56,56 +70,120 @@ class UserProfile(models.Model):
         return self.role == self.ROLE_SHOP_MANAGER
 
 
-class FoodItems(models.Model):
-    """Food items for Cassa Bella Cuisine"""
-    shop = models.ForeignKey('Shop', on_delete=models.CASCADE, related_name='food_items', null=True, blank=True)
+class CatalogItem(models.Model):
+    """Anything a shop sells; `kind` says which catalog (food, electronics, groceries) it belongs to"""
+    KIND_FOOD        = Shop.CATALOG_FOOD
+    KIND_ELECTRONICS = Shop.CATALOG_ELECTRONICS
+    KIND_GROCERY     = Shop.CATALOG_GROCERY
+
+    KIND_CHOICES = Shop.CATALOG_TYPE_CHOICES
+
+    # set on the per-kind proxy models below
+    KIND = None
+
+    shop = models.ForeignKey('Shop', on_delete=models.CASCADE, related_name='catalog_items', null=True, blank=True)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default=KIND_FOOD)
     name = models.CharField(max_length=100)
     price = models.FloatField()
     image = models.TextField()
     status = models.BooleanField(default=False)
+    # units left to sell; null means stock isn't tracked for this item
+    stock = models.PositiveIntegerField(null=True, blank=True)
+    # status was switched off because stock ran out, not by the shop; only
+    # these items are switched back on when stock returns
+    sold_out = models.BooleanField(default=False)
     extras = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            # public catalog: active items of one shop, ordered by name
+            models.Index(fields=['shop', 'kind', 'name'], condition=models.Q(status=True),
+                         name='catalogitem_active_shop_idx'),
+        ]
+
+    def __init__(self, *args, **kwargs):
+        # FoodItems(name=...) etc. create items of their own kind; rows loaded
+        # from the database arrive as positional args and keep theirs
+        if self.KIND is not None and not args:
+            kwargs.setdefault('kind', self.KIND)
+        super().__init__(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
+    def sync_availability(self):
+        """
+        Derive status from stock: running out switches a tracked item off,
+        and stock coming back (or tracking being dropped) switches it on again
+        only if running out is what switched it off. A status changed by hand
+        since the item was loaded is the shop's decision and is kept.
+        The bulk reserve/release UPDATEs in api.inventory apply the same rules.
+        """
+        if getattr(self, '_loaded_status', self.status) != self.status:
+            self.sold_out = False
+        if self.stock == 0:
+            if self.status:
+                self.status, self.sold_out = False, True
+        elif self.sold_out:
+            self.status, self.sold_out = True, False
+
+    def save(self, *args, **kwargs):
+        self.sync_availability()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'stock', 'status'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'status', 'sold_out'}
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
 
     def __str__(self):
         shop_name = self.shop.name if self.shop else "No Shop"
         return f"{self.name} ({shop_name})"
 
 
-class ElectronicsItems(models.Model):
-    """Electronics items for Best Tech Point-Ashesi"""
-    shop = models.ForeignKey('Shop', on_delete=models.CASCADE, related_name='electronics_items', null=True, blank=True)
-    name = models.CharField(max_length=100)
-    price = models.FloatField()
-    image = models.TextField()
-    status = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+class CatalogKindManager(models.Manager):
+    """Limits a catalog proxy model to items of its own kind."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(kind=self.model.KIND)
+
+
+class FoodItems(CatalogItem):
+    """Food items for Cassa Bella Cuisine"""
+    KIND = CatalogItem.KIND_FOOD
+
+    objects = CatalogKindManager()
 
     class Meta:
+        proxy = True
         ordering = ['name']
 
-    def __str__(self):
-        shop_name = self.shop.name if self.shop else "No Shop"
-        return f"{self.name} ({shop_name})"
 
+class ElectronicsItems(CatalogItem):
+    """Electronics items for Best Tech Point-Ashesi"""
+    KIND = CatalogItem.KIND_ELECTRONICS
 
-class GroceryItems(models.Model):
-    """Grocery items for Giyark Mini Mart"""
-    shop = models.ForeignKey('Shop', on_delete=models.CASCADE, related_name='grocery_items', null=True, blank=True)
-    name = models.CharField(max_length=100)
-    price = models.FloatField()
-    image = models.TextField()
-    status = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    objects = CatalogKindManager()
 
     class Meta:
+        proxy = True
         ordering = ['name']
 
-    def __str__(self):
-        shop_name = self.shop.name if self.shop else "No Shop"
-        return f"{self.name} ({shop_name})"
+
+class GroceryItems(CatalogItem):
+    """Grocery items for Giyark Mini Mart"""
+    KIND = CatalogItem.KIND_GROCERY
+
+    objects = CatalogKindManager()
+
+    class Meta:
+        proxy = True
+        ordering = ['name']
 
 class Order(models.Model):
     STATUS_RECEIVED        = 'RECEIVED'
@@ -133,61 +211,92 @@ class Order(models.Model):
                      choices=STATUS_CHOICES,
                      default=STATUS_RECEIVED
                   )
+    # set while the order holds units of stock-tracked items (see api.inventory)
+    stock_reserved = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # staff order boards: filter by shop and status, newest first
+            models.Index(fields=['shop', 'status', '-created_at'], name='order_shop_status_created_idx'),
+            # a student's own orders, newest first
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            # dashboard: delivered orders in a date range
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # remembered so post_save handlers can tell what a save changed
+        instance._loaded_status = dict(zip(field_names, values)).get('status')
+        return instance
 
     def __str__(self):
         return f"Order {self.id} ({self.get_status_display()})"
 
 
 class OrderItem(models.Model):
-    """Order items can be from FoodItems, ElectronicsItems, or GroceryItems"""
+    """A line of an order, pointing at one CatalogItem of any kind"""
     order           = models.ForeignKey(
                          Order,
                          on_delete=models.CASCADE,
                          related_name='items'
                       )
-    food_item       = models.ForeignKey('FoodItems', on_delete=models.CASCADE, null=True, blank=True)
-    electronics_item = models.ForeignKey('ElectronicsItems', on_delete=models.CASCADE, null=True, blank=True)
-    grocery_item    = models.ForeignKey('GroceryItems', on_delete=models.CASCADE, null=True, blank=True)
+    catalog_item    = models.ForeignKey('CatalogItem', on_delete=models.CASCADE, null=True, blank=True)
     quantity        = models.PositiveIntegerField(default=1)
     price           = models.DecimalField(max_digits=10, decimal_places=2)
 
     def save(self, *args, **kwargs):
         # auto-compute line price if not explicitly set
-        if not self.price:
-            if self.food_item:
-                self.price = self.food_item.price * self.quantity
-            elif self.electronics_item:
-                self.price = self.electronics_item.price * self.quantity
-            elif self.grocery_item:
-                self.price = self.grocery_item.price * self.quantity
+        if not self.price and self.catalog_item:
+            self.price = self.catalog_item.price * self.quantity
         super().save(*args, **kwargs)
 
+    # food_item / electronics_item / grocery_item predate CatalogItem; they
+    # still work as constructor arguments and read back the item if it is of
+    # that kind, without another query
+    def _item_of_kind(self, kind):
+        item = self.catalog_item
+        return item if item is not None and item.kind == kind else None
+
+    def _set_item_of_kind(self, kind, item):
+        if item is not None or self._item_of_kind(kind) is not None:
+            self.catalog_item = item
+
+    food_item = property(
+        lambda self: self._item_of_kind(CatalogItem.KIND_FOOD),
+        lambda self, item: self._set_item_of_kind(CatalogItem.KIND_FOOD, item),
+    )
+    electronics_item = property(
+        lambda self: self._item_of_kind(CatalogItem.KIND_ELECTRONICS),
+        lambda self, item: self._set_item_of_kind(CatalogItem.KIND_ELECTRONICS, item),
+    )
+    grocery_item = property(
+        lambda self: self._item_of_kind(CatalogItem.KIND_GROCERY),
+        lambda self, item: self._set_item_of_kind(CatalogItem.KIND_GROCERY, item),
+    )
+
     @property
     def item_name(self):
         """Get the name of the item regardless of type"""
-        if self.food_item:
-            return self.food_item.name
-        elif self.electronics_item:
-            return self.electronics_item.name
-        elif self.grocery_item:
-            return self.grocery_item.name
+        if self.catalog_item:
+            return self.catalog_item.name
         return "Unknown Item"
 
     @property
     def item(self):
         """Get the actual item object regardless of type"""
-        if self.food_item:
-            return self.food_item
-        elif self.electronics_item:
-            return self.electronics_item
-        elif self.grocery_item:
-            return self.grocery_item
-        return None
+        return self.catalog_item
 
     def __str__(self):
         return f"{self.quantity}× {self.item_name} (Order {self.order.id})"
 
 
+def order_items_prefetch():
+    """Prefetch for Order.items that loads each line's item and shop in the same query."""
+    return models.Prefetch('items', queryset=OrderItem.objects.select_related('catalog_item__shop'))
+
+
 class Payment(models.Model):
     PAYMENT_METHOD_CHOICES = [
         ("card", "Card"),
@@ -208,5 +317,179 @@ class Payment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # dashboard: join from orders to their successful payments
+            models.Index(fields=['order', 'status'], name='payment_order_status_idx'),
+        ]
+
     def __str__(self):
         return f"Payment {self.id} for Order {self.order.id} ({self.status})"
+
+
+
+class PaystackEvent(models.Model):
+    """
+    Paystack webhook events that have been applied, keyed by event name and
+    Paystack's transaction id so redelivered events are ignored.
+    """
+    event_id    = models.CharField(max_length=100, unique=True)
+    event       = models.CharField(max_length=50)
+    reference   = models.CharField(max_length=100, blank=True)
+    payload     = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.event} {self.reference}"
+
+class DailyShopSales(models.Model):
+    """
+    Per-shop, per-day totals of delivered, successfully paid orders.
+    Maintained by api.sales from order/payment signals; rebuild with
+    `manage.py backfill_daily_sales`.
+    """
+    shop        = models.ForeignKey('Shop', on_delete=models.CASCADE, related_name='daily_sales', null=True, blank=True)
+    date        = models.DateField()
+    order_count = models.PositiveIntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['shop', 'date'], name='daily_shop_sales_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='daily_shop_sales_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.shop} sales on {self.date}"
+
+
+class DailyItemSales(models.Model):
+    """Per-item, per-day quantities and revenue, alongside DailyShopSales"""
+    # item_type is the CatalogItem kind and item_id its CatalogItem id
+    ITEM_FOOD        = CatalogItem.KIND_FOOD
+    ITEM_ELECTRONICS = CatalogItem.KIND_ELECTRONICS
+    ITEM_GROCERY     = CatalogItem.KIND_GROCERY
+
+    ITEM_TYPE_CHOICES = CatalogItem.KIND_CHOICES
+
+    shop      = models.ForeignKey('Shop', on_delete=models.CASCADE, related_name='daily_item_sales', null=True, blank=True)
+    date      = models.DateField()
+    item_type = models.CharField(max_length=20, choices=ITEM_TYPE_CHOICES)
+    item_id   = models.PositiveBigIntegerField()
+    name      = models.CharField(max_length=100)
+    quantity  = models.PositiveIntegerField(default=0)
+    revenue   = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date'], name='daily_item_sales_date_idx'),
+            models.Index(fields=['shop', 'date'], name='daily_item_sales_shop_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}× {self.name} on {self.date}"
+
+
+class OutboundEmail(models.Model):
+    """
+    Outbox of emails waiting to be delivered by `manage.py send_outbox`,
+    so request handlers never block on SMTP.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT    = 'sent'
+    STATUS_FAILED  = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        # leased to a worker until next_attempt_at
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_SENT,    'Sent'),
+        (STATUS_FAILED,  'Failed'),
+    ]
+
+    subject         = models.CharField(max_length=255)
+    body            = models.TextField()
+    from_email      = models.CharField(max_length=254, blank=True)
+    to              = models.JSONField(default=list)
+    status          = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts        = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error      = models.TextField(blank=True)
+    created_at      = models.DateTimeField(auto_now_add=True)
+    sent_at         = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbound_email_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.to)} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    The stored outcome of a POST sent with an Idempotency-Key header, so a
+    retried request gets the original response instead of running again.
+    A row without a response_status is still being processed.
+    """
+    user            = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                        related_name='idempotency_keys')
+    key             = models.CharField(max_length=255)
+    # "POST /api/orders/": the same key may be reused on another endpoint
+    endpoint        = models.CharField(max_length=255)
+    fingerprint     = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body   = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at      = models.DateTimeField(auto_now_add=True)
+    expires_at      = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='idempotency_key_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.endpoint} {self.key}"
+
+
+class ThrottleBucket(models.Model):
+    """
+    Token buckets shared by every worker (api.throttling.DatabaseStore). `tat`
+    is the Unix time at which the bucket will be full again.
+    """
+    key = models.CharField(max_length=255, primary_key=True)
+    tat = models.FloatField()
+
+    def __str__(self):
+        return self.key
+
+
+class OrderEvent(models.Model):
+    """
+    Order stream events shared by every worker process (api.events.DatabaseBackend).
+    Rows are only kept for ORDER_EVENTS_RETENTION_SECONDS.
+    """
+    channel    = models.CharField(max_length=100)
+    payload    = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.channel} #{self.pk}"
+
+
+class FixtureSync(models.Model):
+    """
+    The content hash of each fixture file `manage.py sync_fixtures import` has
+    loaded, so files that haven't changed since are skipped.
+    """
+    name           = models.CharField(max_length=255, unique=True)
+    sha256         = models.CharField(max_length=64)
+    objects_loaded = models.PositiveIntegerField(default=0)
+    synced_at      = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
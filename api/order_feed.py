@@ -0,0 +1,66 @@
+"""
+Kitchen display feed: per-shop order events for /api/orders/manage/events/.
+
+Order signals publish "order.created", "order.status_changed" and
+"order.deleted" on the shop's channel and on the all-shops channel. Each
+change is serialized once after commit, however many screens are watching,
+and not at all when nobody is.
+"""
+from django.db import transaction
+
+from . import events
+from .models import Order, order_items_prefetch
+from .serializers import OrderSerializer
+
+ALL_SHOPS_CHANNEL = 'kitchen:all'
+
+ORDER_CREATED = 'order.created'
+ORDER_STATUS_CHANGED = 'order.status_changed'
+ORDER_DELETED = 'order.deleted'
+
+
+def shop_channel(shop_id):
+    return f"kitchen:shop:{shop_id}"
+
+
+def channels_for(shop_id):
+    channels = [ALL_SHOPS_CHANNEL]
+    if shop_id is not None:
+        channels.append(shop_channel(shop_id))
+    return channels
+
+
+def orders_for_feed():
+    return Order.objects.select_related('shop').prefetch_related(order_items_prefetch())
+
+
+def serialize(orders):
+    """Feed payloads for `orders`; only staff subscribe, so customer details are included."""
+    return OrderSerializer(orders, many=True, context={'include_customer': True}).data
+
+
+def publish_saved(order, event):
+    """Publish `event` for a created or updated order once the transaction commits."""
+    order_id, shop_id = order.pk, order.shop_id
+    if not events.has_subscribers(*channels_for(shop_id)):
+        return
+
+    def publish():
+        # re-read after commit so the payload includes line items saved after the order
+        saved = orders_for_feed().filter(pk=order_id).first()
+        if saved is not None:
+            _publish(event, saved.shop_id, serialize([saved])[0])
+
+    transaction.on_commit(publish)
+
+
+def publish_deleted(order):
+    order_id, shop_id = order.pk, order.shop_id
+    if events.has_subscribers(*channels_for(shop_id)):
+        transaction.on_commit(lambda: _publish(ORDER_DELETED, shop_id, {"id": order_id}))
+
+
+def _publish(event, shop_id, order_data):
+    message = {"event": event, "shop_id": shop_id, "order": order_data}
+    for channel in channels_for(shop_id):
+        events.publish(channel, message)
@@ -0,0 +1,158 @@
+"""
+Database-backed email outbox.
+
+Views call enqueue() (a single INSERT) instead of talking to SMTP, and the
+`send_outbox` worker drains due messages in batches over one SMTP connection,
+retrying failures with exponential backoff. Messages are leased to a worker
+before any SMTP traffic, so no transaction or row lock is held while sending.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(subject, body, to, from_email=None):
+    """Queue an email for the outbox worker and return the OutboundEmail row."""
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        to=list(to),
+        from_email=from_email or '',
+    )
+
+
+def backoff(attempts):
+    """Delay before retry number `attempts` (1-based): base * 2^(n-1), capped."""
+    base = _setting('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = _setting('EMAIL_OUTBOX_RETRY_MAX_SECONDS', 60 * 60)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim_due(batch_size, now):
+    """
+    Lease up to `batch_size` due messages to this worker by marking them
+    sending until now + EMAIL_OUTBOX_LEASE_SECONDS, in a short transaction of
+    its own. A worker that dies mid-batch leaves its messages to be claimed
+    again once the lease runs out; that counts as an attempt, so a message
+    that kills its sender every time still ends up failed.
+    """
+    lease_until = now + timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+    skip_locked = db_connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        due = OutboundEmail.objects.filter(
+            status__in=[OutboundEmail.STATUS_PENDING, OutboundEmail.STATUS_SENDING],
+            next_attempt_at__lte=now,
+        ).order_by('next_attempt_at')
+        if skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        candidates = list(due[:batch_size])
+        fresh = [email for email in candidates if email.status == OutboundEmail.STATUS_PENDING]
+        expired = [email for email in candidates if email.status == OutboundEmail.STATUS_SENDING]
+        if skip_locked:
+            # the row locks already keep other workers off these
+            claimed = fresh
+            OutboundEmail.objects.filter(pk__in=[email.pk for email in claimed]).update(
+                status=OutboundEmail.STATUS_SENDING, next_attempt_at=lease_until,
+            )
+        else:
+            # no row locks (SQLite): claim each row only if no other worker
+            # has changed it since it was read
+            claimed = [
+                email for email in fresh
+                if OutboundEmail.objects.filter(
+                    pk=email.pk, status=email.status, next_attempt_at=email.next_attempt_at,
+                ).update(status=OutboundEmail.STATUS_SENDING, next_attempt_at=lease_until)
+            ]
+        for email in claimed:
+            email.status, email.next_attempt_at = OutboundEmail.STATUS_SENDING, lease_until
+
+        for email in expired:
+            # the worker holding this lease stopped mid-send
+            changes = {
+                'status': OutboundEmail.STATUS_SENDING,
+                'attempts': email.attempts + 1,
+                'next_attempt_at': lease_until,
+                'last_error': 'Lease expired before the send was recorded',
+            }
+            if changes['attempts'] >= max_attempts:
+                changes['status'] = OutboundEmail.STATUS_FAILED
+            rows = OutboundEmail.objects.filter(pk=email.pk)
+            if not skip_locked:
+                rows = rows.filter(status=email.status, next_attempt_at=email.next_attempt_at)
+            if rows.update(**changes) and changes['status'] == OutboundEmail.STATUS_SENDING:
+                for field, value in changes.items():
+                    setattr(email, field, value)
+                claimed.append(email)
+    return claimed
+
+
+def deliver_due(batch_size=50):
+    """
+    Send up to `batch_size` due messages over a single SMTP connection.
+    SMTP is only talked to after the messages are claimed, outside any
+    transaction. Returns a (sent, failed) tuple of message counts for this batch.
+    """
+    now = timezone.now()
+    max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 8)
+    sent = failed = 0
+
+    batch = claim_due(batch_size, now)
+    if not batch:
+        return sent, failed
+
+    smtp = get_connection()
+    try:
+        smtp.open()
+        connection_error = None
+    except Exception as exc:
+        connection_error = exc
+
+    try:
+        for email in batch:
+            error = connection_error
+            if error is None:
+                message = EmailMessage(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email or None,
+                    to=email.to,
+                    connection=smtp,
+                )
+                message.encoding = 'utf-8'
+                try:
+                    message.send(fail_silently=False)
+                except Exception as exc:
+                    error = exc
+
+            email.attempts += 1
+            if error is None:
+                email.status = OutboundEmail.STATUS_SENT
+                email.sent_at = timezone.now()
+                email.last_error = ''
+                sent += 1
+            else:
+                email.last_error = f"{type(error).__name__}: {error}"
+                if email.attempts >= max_attempts:
+                    email.status = OutboundEmail.STATUS_FAILED
+                else:
+                    email.status = OutboundEmail.STATUS_PENDING
+                    email.next_attempt_at = now + backoff(email.attempts)
+                failed += 1
+    finally:
+        if connection_error is None:
+            smtp.close()
+
+    OutboundEmail.objects.bulk_update(
+        batch, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'],
+    )
+    return sent, failed
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class OrderCursorPagination(CursorPagination):
+    """
+    Keyset pagination for order lists, newest first.
+    Pages are addressed by an opaque ?cursor= token, so polling the first page
+    stays cheap no matter how much order history has built up.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class SearchPagination(PageNumberPagination):
+    """Numbered pages of search results, best matches first."""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,108 @@
+"""
+Payment state changes, shared by the Paystack webhook and PaymentVerifyView.
+"""
+import hashlib
+import hmac
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from . import events, inventory
+from .models import Order, Payment, PaystackEvent
+
+# Paystack event name → resulting Payment.status
+EVENT_STATUSES = {
+    'charge.success': 'success',
+    'charge.failed': 'failed',
+}
+
+# Paystack transaction status (from /transaction/verify) → resulting Payment.status;
+# anything else (pending, ongoing, abandoned, ...) is still in flight
+TRANSACTION_STATUSES = {
+    'success': 'success',
+    'failed': 'failed',
+    'reversed': 'failed',
+}
+
+
+def verify_signature(body, signature):
+    """Check the X-Paystack-Signature header (HMAC-SHA512 of the raw body)."""
+    secret = settings.PAYSTACK_SECRET_KEY
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def apply_status(payment, new_status):
+    """
+    Move a payment (locked by the caller) to 'success' or 'failed'.
+    A successful payment is final; a failed one can still succeed later.
+    Returns True if anything changed.
+    """
+    if payment.status == new_status or payment.status == 'success':
+        return False
+    payment.status = new_status
+    payment.save(update_fields=['status', 'updated_at'])
+    if new_status == 'success':
+        order = Order.objects.select_for_update().get(pk=payment.order_id)
+        order.status = Order.STATUS_RECEIVED
+        order.save(update_fields=['status'])
+        events.publish_order_status(order)
+        # no-op unless an earlier failed payment released the order's stock
+        inventory.reserve_order(order.pk)
+    elif new_status == 'failed':
+        # a stale duplicate payment failing must not put a paid order's stock back on sale
+        if not Payment.objects.filter(order_id=payment.order_id, status='success').exists():
+            inventory.release_order(payment.order_id)
+    return True
+
+
+def _amount_matches(payment, data):
+    amount = data.get('amount')
+    if amount is None:
+        return True
+    # PaymentInitiateView converts to pesewas via float, so allow 1 pesewa of rounding
+    return abs(Decimal(amount) - payment.amount * 100) <= 1
+
+
+def transaction_status(payment, data):
+    """
+    The Payment.status a verified Paystack transaction calls for, or None while
+    the charge is still in flight. A short-paid success counts as a failure.
+    """
+    new_status = TRANSACTION_STATUSES.get(data.get('status'))
+    if new_status == 'success' and not _amount_matches(payment, data):
+        return 'failed'
+    return new_status
+
+
+@transaction.atomic
+def process_event(payload):
+    """
+    Apply a verified webhook payload exactly once.
+    Returns False if this event had already been processed.
+    """
+    event = payload.get('event', '')
+    data = payload.get('data') or {}
+    reference = data.get('reference') or ''
+    event_id = f"{event}:{data.get('id') or reference}"
+
+    _, created = PaystackEvent.objects.get_or_create(
+        event_id=event_id,
+        defaults={'event': event, 'reference': reference, 'payload': payload},
+    )
+    if not created:
+        return False
+
+    new_status = EVENT_STATUSES.get(event)
+    if new_status is None or not reference:
+        return True
+    payment = Payment.objects.select_for_update().filter(paystack_reference=reference).first()
+    if payment is None:
+        return True
+    if new_status == 'success' and not _amount_matches(payment, data):
+        new_status = 'failed'
+    apply_status(payment, new_status)
+    return True
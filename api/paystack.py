@@ -0,0 +1,164 @@
+"""
+Client for the Paystack REST API.
+
+All calls go through one process-wide requests.Session so TLS connections to
+Paystack are pooled and reused. Every call has connect/read timeouts, the
+idempotent verify call is retried on transient errors, and a circuit breaker
+stops hammering Paystack (and tying up workers) while it is failing.
+"""
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class PaystackError(Exception):
+    """Paystack could not be reached, timed out, or answered with a server error."""
+
+
+class PaystackUnavailable(PaystackError):
+    """The circuit breaker is open; Paystack is not being called for now."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. After that one trial call is let through while
+    every other caller is still rejected: success closes the circuit, another
+    failure opens it again. A trial that never reports back stops blocking
+    after another `reset_timeout`.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_started_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if self.trial_started_at is not None and now - self.trial_started_at < self.reset_timeout:
+                return False
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # half-open: this caller makes the trial call
+            self.trial_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_started_at = None
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class PaystackClient:
+    def __init__(self, base_url=None, secret_key=None, timeout=None, breaker=None):
+        self._base_url = base_url
+        self._secret_key = secret_key
+        self._timeout = timeout
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=_setting('PAYSTACK_CIRCUIT_FAILURE_THRESHOLD', 5),
+            reset_timeout=_setting('PAYSTACK_CIRCUIT_RESET_SECONDS', 30),
+        )
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    # Settings are read per call so override_settings and .env changes apply
+    @property
+    def base_url(self):
+        return (self._base_url or settings.PAYSTACK_BASE_URL).rstrip('/')
+
+    @property
+    def timeout(self):
+        return self._timeout or _setting('PAYSTACK_TIMEOUT', (3.05, 10))
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+        return self._session
+
+    def _build_session(self):
+        session = requests.Session()
+        retries = Retry(
+            total=_setting('PAYSTACK_VERIFY_RETRIES', 2),
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            # Only GET (verify) is idempotent; initialize is never replayed
+            allowed_methods=frozenset({'GET'}),
+            raise_on_status=False,
+        )
+        pool_size = _setting('PAYSTACK_POOL_SIZE', 10)
+        session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries))
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retries))
+        return session
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {self._secret_key or settings.PAYSTACK_SECRET_KEY}",
+            "Content-Type": "application/json",
+        }
+
+    def _request(self, method, path, **kwargs):
+        if not self.breaker.allow():
+            raise PaystackUnavailable("Payment provider is temporarily unavailable. Please try again shortly.")
+        try:
+            response = self.session.request(
+                method, f"{self.base_url}{path}", headers=self._headers(), timeout=self.timeout, **kwargs
+            )
+        except requests.RequestException as exc:
+            self.breaker.record_failure()
+            raise PaystackError(f"Could not reach payment provider: {exc.__class__.__name__}") from exc
+
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+            raise PaystackError(f"Payment provider error (HTTP {response.status_code}).")
+        self.breaker.record_success()
+        try:
+            return response.json()
+        except ValueError as exc:
+            raise PaystackError("Invalid response from payment provider.") from exc
+
+    def initialize_transaction(self, payload):
+        """POST /transaction/initialize → Paystack's JSON envelope."""
+        return self._request('POST', '/transaction/initialize', json=payload)
+
+    def verify_transaction(self, reference):
+        """GET /transaction/verify/<reference> → Paystack's JSON envelope."""
+        return self._request('GET', f'/transaction/verify/{reference}')
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Process-wide client, sharing one connection pool and circuit breaker."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = PaystackClient()
+    return _client
@@ -1,13 +1,11 @@
 from rest_framework.permissions import BasePermission
 
+from .authentication import STAFF_ROLES, get_principal
 from .models import UserProfile
 
 
-def _get_user_role(user):
-    if not user or not user.is_authenticated:
-        return None
-    profile = getattr(user, 'userprofile', None)
-    return profile.role if profile else None
+def _get_user_role(request):
+    return get_principal(request).role
 
 
 class IsSuperAdmin(BasePermission):
@@ -16,7 +14,7 @@ class IsSuperAdmin(BasePermission):
     """
 
     def has_permission(self, request, view):
-        return _get_user_role(request.user) == UserProfile.ROLE_SUPER_ADMIN
+        return _get_user_role(request) == UserProfile.ROLE_SUPER_ADMIN
 
 
 class IsStaffMember(BasePermission):
@@ -24,15 +22,10 @@ class IsStaffMember(BasePermission):
     Allows access to super admins, employees, cooks, and shop managers.
     """
 
-    STAFF_ROLES = {
-        UserProfile.ROLE_SUPER_ADMIN,
-        UserProfile.ROLE_SHOP_MANAGER,
-        UserProfile.ROLE_EMPLOYEE,
-        UserProfile.ROLE_COOK,
-    }
+    STAFF_ROLES = STAFF_ROLES
 
     def has_permission(self, request, view):
-        return _get_user_role(request.user) in self.STAFF_ROLES
+        return get_principal(request).is_staff
 
 
 class IsShopManager(BasePermission):
@@ -41,7 +34,7 @@ class IsShopManager(BasePermission):
     """
 
     def has_permission(self, request, view):
-        role = _get_user_role(request.user)
+        role = _get_user_role(request)
         return role in {UserProfile.ROLE_SUPER_ADMIN, UserProfile.ROLE_SHOP_MANAGER}
 
 
@@ -51,5 +44,4 @@ class IsStudent(BasePermission):
     """
 
     def has_permission(self, request, view):
-        return _get_user_role(request.user) == UserProfile.ROLE_STUDENT
-
+        return _get_user_role(request) == UserProfile.ROLE_STUDENT
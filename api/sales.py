@@ -0,0 +1,145 @@
+"""
+Daily sales rollups behind DashboardSummaryView.
+
+Only delivered orders with a successful payment count as sales.  Each
+(shop, day) bucket is recomputed from the live tables whenever one of its
+orders or payments changes, which keeps the rollup idempotent: replaying a
+signal or running the backfill simply produces the same rows again.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils import timezone
+
+from .models import DailyItemSales, DailyShopSales, Order, OrderItem
+
+def day_bounds(start_date, end_date):
+    """Aware datetimes spanning start_date 00:00 to end_date 23:59:59.999999 local time."""
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(start_date, time.min), tz),
+        timezone.make_aware(datetime.combine(end_date, time.max), tz),
+    )
+
+
+def delivered_orders(start_dt, end_dt):
+    """Delivered, successfully paid orders placed within [start_dt, end_dt]."""
+    return (
+        Order.objects.filter(
+            created_at__range=(start_dt, end_dt),
+            payments__status="success",
+            status=Order.STATUS_DELIVERED,
+        ).distinct()
+    )
+
+
+@transaction.atomic
+def rebuild_day(shop_id, day):
+    """Recompute the rollup rows for one shop on one local date."""
+    orders = delivered_orders(*day_bounds(day, day)).filter(shop_id=shop_id)
+
+    DailyShopSales.objects.filter(shop_id=shop_id, date=day).delete()
+    DailyItemSales.objects.filter(shop_id=shop_id, date=day).delete()
+
+    totals = orders.aggregate(order_count=Count('id'), total_sales=Sum('total_price'))
+    if not totals['order_count']:
+        return
+    DailyShopSales.objects.create(
+        shop_id=shop_id,
+        date=day,
+        order_count=totals['order_count'],
+        total_sales=totals['total_sales'] or 0,
+    )
+
+    item_rows = []
+    for row in _item_totals(orders):
+        item_rows.append(DailyItemSales(shop_id=shop_id, date=day, **row))
+    DailyItemSales.objects.bulk_create(item_rows)
+
+
+def _item_totals(orders):
+    """Yield item_type/item_id/name/quantity/revenue dicts for the lines of the given orders."""
+    rows = (
+        OrderItem.objects.filter(order__in=orders, catalog_item__isnull=False)
+        .values('catalog_item', 'catalog_item__kind', 'catalog_item__name')
+        .annotate(quantity=Sum('quantity'), revenue=Sum('price'))
+        .order_by()
+    )
+    for row in rows:
+        yield {
+            'item_type': row['catalog_item__kind'],
+            'item_id': row['catalog_item'],
+            'name': row['catalog_item__name'],
+            'quantity': row['quantity'],
+            'revenue': row['revenue'],
+        }
+
+
+def schedule_rebuild(order):
+    """Rebuild the order's bucket once the current transaction commits."""
+    shop_id = order.shop_id
+    day = timezone.localdate(order.created_at)
+    transaction.on_commit(lambda: rebuild_day(shop_id, day))
+
+
+def summarize(start_date, end_date, top_n=5):
+    """
+    Sales totals and top items for a local date range.  Past days are read
+    from the rollup tables; only today (if in range) is computed live.
+    """
+    today = timezone.localdate()
+    total_sales = Decimal('0')
+    total_orders = 0
+    items = {}
+
+    def add_item(item_type, item_id, name, quantity, revenue):
+        entry = items.setdefault((item_type, item_id), {'name': name, 'quantity_sold': 0, 'revenue': Decimal('0')})
+        entry['quantity_sold'] += quantity or 0
+        entry['revenue'] += revenue or 0
+
+    rollup_end = min(end_date, today - timedelta(days=1))
+    if start_date <= rollup_end:
+        totals = DailyShopSales.objects.filter(date__range=(start_date, rollup_end)).aggregate(
+            total_sales=Sum('total_sales'), order_count=Sum('order_count'),
+        )
+        total_sales += totals['total_sales'] or 0
+        total_orders += totals['order_count'] or 0
+        rolled_items = (
+            DailyItemSales.objects.filter(date__range=(start_date, rollup_end))
+            .values('item_type', 'item_id')
+            .annotate(name=Max('name'), quantity=Sum('quantity'), revenue=Sum('revenue'))
+            .order_by()
+        )
+        for row in rolled_items:
+            add_item(row['item_type'], row['item_id'], row['name'], row['quantity'], row['revenue'])
+
+    if end_date >= today:
+        live_start = max(start_date, today)
+        orders = delivered_orders(*day_bounds(live_start, end_date))
+        totals = orders.aggregate(total_sales=Sum('total_price'), order_count=Count('id'))
+        total_sales += totals['total_sales'] or 0
+        total_orders += totals['order_count'] or 0
+        for row in _item_totals(orders):
+            add_item(row['item_type'], row['item_id'], row['name'], row['quantity'], row['revenue'])
+
+    top_items = sorted(items.items(), key=lambda entry: entry[1]['quantity_sold'], reverse=True)[:top_n]
+    average = (total_sales / total_orders).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP) if total_orders else 0
+    return {
+        'total_sales': total_sales,
+        'total_orders': total_orders,
+        'average_order_value': average,
+        'top_items': [
+            {
+                # food_item_id is kept for existing dashboard clients
+                'food_item_id': item_id if item_type == DailyItemSales.ITEM_FOOD else None,
+                'item_type': item_type,
+                'item_id': item_id,
+                'name': entry['name'],
+                'quantity_sold': entry['quantity_sold'],
+                'revenue': entry['revenue'],
+            }
+            for (item_type, item_id), entry in top_items
+        ],
+    }
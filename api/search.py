@@ -0,0 +1,296 @@
+"""
+Catalog search across every active shop (GET /api/catalog/search/?q=).
+
+Matches item names, and the extras of items that have them, word by word:
+every word of the query must be the start of some word of the item
+("jol ric" finds "Jollof Rice"). Name matches outrank extras matches, and
+whole words outrank prefixes; ties go by name.
+
+On PostgreSQL the database does the work: a tsvector prefix query ranked with
+ts_rank plus trigram similarity on the name, backed by the GIN indexes
+created in migration 0025 (and by ensure_postgres_indexes() for databases
+built straight from the models, like test databases). Elsewhere (SQLite in development) an in-process
+PrefixIndex answers searches from memory. It is built on first use, kept
+current by item and shop signals in this process, and rebuilt after
+CATALOG_SEARCH_TTL seconds to pick up changes made by other processes; one
+thread rebuilds it while the others keep answering from the expired copy.
+"""
+import bisect
+import re
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import CatalogItem
+
+RESULT_FIELDS = ('id', 'kind', 'name', 'price', 'image', 'shop_id', 'shop__name')
+
+# keeps a pathological query from fanning out over the whole catalog
+MAX_TERMS = 5
+
+# word weights; the best match of each query term counts
+NAME_WORD, NAME_PREFIX, EXTRAS_WORD, EXTRAS_PREFIX = 4, 3, 2, 1
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text):
+    return _WORD.findall(text.lower()) if text else []
+
+
+def terms(query):
+    return words(query)[:MAX_TERMS]
+
+
+def searchable_items():
+    return CatalogItem.objects.filter(status=True, shop__is_active=True)
+
+
+def _result(row, score):
+    return {
+        'id': row['id'],
+        'kind': row['kind'],
+        'name': row['name'],
+        'price': row['price'],
+        'image': row['image'],
+        'shop_id': row['shop_id'],
+        'shop_name': row['shop__name'],
+        'score': score,
+    }
+
+
+class PrefixIndex:
+    """Word postings for names and extras, with a sorted word list for prefix lookups."""
+
+    def __init__(self, rows=()):
+        self.rows = {}
+        self.name_postings = {}
+        self.extras_postings = {}
+        for row in rows:
+            self._add(row)
+        self.words = sorted(self.name_postings.keys() | self.extras_postings.keys())
+
+    def _postings(self, row):
+        return ((self.name_postings, set(words(row['name']))),
+                (self.extras_postings, set(words(row['extras']))))
+
+    def _add(self, row):
+        self.rows[row['id']] = row
+        for postings, row_words in self._postings(row):
+            for word in row_words:
+                postings.setdefault(word, set()).add(row['id'])
+
+    def _remove(self, item_id):
+        row = self.rows.pop(item_id, None)
+        if row is None:
+            return
+        for postings, row_words in self._postings(row):
+            for word in row_words:
+                ids = postings.get(word)
+                if ids is not None:
+                    ids.discard(item_id)
+                    if not ids:
+                        del postings[word]
+        # words left without postings stay in self.words and match nothing;
+        # pruning the sorted list on every removal would cost more than it saves
+
+    def upsert(self, rows, ids):
+        """Replace the items `ids` with `rows` (ids missing from `rows` are dropped)."""
+        for item_id in ids:
+            self._remove(item_id)
+        for row in rows:
+            self._add(row)
+            for _, row_words in self._postings(row):
+                for word in row_words:
+                    position = bisect.bisect_left(self.words, word)
+                    if position == len(self.words) or self.words[position] != word:
+                        self.words.insert(position, word)
+
+    def _term_scores(self, term):
+        scores = {}
+        all_words = self.words
+        for position in range(bisect.bisect_left(all_words, term), len(all_words)):
+            word = all_words[position]
+            if not word.startswith(term):
+                break
+            exact = word == term
+            for item_id in self.extras_postings.get(word, ()):
+                score = EXTRAS_WORD if exact else EXTRAS_PREFIX
+                if scores.get(item_id, 0) < score:
+                    scores[item_id] = score
+            for item_id in self.name_postings.get(word, ()):
+                score = NAME_WORD if exact else NAME_PREFIX
+                if scores.get(item_id, 0) < score:
+                    scores[item_id] = score
+        return scores
+
+    def search(self, query_terms):
+        """Ranked [(score, row)] for items matching every term."""
+        scores = None
+        # rarest-looking (longest) term first keeps the intersections small
+        for term in sorted(query_terms, key=len, reverse=True):
+            term_scores = self._term_scores(term)
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {item_id: score + term_scores[item_id]
+                          for item_id, score in scores.items() if item_id in term_scores}
+            if not scores:
+                return []
+        rows = self.rows
+        ranked = sorted(scores.items(), key=lambda pair: (-pair[1], rows[pair[0]]['name_key'], pair[0]))
+        return [(score, rows[item_id]) for item_id, score in ranked]
+
+
+def _load_rows(queryset):
+    rows = []
+    for row in queryset.values(*RESULT_FIELDS, 'extras'):
+        row['name_key'] = row['name'].lower()
+        rows.append(row)
+    return rows
+
+
+_index = None
+_built_at = 0.0
+_lock = threading.Lock()
+# held while (re)building the index, so only one thread does it at a time
+_build_lock = threading.Lock()
+
+
+def _ttl():
+    return getattr(settings, 'CATALOG_SEARCH_TTL', 60)
+
+
+def get_index():
+    global _index, _built_at
+    with _lock:
+        index, age = _index, time.monotonic() - _built_at
+    if index is not None and age < _ttl():
+        return index
+    # with an expired index to fall back on, don't wait for another thread's rebuild
+    if not _build_lock.acquire(blocking=index is None):
+        return index
+    try:
+        with _lock:
+            if _index is not None and time.monotonic() - _built_at < _ttl():
+                return _index
+        index = PrefixIndex(_load_rows(searchable_items()))
+        with _lock:
+            _index, _built_at = index, time.monotonic()
+        return index
+    finally:
+        _build_lock.release()
+
+
+def invalidate():
+    """Drop the in-memory index; the next search rebuilds it."""
+    global _index
+    with _lock:
+        _index = None
+
+
+def refresh_items(ids):
+    """Re-read `ids` into the in-memory index (if built) once the transaction commits."""
+    ids = set(ids)
+    if not ids or connection.vendor == 'postgresql':
+        return
+
+    def refresh():
+        if _index is None:
+            return
+        rows = _load_rows(searchable_items().filter(pk__in=ids))
+        with _lock:
+            if _index is not None:
+                _index.upsert(rows, ids)
+
+    transaction.on_commit(refresh)
+
+
+def _memory_search(query_terms):
+    index = get_index()
+    with _lock:
+        return [_result(row, score) for score, row in index.search(query_terms)]
+
+
+def postgres_indexes():
+    """The GIN indexes searches rely on, as created by migration 0025."""
+    from django.contrib.postgres.indexes import GinIndex, OpClass
+    from django.contrib.postgres.search import SearchVector
+
+    return [
+        # the same expression _postgres_search queries, so the planner can use it
+        GinIndex(SearchVector('name', 'extras', config='simple'), name='catalogitem_search_idx'),
+        GinIndex(OpClass('name', name='gin_trgm_ops'), name='catalogitem_name_trgm_idx'),
+    ]
+
+
+def ensure_postgres_indexes(using='default'):
+    """
+    Create pg_trgm and the search indexes if they are missing, e.g. in test
+    databases built straight from the models. Runs after every migrate on
+    PostgreSQL (see ApiConfig.ready).
+    """
+    from django.db import connections
+
+    db = connections[using]
+    if db.vendor != 'postgresql':
+        return
+    table = CatalogItem._meta.db_table
+    with db.cursor() as cursor:
+        if table not in db.introspection.table_names(cursor):
+            # migrated back to before catalog items existed
+            return
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        existing = db.introspection.get_constraints(cursor, table)
+    with db.schema_editor() as schema_editor:
+        for index in postgres_indexes():
+            if index.name not in existing:
+                schema_editor.add_index(CatalogItem, index)
+
+
+def _postgres_search(query, query_terms):
+    from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+
+    # matches the expression of the GIN index in migration 0025
+    vector = SearchVector('name', 'extras', config='simple')
+    prefix_query = SearchQuery(' & '.join(f"{term}:*" for term in query_terms), search_type='raw', config='simple')
+    rows = (
+        searchable_items()
+        .annotate(search=vector)
+        .filter(search=prefix_query)
+        .annotate(score=SearchRank(vector, prefix_query) + TrigramSimilarity('name', query))
+        .order_by('-score', 'name', 'id')
+        .values(*RESULT_FIELDS, 'score')
+    )
+    return _LazyResults(rows)
+
+
+class _LazyResults:
+    """A values() queryset that paginators can slice and count, yielding result dicts."""
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def count(self):
+        return self.queryset.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        rows = self.queryset[index]
+        if isinstance(index, slice):
+            return [_result(row, row['score']) for row in rows]
+        return _result(rows, rows['score'])
+
+
+def search(query):
+    """Ranked result dicts (or a lazy sequence of them) for `query`; empty if it has no words."""
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    if connection.vendor == 'postgresql':
+        return _postgres_search(query, query_terms)
+    return _memory_search(query_terms)
@@ -1,9 +1,13 @@
 from django.contrib.auth.models import User
 import re
 from decimal import Decimal, ROUND_HALF_UP
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import models, transaction
 from rest_framework import serializers
-from api.models import FoodItems, UserProfile, Shop, ElectronicsItems, GroceryItems
+from api.models import CatalogItem, FoodItems, UserProfile, Shop, ElectronicsItems, GroceryItems
 from .models import Order, OrderItem, Payment
+from .authentication import ANONYMOUS, get_principal
+from . import inventory
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -119,8 +123,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         if role is not None:
             can_assign = (
                 request
-                and getattr(request.user, 'userprofile', None)
-                and request.user.userprofile.is_super_admin
+                and get_principal(request).is_super_admin
             )
             if not can_assign:
                 raise serializers.ValidationError({"role": "You do not have permission to change roles."})
@@ -130,8 +133,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         if shop is not None:
             can_assign_shop = (
                 request
-                and getattr(request.user, 'userprofile', None)
-                and request.user.userprofile.is_super_admin
+                and get_principal(request).is_super_admin
             )
             if not can_assign_shop:
                 raise serializers.ValidationError({"shop_id": "You do not have permission to assign shops."})
@@ -139,8 +141,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         elif 'shop' in validated_data and shop is None:  # If shop_id was explicitly set to null
             can_assign_shop = (
                 request
-                and getattr(request.user, 'userprofile', None)
-                and request.user.userprofile.is_super_admin
+                and get_principal(request).is_super_admin
             )
             if not can_assign_shop:
                 raise serializers.ValidationError({"shop_id": "You do not have permission to assign shops."})
@@ -198,7 +199,7 @@ class PasswordResetSerializer(serializers.Serializer):
 class ShopSerializer(serializers.ModelSerializer):
     class Meta:
         model = Shop
-        fields = ['id', 'name', 'description', 'image', 'is_active', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'description', 'image', 'catalog_type', 'is_active', 'created_at', 'updated_at']
         read_only_fields = ['created_at', 'updated_at']
 
 
@@ -220,7 +221,7 @@ class FoodSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = FoodItems
-        fields = ['id', 'shop', 'shop_id', 'name', 'price', 'image', 'status', 'extras', 'created_at']
+        fields = ['id', 'shop', 'shop_id', 'name', 'price', 'image', 'status', 'stock', 'extras', 'created_at']
         read_only_fields = ['created_at']
 
 
@@ -235,7 +236,7 @@ class ElectronicsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ElectronicsItems
-        fields = ['id', 'shop', 'shop_id', 'name', 'price', 'image', 'status', 'created_at']
+        fields = ['id', 'shop', 'shop_id', 'name', 'price', 'image', 'status', 'stock', 'created_at']
         read_only_fields = ['created_at']
 
 
@@ -250,23 +251,98 @@ class GrocerySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = GroceryItems
-        fields = ['id', 'shop', 'shop_id', 'name', 'price', 'image', 'status', 'created_at']
+        fields = ['id', 'shop', 'shop_id', 'name', 'price', 'image', 'status', 'stock', 'created_at']
         read_only_fields = ['created_at']
 
 
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """
+    PrimaryKeyRelatedField that resolves pks from the instances batch-loaded by
+    OrderItemListSerializer, instead of issuing one query per line item.
+    Falls back to the normal per-pk lookup when used outside that list.
+    """
+
+    def to_internal_value(self, data):
+        list_serializer = getattr(self.parent, 'parent', None)
+        instances = getattr(list_serializer, 'prefetched', {}).get(self.field_name)
+        if instances is None:
+            return super().to_internal_value(data)
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+        except DjangoValidationError:
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return instances[pk]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+
+    def use_pk_only_optimization(self):
+        # food_item etc. are OrderItem properties over catalog_item, not FK
+        # columns, so read the (already loaded) item instead of a *_id attribute
+        return False
+
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    """
+    Collects every item pk in the payload and loads them all (with their
+    shops) in a single query before the child serializers validate the lines.
+    """
+
+    ITEM_FIELDS = ['food_item', 'electronics_item', 'grocery_item']
+
+    def to_internal_value(self, data):
+        self.prefetched = self._prefetch(data) if isinstance(data, list) else {}
+        try:
+            return super().to_internal_value(data)
+        finally:
+            self.prefetched = {}
+
+    def _prefetch(self, data):
+        to_python = CatalogItem._meta.pk.to_python
+        wanted = {}
+        for name in self.ITEM_FIELDS:
+            pks = wanted[name] = set()
+            for line in data:
+                value = line.get(name) if isinstance(line, dict) else None
+                if value is None or isinstance(value, bool):
+                    continue
+                try:
+                    pks.add(to_python(value))
+                except DjangoValidationError:
+                    # Left for the field itself to report
+                    continue
+
+        all_pks = set().union(*wanted.values())
+        items = {}
+        if all_pks:
+            items = {item.pk: item for item in CatalogItem.objects.filter(pk__in=all_pks).select_related('shop')}
+
+        prefetched = {}
+        for name in self.ITEM_FIELDS:
+            # an id only counts for the field matching its kind (food_item → food, ...)
+            kind = self.child.fields[name].get_queryset().model.KIND
+            prefetched[name] = {
+                pk: items[pk] for pk in wanted[name] if pk in items and items[pk].kind == kind
+            }
+        return prefetched
+
+
 class OrderItemSerializer(serializers.ModelSerializer):
     # For writing - accept any of the three item types
-    food_item = serializers.PrimaryKeyRelatedField(
+    food_item = PrefetchedPrimaryKeyRelatedField(
         queryset=FoodItems.objects.all(), 
         required=False, 
         allow_null=True
     )
-    electronics_item = serializers.PrimaryKeyRelatedField(
+    electronics_item = PrefetchedPrimaryKeyRelatedField(
         queryset=ElectronicsItems.objects.all(), 
         required=False, 
         allow_null=True
     )
-    grocery_item = serializers.PrimaryKeyRelatedField(
+    grocery_item = PrefetchedPrimaryKeyRelatedField(
         queryset=GroceryItems.objects.all(), 
         required=False, 
         allow_null=True
@@ -286,6 +362,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
 
     class Meta:
         model  = OrderItem
+        list_serializer_class = OrderItemListSerializer
         fields = [
             'food_item', 'electronics_item', 'grocery_item',
             'quantity', 'price',
@@ -308,6 +385,76 @@ class OrderItemSerializer(serializers.ModelSerializer):
         return data
 
 
+class CustomerResolver:
+    """
+    Builds the `customer` block of the orders serialized for one request.
+    Whether the requester may see other customers is worked out once, and the
+    visible customers (with their profiles) are loaded in a single query.
+    """
+
+    def __init__(self, request=None, include_all=False):
+        self.principal = get_principal(request) if request is not None else ANONYMOUS
+        self.include_all = include_all
+        self.customers = {}
+
+    @classmethod
+    def for_context(cls, context):
+        resolver = context.get('customer_resolver')
+        if resolver is None:
+            resolver = context['customer_resolver'] = cls(
+                context.get('request'), include_all=context.get('include_customer', False)
+            )
+        return resolver
+
+    def may_see(self, user_id):
+        # include_all is set by callers serializing for an audience already checked to be staff
+        if self.include_all:
+            return True
+        if not self.principal.is_authenticated:
+            return False
+        return user_id == self.principal.user_id or self.principal.is_staff
+
+    def load(self, orders):
+        self.load_users(order.user_id for order in orders)
+
+    def load_users(self, user_ids):
+        user_ids = {user_id for user_id in user_ids if self.may_see(user_id)} - set(self.customers)
+        if not user_ids:
+            return
+        for user in User.objects.filter(pk__in=user_ids).select_related('userprofile'):
+            try:
+                role = user.userprofile.role
+            except UserProfile.DoesNotExist:
+                role = None
+            self.customers[user.pk] = {
+                "id": user.id,
+                "username": user.username,
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "role": role,
+            }
+
+    def customer(self, order):
+        return self.customer_for(order.user_id)
+
+    def customer_for(self, user_id):
+        if not self.may_see(user_id):
+            return None
+        if user_id not in self.customers:
+            self.load_users([user_id])
+        return self.customers.get(user_id)
+
+
+class OrderListSerializer(serializers.ListSerializer):
+    """Resolves the customers of a whole page of orders before serializing it."""
+
+    def to_representation(self, data):
+        orders = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        if 'customer' in self.child.fields:
+            CustomerResolver.for_context(self.context).load(orders)
+        return super().to_representation(orders)
+
+
 class OrderSerializer(serializers.ModelSerializer):
     items       = OrderItemSerializer(many=True, write_only=True)
     order_items = OrderItemSerializer(source='items', many=True, read_only=True)
@@ -327,7 +474,29 @@ class OrderSerializer(serializers.ModelSerializer):
             'order_items', # for GET
         ]
         read_only_fields = ['id', 'created_at', 'total_price', 'order_items', 'status', 'customer', 'shop']
-
+        list_serializer_class = OrderListSerializer
+
+    ITEM_FIELDS = OrderItemListSerializer.ITEM_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Sparse fieldsets: GET ...?fields=id,status,created_at
+        requested = self.requested_fields(self.context.get('request'))
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    @staticmethod
+    def requested_fields(request):
+        """Return the set of fields asked for with ?fields=, or None for all of them."""
+        if request is None or request.method != 'GET':
+            return None
+        fields = request.query_params.get('fields') if hasattr(request, 'query_params') else None
+        if not fields:
+            return None
+        return {name.strip() for name in fields.split(',') if name.strip()}
+
+    @transaction.atomic
     def create(self, validated_data):
         items_data = validated_data.pop('items')
         user       = self.context['request'].user
@@ -335,117 +504,55 @@ class OrderSerializer(serializers.ModelSerializer):
         if not items_data:
             raise serializers.ValidationError({"items": "Order must contain at least one item."})
 
-        # Determine shop from first item (all items should be from same shop)
-        first_item_data = items_data[0]
+        # 1) Price every line in memory; all items must come from one shop
+        # (items arrive with their shops already loaded by OrderItemListSerializer)
         shop = None
-        
-        if first_item_data.get('food_item'):
-            shop = first_item_data['food_item'].shop
-        elif first_item_data.get('electronics_item'):
-            shop = first_item_data['electronics_item'].shop
-        elif first_item_data.get('grocery_item'):
-            shop = first_item_data['grocery_item'].shop
-        
-        if not shop:
-            raise serializers.ValidationError({"items": "Items must be assigned to a shop."})
-
-        # Validate all items are from the same shop
+        lines = []
+        total = Decimal('0.00')
         for item_data in items_data:
-            item_shop = None
-            if item_data.get('food_item'):
-                item_shop = item_data['food_item'].shop
-            elif item_data.get('electronics_item'):
-                item_shop = item_data['electronics_item'].shop
-            elif item_data.get('grocery_item'):
-                item_shop = item_data['grocery_item'].shop
-            
-            if item_shop != shop:
+            field = next(name for name in self.ITEM_FIELDS if item_data.get(name))
+            item = item_data[field]
+
+            if not item.shop:
+                raise serializers.ValidationError({"items": "Items must be assigned to a shop."})
+            if shop is None:
+                shop = item.shop
+            elif item.shop_id != shop.id:
                 raise serializers.ValidationError({"items": "All items must be from the same shop."})
 
-        # 1) Create the order header
-        order = Order.objects.create(user=user, shop=shop)
-
-        # 2) Populate the line items & tally total
-        total = Decimal('0.00')
-        for item_data in items_data:
             qty = item_data['quantity']
-            line_price = Decimal('0.00')
-            
-            # Determine which item type and calculate price
-            if item_data.get('food_item'):
-                item = item_data['food_item']
-                item_price = Decimal(str(item.price))
-                line_price = (item_price * Decimal(qty)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                OrderItem.objects.create(
-                    order=order,
-                    food_item=item,
-                    quantity=qty,
-                    price=line_price
-                )
-            elif item_data.get('electronics_item'):
-                item = item_data['electronics_item']
-                item_price = Decimal(str(item.price))
-                line_price = (item_price * Decimal(qty)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                OrderItem.objects.create(
-                    order=order,
-                    electronics_item=item,
-                    quantity=qty,
-                    price=line_price
-                )
-            elif item_data.get('grocery_item'):
-                item = item_data['grocery_item']
-                item_price = Decimal(str(item.price))
-                line_price = (item_price * Decimal(qty)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-                OrderItem.objects.create(
-                    order=order,
-                    grocery_item=item,
-                    quantity=qty,
-                    price=line_price
-                )
-            
+            item_price = Decimal(str(item.price))
+            line_price = (item_price * Decimal(qty)).quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
+            lines.append(OrderItem(**{field: item}, quantity=qty, price=line_price))
             total += line_price
 
-        # 3) Add delivery fee
+        # 2) Add delivery fee
         if total > Decimal('150.00'):
             delivery_fee = Decimal('0.00')
         else:
             delivery_fee = Decimal('5.00')
         total += delivery_fee
 
-        # 4) Save the total and return
-        order.total_price = total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP)
-        order.save(update_fields=['total_price'])
+        # 3) Take the units from stock; a shortfall rolls the whole order back
+        try:
+            inventory.reserve(inventory.quantities_for((line.catalog_item_id, line.quantity) for line in lines))
+        except inventory.InsufficientStock as exc:
+            raise serializers.ValidationError({"items": str(exc)})
+
+        # 4) Write the order header with its final total, then all lines at once
+        order = Order.objects.create(
+            user=user,
+            shop=shop,
+            total_price=total.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP),
+            stock_reserved=True,
+        )
+        for line in lines:
+            line.order = order
+        OrderItem.objects.bulk_create(lines)
         return order
 
     def get_customer(self, obj):
-        request = self.context.get('request')
-        try:
-            profile = obj.user.userprofile
-            role = profile.role
-        except UserProfile.DoesNotExist:
-            profile = None
-            role = None
-
-        if request and hasattr(request, 'user'):
-            if obj.user == request.user:
-                return {
-                    "id": obj.user.id,
-                    "username": obj.user.username,
-                    "first_name": obj.user.first_name,
-                    "last_name": obj.user.last_name,
-                    "role": role,
-                }
-
-            requester_profile = getattr(request.user, 'userprofile', None)
-            if requester_profile and requester_profile.is_staff_role:
-                return {
-                    "id": obj.user.id,
-                    "username": obj.user.username,
-                    "first_name": obj.user.first_name,
-                    "last_name": obj.user.last_name,
-                    "role": role,
-                }
-        return None
+        return CustomerResolver.for_context(self.context).customer(obj)
 
 
 class OrderUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,61 @@
+"""
+In-process registry of shop id → catalog type and active flag.
+
+FoodListView resolves its serializer and queryset from here instead of
+querying the shop on every request. The whole table is loaded in one query
+and kept for SHOP_REGISTRY_TTL seconds. A Shop save or delete clears it in
+the saving process; other processes pick the change up when their copy
+expires. An id the registry has not seen triggers a reload, so shops
+created elsewhere show up at once, but at most one reload per
+SHOP_REGISTRY_MISS_RELOAD_SECONDS: requests for made-up ids can't turn every
+lookup into a full-table query.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+
+from .models import Shop
+
+ShopInfo = namedtuple('ShopInfo', ['id', 'catalog_type', 'is_active'])
+
+_shops = None
+_loaded_at = 0.0
+_lock = threading.Lock()
+
+
+def _load():
+    global _shops, _loaded_at
+    shops = {
+        shop_id: ShopInfo(shop_id, catalog_type, is_active)
+        for shop_id, catalog_type, is_active in Shop.objects.values_list('id', 'catalog_type', 'is_active')
+    }
+    with _lock:
+        _shops = shops
+        _loaded_at = time.monotonic()
+    return shops
+
+
+def get(shop_id):
+    """ShopInfo for `shop_id` (an int or digit string), or None if there is no such shop."""
+    try:
+        shop_id = int(shop_id)
+    except (TypeError, ValueError):
+        return None
+    shops, fresh = _shops, False
+    if shops is None or time.monotonic() - _loaded_at >= getattr(settings, 'SHOP_REGISTRY_TTL', 60):
+        shops, fresh = _load(), True
+    info = shops.get(shop_id)
+    if info is None and not fresh and (
+        time.monotonic() - _loaded_at >= getattr(settings, 'SHOP_REGISTRY_MISS_RELOAD_SECONDS', 1)
+    ):
+        # possibly created by another process since the last load
+        info = _load().get(shop_id)
+    return info
+
+
+def invalidate():
+    global _shops
+    with _lock:
+        _shops = None
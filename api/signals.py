@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import catalog_cache, order_feed, sales, search, shop_registry
+from .models import CatalogItem, ElectronicsItems, FoodItems, GroceryItems, Order, Payment, Shop
+
+
+# Saves through a proxy model are sent with the proxy as sender
+@receiver(post_save, sender=CatalogItem)
+@receiver(post_delete, sender=CatalogItem)
+@receiver(post_save, sender=FoodItems)
+@receiver(post_delete, sender=FoodItems)
+@receiver(post_save, sender=ElectronicsItems)
+@receiver(post_delete, sender=ElectronicsItems)
+@receiver(post_save, sender=GroceryItems)
+@receiver(post_delete, sender=GroceryItems)
+def invalidate_item_catalog(sender, instance, **kwargs):
+    catalog_cache.invalidate_shop(instance.shop_id)
+    search.refresh_items([instance.pk])
+
+
+@receiver(post_save, sender=Shop)
+@receiver(post_delete, sender=Shop)
+def invalidate_shop_catalog(sender, instance, **kwargs):
+    catalog_cache.invalidate_shop(instance.pk)
+    # now for this process's own reads, and again once other connections can see the change
+    shop_registry.invalidate()
+    transaction.on_commit(shop_registry.invalidate)
+    # shop names and active flags are part of every search result
+    transaction.on_commit(search.invalidate)
+
+
+@receiver(post_save, sender=Order)
+def update_sales_rollup_for_order(sender, instance, **kwargs):
+    # Rebuild the day's rollup when an order becomes, or stops being, delivered
+    previous = getattr(instance, '_loaded_status', None)
+    if Order.STATUS_DELIVERED in (instance.status, previous) and instance.status != previous:
+        sales.schedule_rebuild(instance)
+
+
+@receiver(post_save, sender=Order)
+def publish_order_to_kitchen_feed(sender, instance, created, **kwargs):
+    if created:
+        order_feed.publish_saved(instance, order_feed.ORDER_CREATED)
+    elif instance.status != getattr(instance, '_loaded_status', instance.status):
+        order_feed.publish_saved(instance, order_feed.ORDER_STATUS_CHANGED)
+
+
+# Registered after the handlers above so they still see the previous status
+@receiver(post_save, sender=Order)
+def remember_order_status(sender, instance, **kwargs):
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Order)
+def remove_sales_rollup_for_order(sender, instance, **kwargs):
+    if instance.status == Order.STATUS_DELIVERED:
+        sales.schedule_rebuild(instance)
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_kitchen_feed(sender, instance, **kwargs):
+    order_feed.publish_deleted(instance)
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def update_sales_rollup_for_payment(sender, instance, **kwargs):
+    order = Order.objects.filter(pk=instance.order_id, status=Order.STATUS_DELIVERED).first()
+    if order is not None:
+        sales.schedule_rebuild(order)
@@ -0,0 +1,107 @@
+"""
+CSV and NDJSON in and out of the API without holding whole files in memory.
+
+Uploads are read from the request stream line by line; downloads are
+StreamingHttpResponses fed by a row iterator, so a large catalog or order
+history costs the same memory as a small one.
+"""
+import codecs
+import csv
+import json
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+
+
+class TabularError(Exception):
+    pass
+
+
+def output_format(request, default=CSV):
+    """The ?output= format of a download (csv or ndjson); None if it isn't one of them."""
+    value = request.query_params.get('output', default)
+    return value if value in CONTENT_TYPES else None
+
+
+def upload_format(request):
+    """csv or ndjson from the upload's Content-Type, or None."""
+    content_type = request.content_type.split(';')[0].strip().lower()
+    if content_type in ('text/csv', 'application/csv'):
+        return CSV
+    if content_type in ('application/x-ndjson', 'application/jsonlines', 'application/jsonl'):
+        return NDJSON
+    return None
+
+
+def _lines(request):
+    # the underlying HttpRequest reads the body as it goes; neither DRF's
+    # parsers nor request.body ever see the whole upload
+    stream = getattr(request, '_request', request)
+    return codecs.iterdecode(iter(stream.readline, b''), 'utf-8-sig')
+
+
+def read_rows(request, fmt):
+    """
+    Yield (line number, dict) for each record of an upload. Empty CSV cells
+    become None. Raises TabularError for input that isn't CSV/NDJSON at all.
+    """
+    lines = _lines(request)
+    try:
+        if fmt == CSV:
+            reader = csv.DictReader(lines)
+            for row in reader:
+                yield reader.line_num, {key: (value if value != '' else None)
+                                        for key, value in row.items() if key is not None}
+        else:
+            for number, line in enumerate(lines, start=1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if not isinstance(row, dict):
+                    raise TabularError(f"Line {number} is not a JSON object.")
+                yield number, row
+    except (UnicodeDecodeError, csv.Error, ValueError) as exc:
+        raise TabularError(str(exc)) from exc
+
+
+class _Echo:
+    """A file-like object whose write() returns what it was given, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    # the same ISO 8601 timestamps as the NDJSON output
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _encode(fmt, fieldnames, rows):
+    if fmt == CSV:
+        writer = csv.writer(_Echo())
+        yield writer.writerow(fieldnames)
+        for row in rows:
+            yield writer.writerow([_csv_value(value) for value in row])
+    else:
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+        for row in rows:
+            yield encoder.encode(dict(zip(fieldnames, row))) + '\n'
+
+
+def streaming_response(fmt, fieldnames, rows, filename):
+    """
+    Stream `rows` (tuples in `fieldnames` order) as CSV, header line first,
+    or as one JSON object per line.
+    """
+    response = StreamingHttpResponse(_encode(fmt, fieldnames, rows), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
@@ -1,3 +1,1350 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipIf, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, transaction
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .models import (
+    CatalogItem,
+    DailyShopSales,
+    ElectronicsItems,
+    FoodItems,
+    GroceryItems,
+    IdempotencyKey,
+    Order,
+    OrderEvent,
+    OrderItem,
+    OutboundEmail,
+    Payment,
+    PaystackEvent,
+    Shop,
+    UserProfile,
+)
+from . import events, inventory, outbox, payments, search, shop_registry, throttling
+from .fake_paystack import FakePaystack
+from .paystack import CircuitBreaker, PaystackClient, PaystackError, PaystackUnavailable
+from .serializers import OrderSerializer
+
+
+class CatalogCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.item = FoodItems.objects.create(
+            shop=self.shop, name='Jollof Rice', price=40.0, image='jollof.jpg', status=True
+        )
+        self.url = reverse('foodItem-list') + f'?shop_id={self.shop.id}'
+
+    def test_repeat_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()[0]['name'], 'Jollof Rice')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_matching_etag_returns_304(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_item_change_invalidates_shop_catalog(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.item.name = 'Jollof Rice Special'
+            self.item.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()[0]['name'], 'Jollof Rice Special')
+
+
+class ShopRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.shop = Shop.objects.create(name='Best Tech Point-Ashesi', catalog_type=Shop.CATALOG_ELECTRONICS)
+        FoodItems.objects.create(shop=self.shop, name='Old Stock', price=5, image='x.jpg', status=True)
+        ElectronicsItems.objects.create(shop=self.shop, name='Cable', price=50, image='cable.jpg', status=True)
+        self.url = reverse('foodItem-list') + f'?shop_id={self.shop.id}'
+
+    def test_catalog_type_picks_items_without_a_shop_query(self):
+        shop_registry.get(self.shop.id)
+        with self.assertNumQueries(1):  # just the items
+            items = self.client.get(self.url).json()
+        self.assertEqual([item['name'] for item in items], ['Cable'])
+
+    def test_shop_save_refreshes_registry(self):
+        self.assertEqual(shop_registry.get(self.shop.id).catalog_type, Shop.CATALOG_ELECTRONICS)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.shop.catalog_type = Shop.CATALOG_FOOD
+            self.shop.save()
+        self.assertEqual([item['name'] for item in self.client.get(self.url).json()], ['Old Stock'])
+
+    def test_inactive_or_unknown_shop_lists_nothing(self):
+        Shop.objects.filter(pk=self.shop.pk).update(is_active=False)
+        shop_registry.invalidate()
+        self.assertEqual(self.client.get(self.url).json(), [])
+        self.assertIsNone(shop_registry.get('not-a-number'))
+
+    def test_unknown_ids_reload_the_registry_at_most_once_per_interval(self):
+        shop_registry.invalidate()
+        shop_registry.get(self.shop.id)
+        with override_settings(SHOP_REGISTRY_MISS_RELOAD_SECONDS=60), self.assertNumQueries(0):
+            for shop_id in range(100_000, 100_050):
+                self.assertIsNone(shop_registry.get(shop_id))
+        with override_settings(SHOP_REGISTRY_MISS_RELOAD_SECONDS=0):
+            new_shop = Shop.objects.create(name='Created elsewhere')
+            self.assertIsNotNone(shop_registry.get(new_shop.id))
+
+
+class OrderCreateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='kofi', password='Secret123!')
+        UserProfile.objects.create(user=self.user, phone_number='0200000000',
+                                   hostel_or_office_name='Hall A', room_or_office_number='1')
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.items = [
+            FoodItems.objects.create(shop=self.shop, name=f'Dish {i}', price=12.5, image='dish.jpg', status=True)
+            for i in range(20)
+        ]
+        self.request = RequestFactory().post('/api/orders/')
+        self.request.user = self.user
+
+    def _serializer(self, lines):
+        serializer = OrderSerializer(data={'items': lines}, context={'request': self.request})
+        serializer.is_valid(raise_exception=True)
+        return serializer
+
+    def test_create_prices_lines_and_adds_delivery_fee(self):
+        order = self._serializer([
+            {'food_item': self.items[0].id, 'quantity': 2},
+            {'food_item': self.items[1].id, 'quantity': 1},
+        ]).save()
+        self.assertEqual(order.shop, self.shop)
+        self.assertEqual(order.total_price, Decimal('42.50'))
+        self.assertEqual(sorted(order.items.values_list('price', flat=True)), [Decimal('12.50'), Decimal('25.00')])
+
+    def test_create_query_count_is_independent_of_cart_size(self):
+        for size in (1, 20):
+            serializer = self._serializer([{'food_item': item.id, 'quantity': 1} for item in self.items[:size]])
+            # savepoint + stock update + tracked-shop lookup + order insert + bulk line insert + release
+            with self.assertNumQueries(6):
+                order = serializer.save()
+            self.assertEqual(order.items.count(), size)
+
+    def test_mixed_shops_are_rejected_without_partial_writes(self):
+        other_shop = Shop.objects.create(name='Giyark Mini Mart')
+        grocery = GroceryItems.objects.create(shop=other_shop, name='Milk', price=8, image='milk.jpg', status=True)
+        serializer = self._serializer([
+            {'food_item': self.items[0].id, 'quantity': 1},
+            {'grocery_item': grocery.id, 'quantity': 1},
+        ])
+        with self.assertRaises(serializers.ValidationError):
+            serializer.save()
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+
+    def test_validation_query_count_is_independent_of_cart_size(self):
+        for size in (1, 20):
+            serializer = OrderSerializer(
+                data={'items': [{'food_item': item.id, 'quantity': 1} for item in self.items[:size]]},
+                context={'request': self.request},
+            )
+            with self.assertNumQueries(1):
+                self.assertTrue(serializer.is_valid())
+
+    def test_unknown_item_is_reported_on_its_line(self):
+        serializer = OrderSerializer(
+            data={'items': [{'food_item': self.items[0].id, 'quantity': 1}, {'food_item': 9999, 'quantity': 1}]},
+            context={'request': self.request},
+        )
+        self.assertFalse(serializer.is_valid())
+        self.assertEqual(serializer.errors['items'][0], {})
+        self.assertIn('food_item', serializer.errors['items'][1])
+
+
+class InventoryTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='kofi', password='Secret123!')
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.item = FoodItems.objects.create(shop=self.shop, name='Jollof', price=20, image='jollof.jpg',
+                                             status=True, stock=3)
+        self.untracked = FoodItems.objects.create(shop=self.shop, name='Water', price=2, image='water.jpg',
+                                                  status=True)
+        self.client.force_authenticate(self.user)
+
+    def order(self, quantity):
+        return self.client.post(reverse('order-list-create'), {'items': [
+            {'food_item': self.item.pk, 'quantity': quantity},
+            {'food_item': self.untracked.pk, 'quantity': 5},
+        ]}, format='json')
+
+    def test_last_units_sell_out_the_item(self):
+        self.assertEqual(self.order(3).status_code, 201)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock, self.item.status), (0, False))
+        self.untracked.refresh_from_db()
+        self.assertEqual((self.untracked.stock, self.untracked.status), (None, True))
+
+    def test_shortfall_rejects_the_whole_order(self):
+        response = self.order(4)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Jollof', str(response.json()['items']))
+        self.assertFalse(Order.objects.exists())
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 3)
+
+    def test_deleting_the_order_releases_its_units_once(self):
+        order_id = self.order(3).json()['id']
+        self.assertEqual(self.client.delete(reverse('order-detail', args=[order_id])).status_code, 204)
+        self.item.refresh_from_db()
+        self.assertEqual((self.item.stock, self.item.status), (3, True))
+        self.assertFalse(inventory.release_order(order_id))
+
+    def test_failed_payment_releases_and_late_success_reserves_again(self):
+        order = Order.objects.get(pk=self.order(2).json()['id'])
+        payment = Payment.objects.create(user=self.user, order=order, amount=order.total_price,
+                                         payment_method='card', paystack_reference='ref-stock')
+        payments.apply_status(payment, 'failed')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 3)
+        payments.apply_status(payment, 'success')
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.stock, 1)
+        order.refresh_from_db()
+        self.assertTrue(order.stock_reserved)
+
+    def test_restocking_a_sold_out_item_makes_it_available(self):
+        self.order(3)
+        item = FoodItems.objects.get(pk=self.item.pk)
+        self.assertTrue(item.sold_out)
+        item.stock = 10
+        item.save(update_fields=['stock'])
+        item.refresh_from_db()
+        self.assertEqual((item.status, item.sold_out), (True, False))
+
+    def test_items_switched_off_by_the_shop_stay_off(self):
+        order_id = self.order(3).json()['id']
+        item = FoodItems.objects.get(pk=self.item.pk)
+        item.status = True
+        item.save()  # switched back on by hand at zero stock: still sold out
+        self.assertEqual((item.status, item.sold_out), (False, True))
+
+        inventory.release_order(order_id)
+        item = FoodItems.objects.get(pk=self.item.pk)
+        self.assertEqual((item.stock, item.status), (3, True))
+        order_id = self.order(2).json()['id']
+        item = FoodItems.objects.get(pk=self.item.pk)
+        item.status = False  # the shop's own decision, e.g. the kitchen is out of gas
+        item.save()
+        self.client.delete(reverse('order-detail', args=[order_id]))
+        item.refresh_from_db()
+        self.assertEqual((item.stock, item.status), (3, False))
+        item.stock = 0
+        item.save()
+        item.stock = 10
+        item.save()
+        self.assertFalse(item.status)
+
+
+class InventoryConcurrencyTests(TransactionTestCase):
+    def test_concurrent_orders_never_oversell(self):
+        shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        item = FoodItems.objects.create(shop=shop, name='Jollof', price=20, image='jollof.jpg', status=True, stock=5)
+        buyers = 20
+        start = threading.Barrier(buyers)
+        outcomes = []
+
+        def buy():
+            start.wait()
+            try:
+                while True:
+                    try:
+                        with transaction.atomic():
+                            inventory.reserve({item.pk: 1})
+                        outcomes.append('sold')
+                    except inventory.InsufficientStock:
+                        outcomes.append('sold out')
+                    except OperationalError:
+                        # the in-memory SQLite test database refuses concurrent
+                        # writers instead of queueing them as Postgres does
+                        time.sleep(0.001)
+                        continue
+                    break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy) for _ in range(buyers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes.count('sold'), 5)
+        self.assertEqual(outcomes.count('sold out'), buyers - 5)
+        item.refresh_from_db()
+        self.assertEqual((item.stock, item.status), (0, False))
+
+
+class StaffOrderListTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create_user(username='cook', password='Secret123!')
+        UserProfile.objects.create(user=self.staff, phone_number='0200000000', hostel_or_office_name='Kitchen',
+                                   room_or_office_number='1', role=UserProfile.ROLE_COOK)
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        item = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+        for _ in range(5):
+            order = Order.objects.create(user=self.staff, shop=self.shop, total_price=25)
+            OrderItem.objects.create(order=order, food_item=item, quantity=1, price=20)
+        self.client.force_authenticate(self.staff)
+
+    def test_orders_are_cursor_paginated_newest_first(self):
+        first = self.client.get(reverse('order-manage'), {'page_size': 3}).json()
+        self.assertEqual(len(first['results']), 3)
+        second = self.client.get(first['next']).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next'])
+        ids = [order['id'] for order in first['results'] + second['results']]
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    def test_customers_are_loaded_once_per_page(self):
+        for i in range(10):
+            student = User.objects.create_user(username=f'student{i}', first_name='Ama', password='Secret123!')
+            UserProfile.objects.create(user=student, phone_number='0200000000', hostel_or_office_name='Hall A',
+                                       room_or_office_number=str(i))
+            Order.objects.create(user=student, shop=self.shop, total_price=25)
+        # the page, its line items, then every customer with their profile
+        with self.assertNumQueries(3):
+            results = self.client.get(reverse('order-manage'), {'page_size': 15}).json()['results']
+        self.assertEqual({order['customer']['username'] for order in results},
+                         {'cook'} | {f'student{i}' for i in range(10)})
+        self.assertEqual(results[0]['customer']['role'], UserProfile.ROLE_STUDENT)
+
+    def test_students_only_see_themselves(self):
+        student = User.objects.create_user(username='student', password='Secret123!')
+        order = Order.objects.create(user=self.staff, shop=self.shop, total_price=25)
+        request = RequestFactory().get('/api/orders/')
+        request.user = student
+        data = OrderSerializer([order], many=True, context={'request': request}).data
+        self.assertIsNone(data[0]['customer'])
+
+    def test_compact_view_matches_full_view(self):
+        full = self.client.get(reverse('order-manage')).json()['results']
+        # the page, its lines, the customers, then the shops
+        with self.assertNumQueries(4):
+            compact = self.client.get(reverse('order-manage'), {'view': 'compact'}).json()
+        self.assertEqual(list(compact['shops']), [str(self.shop.pk)])
+        self.assertEqual(compact['shops'][str(self.shop.pk)], full[0]['shop'])
+        for order, flat in zip(full, compact['results']):
+            self.assertEqual({key: order[key] for key in ('id', 'created_at', 'total_price', 'status', 'customer')},
+                             {key: flat[key] for key in ('id', 'created_at', 'total_price', 'status', 'customer')})
+            line, flat_line = order['order_items'][0], flat['order_items'][0]
+            self.assertEqual((flat_line['kind'], flat_line['item_id'], flat_line['item_name'], flat_line['price']),
+                             ('food', line['food_item'], line['item_name'], line['price']))
+
+    def test_sparse_fieldset_skips_nested_items(self):
+        with self.assertNumQueries(1):  # just the page, no line item prefetches
+            response = self.client.get(reverse('order-manage'), {'fields': 'id,status'})
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'status'})
+
+
+class OrderExportTests(APITestCase):
+    def setUp(self):
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        other_shop = Shop.objects.create(name='Akorno')
+        self.manager = User.objects.create_user(username='manager', email='m@example.com', password='Secret123!')
+        UserProfile.objects.create(user=self.manager, phone_number='0200000000', hostel_or_office_name='Kitchen',
+                                   room_or_office_number='1', role=UserProfile.ROLE_SHOP_MANAGER, shop=self.shop)
+        banku = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+        self.order = Order.objects.create(user=self.manager, shop=self.shop, total_price=45)
+        OrderItem.objects.create(order=self.order, food_item=banku, quantity=1, price=20)
+        OrderItem.objects.create(order=self.order, food_item=banku, quantity=1, price=25)
+        Payment.objects.create(user=self.manager, order=self.order, amount=45, payment_method='card',
+                               status='failed', paystack_reference='ref-1')
+        Payment.objects.create(user=self.manager, order=self.order, amount=45, payment_method='momo',
+                               status='success', paystack_reference='ref-2')
+        Order.objects.create(user=self.manager, shop=other_shop, total_price=10)
+        self.client.force_authenticate(self.manager)
+
+    def export(self, **params):
+        response = self.client.get(reverse('order-export'), params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_streams_one_row_per_line_of_the_managers_shop(self):
+        with self.assertNumQueries(0):
+            stream = iter(self.client.get(reverse('order-export')).streaming_content)
+            self.assertTrue(next(stream).startswith(b'order_id,created_at,status,shop_id,shop_name,customer,'))
+        # the lines, then the payments of up to CHUNK_SIZE of them at once
+        with self.assertNumQueries(2):
+            lines = self.export().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(line.startswith(f'{self.order.pk},') for line in lines[1:]))
+        *_, item_name, quantity, unit_price, payment_status, method, reference, amount = lines[1].split(',')
+        self.assertEqual((item_name, quantity, unit_price), ('Banku', '1', '20.00'))
+        # the latest payment, whatever its status
+        self.assertEqual((payment_status, method, reference, Decimal(amount)), ('success', 'momo', 'ref-2', 45))
+
+        row = json.loads(self.export(output='ndjson').splitlines()[1])
+        self.assertEqual((row['unit_price'], row['payment_reference']), ('25.00', 'ref-2'))
+
+    def test_date_range_and_bad_parameters(self):
+        today = timezone.localdate()
+        self.assertEqual(len(self.export(start=str(today), end=str(today)).splitlines()), 3)
+        self.assertEqual(self.export(start=str(today + timedelta(days=1))).splitlines()[1:], [])
+        for params in ({'start': 'yesterday'}, {'shop_id': 'x'}, {'output': 'xml'},
+                       {'start': str(today), 'end': str(today - timedelta(days=1))}):
+            self.assertEqual(self.client.get(reverse('order-export'), params).status_code, 400)
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_querysets_use_indexes(self):
+        shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        FoodItems.objects.create(shop=shop, name='Waakye', price=15, image='waakye.jpg', status=True)
+        call_command('check_query_plans', min_rows=0, stdout=StringIO())
+
+
+class DashboardRollupTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='Secret123!')
+        UserProfile.objects.create(user=self.admin, phone_number='0200000000', hostel_or_office_name='Office',
+                                   room_or_office_number='1', role=UserProfile.ROLE_SUPER_ADMIN)
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.item = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+        self.client.force_authenticate(self.admin)
+
+    def _delivered_order(self, days_ago, quantity):
+        order = Order.objects.create(user=self.admin, shop=self.shop, total_price=20 * quantity)
+        OrderItem.objects.create(order=order, food_item=self.item, quantity=quantity, price=20 * quantity)
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        order.refresh_from_db()
+        Payment.objects.create(user=self.admin, order=order, amount=order.total_price, payment_method='card',
+                               status='success', paystack_reference=f'ref-{order.pk}')
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = Order.STATUS_DELIVERED
+            order.save()
+        return order
+
+    def test_delivery_updates_rollup_and_dashboard_combines_it_with_today(self):
+        self._delivered_order(days_ago=1, quantity=2)
+        self._delivered_order(days_ago=0, quantity=1)
+        yesterday = timezone.localdate() - timedelta(days=1)
+        self.assertEqual(DailyShopSales.objects.get(date=yesterday).total_sales, Decimal('40.00'))
+
+        response = self.client.get(reverse('dashboard-summary'), {
+            'start_date': yesterday.isoformat(), 'end_date': timezone.localdate().isoformat(),
+        }).json()
+        self.assertEqual(response['total_orders'], 2)
+        self.assertEqual(Decimal(str(response['total_sales'])), Decimal('60.00'))
+        self.assertEqual(response['top_items'][0]['food_item_id'], self.item.id)
+        self.assertEqual(response['top_items'][0]['quantity_sold'], 3)
+
+    def test_backfill_rebuilds_missing_rollups(self):
+        self._delivered_order(days_ago=3, quantity=1)
+        DailyShopSales.objects.all().delete()
+        call_command('backfill_daily_sales', stdout=StringIO())
+        self.assertEqual(DailyShopSales.objects.get().order_count, 1)
+
+
+class FailingEmailBackend(LocmemEmailBackend):
+    def send_messages(self, messages):
+        raise ConnectionError("SMTP unavailable")
+
+
+class LeaseCheckingEmailBackend(LocmemEmailBackend):
+    """Records the status each message's outbox row has while SMTP is being talked to."""
+    statuses = []
+
+    def send_messages(self, messages):
+        self.statuses.extend(OutboundEmail.objects.values_list('status', flat=True))
+        return super().send_messages(messages)
+
+
+class EmailOutboxTests(APITestCase):
+    def register(self):
+        return self.client.post(reverse('register'), {
+            'username': 'ama', 'email': 'ama@ashesi.edu.gh', 'password': 'Secret123!',
+            'confirm_password': 'Secret123!', 'first_name': 'Ama', 'last_name': 'Mensah',
+            'phone_number': '0200000000', 'hostel_or_office_name': 'Hall B', 'room_or_office_number': '12',
+        })
+
+    def test_registration_queues_instead_of_sending(self):
+        self.assertEqual(self.register().status_code, 201)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutboundEmail.objects.get()
+        self.assertEqual(queued.to, ['ama@ashesi.edu.gh'])
+        self.assertIn('/api/email-verify/?uid=', queued.body)
+
+    def test_send_outbox_delivers_queued_mail(self):
+        self.register()
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Verify your email')
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.STATUS_SENT)
+
+    @override_settings(EMAIL_BACKEND='api.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        self.register()
+        call_command('send_outbox', stdout=StringIO())
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (OutboundEmail.STATUS_PENDING, 1))
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        self.assertIn('SMTP unavailable', queued.last_error)
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.STATUS_FAILED)
+
+    @override_settings(EMAIL_BACKEND='api.tests.LeaseCheckingEmailBackend')
+    def test_messages_are_leased_before_sending(self):
+        self.register()
+        LeaseCheckingEmailBackend.statuses = []
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(LeaseCheckingEmailBackend.statuses, [OutboundEmail.STATUS_SENDING])
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.STATUS_SENT)
+
+    def test_leased_messages_wait_for_the_lease_to_run_out(self):
+        self.register()
+        # another worker is sending it
+        OutboundEmail.objects.update(status=OutboundEmail.STATUS_SENDING,
+                                     next_attempt_at=timezone.now() + timedelta(minutes=5))
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+        # ...and died before recording the result
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(OutboundEmail.objects.get().status, OutboundEmail.STATUS_SENT)
+
+    @override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_expired_leases_count_as_attempts(self):
+        self.register()
+        # a message whose send kills the worker every time
+        OutboundEmail.objects.update(status=OutboundEmail.STATUS_SENDING, next_attempt_at=timezone.now())
+        claimed = outbox.claim_due(10, timezone.now())
+        self.assertEqual([(email.status, email.attempts) for email in claimed], [(OutboundEmail.STATUS_SENDING, 1)])
+
+        OutboundEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(outbox.claim_due(10, timezone.now()), [])
+        queued = OutboundEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (OutboundEmail.STATUS_FAILED, 2))
+        self.assertIn('Lease expired', queued.last_error)
+
+
+class PaystackClientTests(TestCase):
+    def setUp(self):
+        self.paystack = FakePaystack().start()
+        self.addCleanup(self.paystack.stop)
+
+    def client_for(self, **kwargs):
+        kwargs.setdefault('timeout', (1, 1))
+        return PaystackClient(base_url=self.paystack.url, secret_key='sk_test', **kwargs)
+
+    def test_calls_reuse_one_pooled_connection(self):
+        client = self.client_for()
+        reference = client.initialize_transaction({'amount': 1000, 'email': 'a@b.com'})['data']['reference']
+        for _ in range(3):
+            self.assertEqual(client.verify_transaction(reference)['data']['status'], 'success')
+        self.assertEqual(self.paystack.connections, 1)
+
+    def test_verify_is_retried_but_initialize_is_not(self):
+        client = self.client_for()
+        reference = client.initialize_transaction({'amount': 1000})['data']['reference']
+        self.paystack.fail_next(1, status=503)
+        self.assertEqual(client.verify_transaction(reference)['data']['status'], 'success')
+
+        self.paystack.fail_next(1, status=503)
+        with self.assertRaises(PaystackError):
+            client.initialize_transaction({'amount': 1000})
+        self.assertEqual([method for method, _ in self.paystack.requests].count('POST'), 2)
+
+    def test_slow_provider_times_out(self):
+        self.paystack.latency = 0.5
+        client = self.client_for(timeout=(1, 0.1))
+        with self.assertRaises(PaystackError):
+            client.initialize_transaction({'amount': 1000})
+
+    def test_circuit_opens_after_repeated_failures(self):
+        client = self.client_for(breaker=CircuitBreaker(failure_threshold=2, reset_timeout=60))
+        self.paystack.fail_next(2, status=500)
+        for _ in range(2):
+            with self.assertRaises(PaystackError):
+                client.initialize_transaction({'amount': 1000})
+        with self.assertRaises(PaystackUnavailable):
+            client.initialize_transaction({'amount': 1000})
+        self.assertEqual(len(self.paystack.requests), 2)
+
+    def test_half_open_circuit_lets_one_trial_call_through(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+
+        barrier = threading.Barrier(2)
+        allowed = []
+
+        def call():
+            barrier.wait()
+            allowed.append(breaker.allow())
+
+        threads = [threading.Thread(target=call) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(sorted(allowed), [False, True])
+
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertTrue(breaker.allow())
+        self.assertTrue(breaker.allow())
+
+
+@override_settings(PAYSTACK_SECRET_KEY='sk_test_webhook', PAYSTACK_BASE_URL='http://127.0.0.1:9')
+class PaystackWebhookTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='yaw', password='Secret123!')
+        self.order = Order.objects.create(user=self.user, total_price=Decimal('45.50'))
+        self.payment = Payment.objects.create(user=self.user, order=self.order, amount=Decimal('45.50'),
+                                              payment_method='card', paystack_reference='ref-123')
+
+    def post_event(self, event='charge.success', amount=4550, signature=None, payload=None):
+        if payload is None:
+            payload = {'event': event, 'data': {'id': 77, 'reference': 'ref-123', 'amount': amount}}
+        body = json.dumps(payload).encode()
+        if signature is None:
+            signature = hmac.new(b'sk_test_webhook', body, hashlib.sha512).hexdigest()
+        return self.client.post(reverse('payment-webhook'), body, content_type='application/json',
+                                HTTP_X_PAYSTACK_SIGNATURE=signature)
+
+    def test_rejects_bad_signature(self):
+        self.assertEqual(self.post_event(signature='forged').status_code, 401)
+        self.assertFalse(PaystackEvent.objects.exists())
+
+    def test_charge_success_is_applied_once(self):
+        self.assertEqual(self.post_event().status_code, 200)
+        self.assertEqual(self.post_event().status_code, 200)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'success')
+        self.assertEqual(PaystackEvent.objects.count(), 1)
+
+    def test_amount_mismatch_fails_the_payment(self):
+        self.post_event(amount=100)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+
+    def test_verify_answers_from_local_state_after_webhook(self):
+        # PAYSTACK_BASE_URL points nowhere, so an outbound call would return 503
+        self.post_event()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(reverse('payment-verify'), {'reference': 'ref-123'})
+        self.assertEqual(response.json(), {'status': 'success'})
+
+    def test_non_object_payloads_are_rejected(self):
+        for payload in ([], 'x', {'event': 'charge.success', 'data': ['ref-123']}):
+            self.assertEqual(self.post_event(payload=payload).status_code, 400, payload)
+        self.assertFalse(PaystackEvent.objects.exists())
+
+    def test_verify_rechecks_a_failed_payment(self):
+        self.post_event(event='charge.failed')
+        self.client.force_authenticate(self.user)
+        with FakePaystack() as paystack, override_settings(PAYSTACK_BASE_URL=paystack.url):
+            paystack.transactions['ref-123'] = {'id': 1, 'amount': 4550}
+            response = self.client.post(reverse('payment-verify'), {'reference': 'ref-123'})
+        self.assertEqual(response.json(), {'status': 'success'})
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'success')
+
+    def verify(self, reference='ref-123', verify_status='success', amount=4550):
+        self.client.force_authenticate(self.user)
+        with FakePaystack(verify_status=verify_status) as paystack, override_settings(PAYSTACK_BASE_URL=paystack.url):
+            paystack.transactions[reference] = {'id': 1, 'amount': amount}
+            return self.client.post(reverse('payment-verify'), {'reference': reference})
+
+    def test_verify_leaves_an_in_flight_charge_pending(self):
+        Order.objects.filter(pk=self.order.pk).update(stock_reserved=True)
+        for verify_status in ('pending', 'ongoing', 'abandoned'):
+            response = self.verify(verify_status=verify_status)
+            self.assertEqual((response.status_code, response.json()['status']), (202, 'pending'))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.stock_reserved)
+
+    def test_verify_rejects_a_short_paid_charge(self):
+        Order.objects.filter(pk=self.order.pk).update(stock_reserved=True)
+        self.assertEqual(self.verify(amount=100).status_code, 400)
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'failed')
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.stock_reserved)
+
+    def test_failed_duplicate_payment_keeps_a_paid_order_reserved(self):
+        self.post_event()
+        Payment.objects.create(user=self.user, order=self.order, amount=Decimal('45.50'),
+                               payment_method='card', paystack_reference='ref-dup')
+        Order.objects.filter(pk=self.order.pk).update(stock_reserved=True)
+        self.assertEqual(self.verify(reference='ref-dup', verify_status='failed').status_code, 400)
+        self.assertEqual(Payment.objects.get(paystack_reference='ref-dup').status, 'failed')
+        self.order.refresh_from_db()
+        self.assertTrue(self.order.stock_reserved)
+
+
+class IdempotencyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='kofi', email='kofi@example.com', password='Secret123!')
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.item = FoodItems.objects.create(shop=self.shop, name='Jollof', price=20, image='jollof.jpg', status=True)
+        self.client.force_authenticate(self.user)
+
+    def place_order(self, key, quantity=1):
+        return self.client.post(reverse('order-list-create'), {'items': [{'food_item': self.item.pk, 'quantity': quantity}]},
+                                format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retried_order_is_created_once(self):
+        first = self.place_order('order-1')
+        self.assertEqual(first.status_code, 201)
+        with self.assertNumQueries(1):  # just the key lookup
+            retry = self.place_order('order-1')
+        self.assertEqual((retry.status_code, retry.json()), (201, first.json()))
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(self.place_order('order-2').status_code, 201)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_key_reused_with_another_body_is_rejected(self):
+        self.place_order('order-1')
+        self.assertEqual(self.place_order('order-1', quantity=2).status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_retried_payment_calls_paystack_once(self):
+        order = Order.objects.create(user=self.user, shop=self.shop, total_price=Decimal('25.00'))
+        body = {'order_id': order.pk, 'payment_method': 'card', 'email': self.user.email, 'amount': '25.00'}
+        with FakePaystack() as paystack, override_settings(PAYSTACK_BASE_URL=paystack.url):
+            responses = [self.client.post(reverse('payment-initiate'), body, format='json', HTTP_IDEMPOTENCY_KEY='pay-1')
+                         for _ in range(3)]
+            self.assertEqual(len(paystack.requests), 1)
+        self.assertEqual({response.json()['reference'] for response in responses}, {order.payments.get().paystack_reference})
+
+    def test_failed_requests_are_not_stored_and_keys_expire(self):
+        body = {'order_id': 999, 'payment_method': 'card', 'email': self.user.email, 'amount': '25.00'}
+        self.assertEqual(self.client.post(reverse('payment-initiate'), body, format='json',
+                                          HTTP_IDEMPOTENCY_KEY='pay-1').status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        self.place_order('order-1')
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+        self.addCleanup(throttling.get_store().clear)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'DEFAULT_THROTTLE_RATES': {'password_reset': '2/min'}})
+    def test_bucket_empties_then_answers_429_with_retry_after(self):
+        statuses = [self.client.post(reverse('password-reset'), {'email': 'nobody@example.com'}).status_code
+                    for _ in range(3)]
+        self.assertEqual(statuses[2], 429)
+        self.assertNotEqual(statuses[1], 429)
+        response = self.client.post(reverse('password-reset'), {'email': 'nobody@example.com'})
+        self.assertEqual(int(response['Retry-After']), 30)
+        # other routes have their own buckets
+        self.assertEqual(self.client.get(reverse('shop-list')).status_code, 200)
+
+    def test_database_store_refills_and_decides_in_one_statement(self):
+        store = throttling.DatabaseStore()
+        with self.assertNumQueries(1):
+            self.assertEqual(store.consume('token:ip:1.2.3.4', 1.0, 2, now=100.0), (True, None))
+        self.assertTrue(store.consume('token:ip:1.2.3.4', 1.0, 2, now=100.0)[0])
+        self.assertFalse(store.consume('token:ip:1.2.3.4', 1.0, 2, now=100.5)[0])
+        self.assertTrue(store.consume('token:ip:5.6.7.8', 1.0, 2, now=100.5)[0])
+        self.assertTrue(store.consume('token:ip:1.2.3.4', 1.0, 2, now=101.0)[0])
+        self.assertEqual(store.consume('token:ip:1.2.3.4', 1.0, 2, now=101.25), (False, 0.75))
+        self.assertEqual(store.purge(now=1000.0), 2)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1,
+                                       'DEFAULT_THROTTLE_RATES': {'password_reset': '1/min'}})
+    def test_anonymous_clients_behind_the_proxy_get_their_own_buckets(self):
+        def reset(forwarded_for):
+            # the proxy appends the client's address to whatever the client sent
+            return self.client.post(reverse('password-reset'), {'email': 'nobody@example.com'},
+                                    REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        self.assertNotEqual(reset('10.0.0.1'), 429)
+        self.assertNotEqual(reset('10.0.0.2'), 429)
+        self.assertEqual(reset('10.0.0.1'), 429)
+        # a made-up address in front of the real one doesn't buy a new bucket
+        self.assertEqual(reset('203.0.113.9, 10.0.0.1'), 429)
+
+
+class PrincipalTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.manager = User.objects.create_user(username='manager', password='Secret123!')
+        self.profile = UserProfile.objects.create(user=self.manager, phone_number='0200000000',
+                                                  hostel_or_office_name='Kitchen', room_or_office_number='1',
+                                                  role=UserProfile.ROLE_SHOP_MANAGER, shop=self.shop)
+        other_shop = Shop.objects.create(name='Giyark Mini Mart')
+        Order.objects.create(user=self.manager, shop=self.shop, total_price=25)
+        Order.objects.create(user=self.manager, shop=other_shop, total_price=25)
+
+    def tokens(self):
+        return self.client.post(reverse('get_token'), {'username': 'manager', 'password': 'Secret123!'}).json()
+
+    def list_orders(self, access):
+        return self.client.get(reverse('order-manage'), {'fields': 'id'}, HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    @override_settings(PRINCIPAL_TOKEN_CLAIMS=True)
+    def test_role_and_shop_come_from_token_claims(self):
+        access = self.tokens()['access']
+        self.assertEqual((AccessToken(access)['role'], AccessToken(access)['shop_id']),
+                         (UserProfile.ROLE_SHOP_MANAGER, self.shop.pk))
+        # the user, then the page: no profile lookup for permissions or shop scoping
+        with self.assertNumQueries(2):
+            response = self.list_orders(access)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_tokens_without_claims_fall_back_to_the_profile(self):
+        access = AccessToken.for_user(self.manager)
+        with self.assertNumQueries(3):  # the user, the profile, the page
+            response = self.list_orders(access)
+        self.assertEqual(len(response.json()['results']), 1)
+
+    def test_demoted_user_loses_access_at_once(self):
+        access = self.tokens()['access']
+        self.assertNotIn('role', AccessToken(access))
+        self.assertEqual(self.list_orders(access).status_code, 200)
+        self.profile.role = UserProfile.ROLE_STUDENT
+        self.profile.save()
+        self.assertEqual(self.list_orders(access).status_code, 403)
+
+    @override_settings(PRINCIPAL_TOKEN_CLAIMS=True)
+    def test_refresh_picks_up_role_changes(self):
+        refresh = self.tokens()['refresh']
+        self.profile.role = UserProfile.ROLE_STUDENT
+        self.profile.save()
+        access = self.client.post(reverse('refresh'), {'refresh': refresh}).json()['access']
+        self.assertEqual(AccessToken(access)['role'], UserProfile.ROLE_STUDENT)
+        self.assertEqual(self.list_orders(access).status_code, 403)
+
+
+class OrderEventsTests(TestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', password='Secret123!')
+        self.cook = User.objects.create_user(username='cook', password='Secret123!')
+        UserProfile.objects.create(user=self.cook, phone_number='0200000000', hostel_or_office_name='Kitchen',
+                                   room_or_office_number='1', role=UserProfile.ROLE_COOK)
+        shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.order = Order.objects.create(user=self.student, shop=shop, total_price=25)
+        self.url = reverse('order-events', args=[self.order.pk])
+
+    def set_status(self, new_status):
+        client = APIClient()
+        client.force_authenticate(self.cook)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(reverse('order-detail', args=[self.order.pk]), {'status': new_status})
+        self.assertEqual(response.status_code, 200)
+
+    async def test_stream_pushes_status_changes_until_delivered(self):
+        token = str(AccessToken.for_user(self.student))
+        response = await self.async_client.get(self.url, {'token': token})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertIn(b'"status": "RECEIVED"', await anext(stream))
+
+        await sync_to_async(self.set_status)(Order.STATUS_PREPARING)
+        self.assertIn(b'"status": "PREPARING"', await asyncio.wait_for(anext(stream), 1))
+        await sync_to_async(self.set_status)(Order.STATUS_DELIVERED)
+        self.assertIn(b'"status": "DELIVERED"', await asyncio.wait_for(anext(stream), 1))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertFalse(events.get_backend()._subscribers)
+
+    @override_settings(ORDER_EVENTS_KEEPALIVE_SECONDS=0.05)
+    async def test_stream_rereads_status_it_was_not_told_about(self):
+        token = str(AccessToken.for_user(self.student))
+        response = await self.async_client.get(self.url, {'token': token})
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        # e.g. changed by a worker whose events don't reach this one
+        await Order.objects.filter(pk=self.order.pk).aupdate(status=Order.STATUS_OUT_FOR_DELIVERY)
+        self.assertIn(b'"status": "OUT_FOR_DELIVERY"', await asyncio.wait_for(anext(stream), 1))
+        await stream.aclose()
+
+    async def test_database_backend_reaches_other_processes(self):
+        publisher, subscriber = events.DatabaseBackend(poll=False), events.DatabaseBackend(poll=False)
+        await sync_to_async(subscriber.poll)()
+        subscription = subscriber.subscribe(events.order_channel(self.order.pk))
+        self.assertTrue(publisher.has_subscribers([events.order_channel(self.order.pk)]))
+
+        await sync_to_async(publisher.publish)(events.order_channel(self.order.pk), {'status': 'READY'})
+        await sync_to_async(publisher.publish)('order:0', {'status': 'READY'})
+        await sync_to_async(subscriber.poll)()
+        self.assertEqual(await subscription.get(timeout=1), {'status': 'READY'})
+        self.assertTrue(subscription.queue.empty())
+        subscription.close()
+
+    def test_database_backend_purges_old_events_without_pollers(self):
+        publisher = events.DatabaseBackend(poll=False)
+        publisher.publish('order:1', {'status': 'RECEIVED'})
+        OrderEvent.objects.update(created_at=timezone.now() - timedelta(seconds=publisher.retention + 1))
+        publisher.publish('order:1', {'status': 'PREPARING'})
+        # the first publish ran this period's purge; the next is a retention period away
+        self.assertEqual(OrderEvent.objects.count(), 2)
+
+        publisher._next_purge = 0.0
+        publisher.publish('order:1', {'status': 'DELIVERED'})
+        self.assertEqual(list(OrderEvent.objects.values_list('payload__status', flat=True).order_by('pk')),
+                         ['PREPARING', 'DELIVERED'])
+
+    def test_stream_requires_owner_token(self):
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+        token = str(AccessToken.for_user(self.cook))
+        response = self.client.get(self.url, HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 404)
+
+
+class KitchenFeedTests(TestCase):
+    def setUp(self):
+        self.cook = User.objects.create_user(username='cook', password='Secret123!')
+        UserProfile.objects.create(user=self.cook, phone_number='0200000000', hostel_or_office_name='Kitchen',
+                                   room_or_office_number='1', role=UserProfile.ROLE_COOK)
+        self.student = User.objects.create_user(username='student', password='Secret123!')
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.other_shop = Shop.objects.create(name='Akornor')
+        self.item = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+        self.existing = self.place_order(self.shop)
+
+    def place_order(self, shop):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.student, shop=shop, total_price=25)
+            OrderItem.objects.create(order=order, food_item=self.item, quantity=1, price=20)
+        return order
+
+    def set_status(self, order, new_status):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = new_status
+            order.save()
+
+    def delete(self, order):
+        with self.captureOnCommitCallbacks(execute=True):
+            order.delete()
+
+    async def test_snapshot_then_diffs_for_one_shop(self):
+        token = str(AccessToken.for_user(self.cook))
+        response = await self.async_client.get(reverse('order-manage-events'),
+                                               {'token': token, 'shop_id': self.shop.pk})
+        stream = aiter(response.streaming_content)
+        snapshot = await anext(stream)
+        self.assertTrue(snapshot.startswith(b'event: snapshot\n'))
+        self.assertIn(f'"id": {self.existing.pk}'.encode(), snapshot)
+
+        await sync_to_async(self.place_order)(self.other_shop)  # another shop's order is not sent
+        new_order = await sync_to_async(self.place_order)(self.shop)
+        created = await asyncio.wait_for(anext(stream), 1)
+        self.assertTrue(created.startswith(b'event: order.created\n'))
+        self.assertIn(b'"username": "student"', created)
+        self.assertIn(b'"quantity": 1', created)
+
+        await sync_to_async(self.set_status)(new_order, Order.STATUS_PREPARING)
+        changed = await asyncio.wait_for(anext(stream), 1)
+        self.assertTrue(changed.startswith(b'event: order.status_changed\n'))
+        self.assertIn(b'"status": "PREPARING"', changed)
+
+        order_id = new_order.pk
+        await sync_to_async(self.delete)(new_order)
+        deleted = await asyncio.wait_for(anext(stream), 1)
+        self.assertEqual(deleted, f'event: order.deleted\ndata: {{"id": {order_id}}}\n\n'.encode())
+
+    def test_feed_is_staff_only(self):
+        token = str(AccessToken.for_user(self.student))
+        response = self.client.get(reverse('order-manage-events'), HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 403)
+
+    def test_non_numeric_shop_id_is_rejected(self):
+        token = str(AccessToken.for_user(self.cook))
+        for url in (reverse('order-manage-events'), reverse('order-manage')):
+            response = self.client.get(url, {'shop_id': 'abc'}, HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(response.status_code, 400, url)
+            self.assertEqual(response.json(), {'shop_id': 'Must be a shop id.'})
+
+    def test_nothing_is_serialized_without_listeners(self):
+        with self.assertNumQueries(2):  # the order and its line item, no feed payload
+            self.place_order(self.shop)
+
+
+class CatalogItemTests(APITestCase):
+    def setUp(self):
+        self.student = User.objects.create_user(username='student', password='Secret123!')
+        UserProfile.objects.create(user=self.student, phone_number='0200000000', hostel_or_office_name='Hostel',
+                                   room_or_office_number='1', role=UserProfile.ROLE_STUDENT)
+        self.shop = Shop.objects.create(name='Best Tech Point-Ashesi')
+        self.food = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+        self.cable = ElectronicsItems.objects.create(shop=self.shop, name='Cable', price=50, image='cable.jpg',
+                                                     status=True)
+        self.client.force_authenticate(self.student)
+
+    def test_proxies_share_one_table_split_by_kind(self):
+        self.assertEqual(CatalogItem.objects.count(), 2)
+        self.assertEqual(self.cable.kind, CatalogItem.KIND_ELECTRONICS)
+        self.assertEqual(list(FoodItems.objects.all()), [self.food])
+        self.assertFalse(ElectronicsItems.objects.filter(pk=self.food.pk).exists())
+
+    def test_order_lines_keep_their_item_fields(self):
+        response = self.client.post(reverse('order-list-create'), {'items': [
+            {'food_item': self.food.pk, 'quantity': 1},
+            {'electronics_item': self.cable.pk, 'quantity': 2},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+        # the page, its lines joined to items and shops, then the customer with their profile
+        with self.assertNumQueries(3):
+            orders = self.client.get(reverse('order-list-create')).json()['results']
+        food_line, cable_line = sorted(orders[0]['order_items'], key=lambda line: line['item_name'])
+        self.assertEqual((food_line['food_item'], food_line['electronics_item']), (self.food.pk, None))
+        self.assertEqual(cable_line['electronics_item'], self.cable.pk)
+        self.assertEqual(cable_line['electronics_item_detail']['name'], 'Cable')
+        self.assertIsNone(cable_line['food_item_detail'])
+
+    def test_item_id_must_match_its_kind(self):
+        response = self.client.post(reverse('order-list-create'), {'items': [
+            {'electronics_item': self.food.pk, 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class CatalogSearchTests(APITestCase):
+    def setUp(self):
+        throttling.get_store().clear()
+        search.invalidate()
+        self.addCleanup(search.invalidate)
+        self.kitchen = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.tech = Shop.objects.create(name='Best Tech Point-Ashesi', catalog_type=Shop.CATALOG_ELECTRONICS)
+        self.jollof = FoodItems.objects.create(shop=self.kitchen, name='Spicy Jollof', price=30, image='j.jpg',
+                                               status=True)
+        self.banku = FoodItems.objects.create(shop=self.kitchen, name='Banku', price=20, image='b.jpg', status=True,
+                                              extras='With spicy pepper')
+        self.charger = ElectronicsItems.objects.create(shop=self.tech, name='Fast Charger', price=80, image='c.jpg',
+                                                       status=True, stock=1)
+
+    def names(self, query):
+        response = self.client.get(reverse('catalog-search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.json()['results']]
+
+    def test_every_word_matches_a_prefix_and_names_outrank_extras(self):
+        self.assertEqual(self.names('spicy'), ['Spicy Jollof', 'Banku'])
+        self.assertEqual(self.names('SPI jol'), ['Spicy Jollof'])
+        self.assertEqual(self.names('charg'), ['Fast Charger'])
+        self.assertEqual(self.names('jollof charger'), [])
+        result = self.client.get(reverse('catalog-search'), {'q': 'charger'}).json()['results'][0]
+        self.assertEqual((result['shop_id'], result['shop_name'], result['kind']),
+                         (self.tech.pk, 'Best Tech Point-Ashesi', Shop.CATALOG_ELECTRONICS))
+        self.assertEqual(self.client.get(reverse('catalog-search'), {'q': 'j'}).status_code, 400)
+
+    @skipIf(connection.vendor == 'postgresql', "PostgreSQL searches in the database")
+    def test_warm_index_answers_without_queries(self):
+        self.names('spicy')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names('jollof'), ['Spicy Jollof'])
+
+    def test_index_follows_item_and_shop_changes(self):
+        self.assertEqual(self.names('spicy'), ['Spicy Jollof', 'Banku'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.jollof.name = 'Smoky Jollof'
+            self.jollof.save()
+            FoodItems.objects.create(shop=self.kitchen, name='Spicy Wings', price=25, image='w.jpg', status=True)
+        self.assertEqual(self.names('spicy'), ['Spicy Wings', 'Banku'])
+        self.assertEqual(self.names('smo'), ['Smoky Jollof'])
+
+        # selling the last unit goes through update(), not save()
+        with self.captureOnCommitCallbacks(execute=True):
+            inventory.reserve({self.charger.pk: 1})
+        self.assertEqual(self.names('charger'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.kitchen.is_active = False
+            self.kitchen.save()
+        self.assertEqual(self.names('spicy'), [])
+
+    def test_expired_index_is_rebuilt_by_one_thread(self):
+        built = []
+
+        def load_rows(queryset):
+            built.append(threading.get_ident())
+            time.sleep(0.05)
+            return []
+
+        start = threading.Barrier(5)
+
+        def lookup():
+            start.wait()
+            search.get_index()
+
+        with mock.patch.object(search, '_load_rows', load_rows):
+            threads = [threading.Thread(target=lookup) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(built), 1)
+
+
+@skipUnless(connection.vendor == 'postgresql', "only PostgreSQL searches in the database")
+class PostgresSearchTests(APITestCase):
+    """
+    The database search path. Run with a PostgreSQL DATABASES setting, e.g.
+    DJANGO_SETTINGS_MODULE=ashesi_offcampus_online_store_backend.settingsprod.
+    """
+
+    def setUp(self):
+        throttling.get_store().clear()
+        self.kitchen = Shop.objects.create(name='Cassa Bella Cuisine')
+        FoodItems.objects.create(shop=self.kitchen, name='Spicy Jollof', price=30, image='j.jpg', status=True)
+        FoodItems.objects.create(shop=self.kitchen, name='Banku', price=20, image='b.jpg', status=True,
+                                 extras='With spicy pepper')
+        FoodItems.objects.create(shop=self.kitchen, name='Spicy Wings', price=25, image='w.jpg', status=False)
+
+    def search(self, query, **params):
+        response = self.client.get(reverse('catalog-search'), {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_prefix_terms_and_names_outrank_extras(self):
+        self.assertEqual([item['name'] for item in self.search('spicy')['results']], ['Spicy Jollof', 'Banku'])
+        self.assertEqual([item['name'] for item in self.search('SPI jol')['results']], ['Spicy Jollof'])
+        self.assertEqual(self.search('jollof pepper')['results'], [])
+
+    def test_pages_are_counted_and_sliced_in_the_database(self):
+        FoodItems.objects.bulk_create([
+            FoodItems(shop=self.kitchen, name=f'Jollof Pack {n}', price=30, image='j.jpg', status=True)
+            for n in range(25)
+        ])
+        with self.assertNumQueries(2):  # count, then the page
+            page = self.search('jol', page=2)
+        self.assertEqual(page['count'], 26)
+        self.assertEqual(len(page['results']), 6)
+        self.assertTrue(all(isinstance(item['score'], float) for item in page['results']))
+
+    def test_query_can_use_the_search_index(self):
+        from django.contrib.postgres.search import SearchQuery, SearchVector
+        existing = connection.introspection.get_constraints(connection.cursor(), CatalogItem._meta.db_table)
+        self.assertIn('catalogitem_search_idx', existing)
+        self.assertIn('catalogitem_name_trgm_idx', existing)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        plan = (CatalogItem.objects.annotate(search=SearchVector('name', 'extras', config='simple'))
+                .filter(search=SearchQuery('jol:*', search_type='raw', config='simple')).explain())
+        self.assertIn('catalogitem_search_idx', plan)
+
+
+class CatalogImportExportTests(APITestCase):
+    def setUp(self):
+        search.invalidate()
+        self.addCleanup(search.invalidate)
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.other_shop = Shop.objects.create(name='Akorno')
+        self.manager = User.objects.create_user(username='manager', password='Secret123!')
+        UserProfile.objects.create(user=self.manager, phone_number='0200000000', hostel_or_office_name='Kitchen',
+                                   room_or_office_number='1', role=UserProfile.ROLE_SHOP_MANAGER, shop=self.shop)
+        self.banku = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+        FoodItems.objects.create(shop=self.other_shop, name='Kenkey', price=15, image='kenkey.jpg', status=True)
+        self.client.force_authenticate(self.manager)
+
+    def upload(self, body, content_type='text/csv'):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.generic('POST', reverse('foodItem-import'), body, content_type=content_type)
+
+    def test_export_streams_own_shop_and_round_trips(self):
+        response = self.client.get(reverse('foodItem-export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        exported = b''.join(response.streaming_content).decode()
+        header, *lines = exported.splitlines()
+        self.assertEqual(header, 'id,shop_id,name,price,image,status,stock,extras')
+        self.assertEqual(lines, [f'{self.banku.pk},{self.shop.pk},Banku,20.0,banku.jpg,True,,'])
+
+        edited = exported.replace('Banku', 'Banku and Okro') + ',,Waakye,25,waakye.jpg,true,10,With egg\r\n'
+        response = self.upload(edited)
+        self.assertEqual(response.json(), {'created': 1, 'updated': 1, 'skipped': 0, 'errors': []})
+        self.banku.refresh_from_db()
+        self.assertEqual(self.banku.name, 'Banku and Okro')
+        waakye = FoodItems.objects.get(name='Waakye')
+        self.assertEqual((waakye.shop_id, waakye.stock, waakye.extras), (self.shop.pk, 10, 'With egg'))
+        self.assertEqual(self.client.get(reverse('catalog-search'), {'q': 'waak'}).json()['count'], 1)
+
+        ndjson = self.client.get(reverse('foodItem-export'), {'output': 'ndjson'})
+        rows = [json.loads(line) for line in b''.join(ndjson.streaming_content).splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Banku and Okro', 'Waakye'])
+
+    def test_reimport_keeps_live_stock_and_restock_adds_units(self):
+        FoodItems.objects.filter(pk=self.banku.pk).update(stock=2)
+        exported = b''.join(self.client.get(reverse('foodItem-export')).streaming_content).decode()
+        # an order sells out the item while the file is being edited
+        inventory.reserve({self.banku.pk: 2})
+        self.assertEqual(self.upload(exported).json()['updated'], 1)
+        self.banku.refresh_from_db()
+        self.assertEqual((self.banku.stock, self.banku.status, self.banku.sold_out), (0, False, True))
+
+        exported = b''.join(self.client.get(reverse('foodItem-export')).streaming_content).decode()
+        self.assertIn(',True,0,', exported)  # still listed by the shop
+        header, line = exported.splitlines()
+        self.upload(f'{header},restock\n{line},5\n')
+        self.banku.refresh_from_db()
+        self.assertEqual((self.banku.stock, self.banku.status), (5, True))
+
+        untracked = FoodItems.objects.create(shop=self.shop, name='Water', price=2, image='w.jpg', status=True)
+        response = self.upload(f'id,name,price,image,restock\n{untracked.pk},Water,2,w.jpg,5\n')
+        self.assertEqual(response.json()['errors'][0]['errors'], {'restock': ["This item's stock isn't tracked."]})
+
+    def test_invalid_rows_skip_their_chunk_only(self):
+        kenkey = FoodItems.objects.get(name='Kenkey')
+        rows = [
+            {'name': 'Fufu', 'price': 30, 'image': 'fufu.jpg'},
+            {'name': 'Kelewele', 'price': 'cheap', 'image': 'k.jpg'},
+            {'id': kenkey.pk, 'name': 'Stolen Kenkey', 'price': 1, 'image': 'k.jpg'},
+            {'name': 'Elsewhere', 'price': 1, 'image': 'e.jpg', 'shop_id': self.other_shop.pk},
+        ]
+        body = ''.join(json.dumps(row) + '\n' for row in rows)
+        response = self.upload(body, 'application/x-ndjson')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'], [{'line': 2, 'errors': {'price': ['A valid number is required.']}}])
+        self.assertFalse(FoodItems.objects.filter(name='Fufu').exists())
+
+        response = self.upload(''.join(json.dumps(row) + '\n' for row in rows[2:]), 'application/x-ndjson')
+        self.assertEqual([error['line'] for error in response.json()['errors']], [1, 2])
+        self.assertEqual(FoodItems.objects.get(pk=kenkey.pk).name, 'Kenkey')
+
+        response = self.upload(json.dumps(rows[0]) + '\n', 'application/x-ndjson')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(self.upload('name\n', 'application/json').status_code, 415)
+
+    def test_large_upload_applies_in_bulk_chunks(self):
+        body = 'name,price,image\n' + ''.join(f'Item {n},{n + 1},i{n}.jpg\n' for n in range(1200))
+        with CaptureQueriesContext(connection) as captured:
+            response = self.upload(body)
+        self.assertEqual(response.json()['created'], 1200)
+        # three 500-row chunks, each one shop check and a few multi-row INSERTs
+        inserts = [query for query in captured.captured_queries if query['sql'].startswith('INSERT')]
+        self.assertLess(len(inserts), 40)
+        self.assertEqual(sum(query['sql'].startswith('SELECT "api_shop"') for query in captured.captured_queries), 3)
+        self.assertEqual(FoodItems.objects.filter(shop=self.shop).count(), 1201)
+
+
+class SyncFixturesTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.shop = Shop.objects.create(name='Cassa Bella Cuisine')
+        self.banku = FoodItems.objects.create(shop=self.shop, name='Banku', price=20, image='banku.jpg', status=True)
+
+    def sync(self, action, **options):
+        out = StringIO()
+        call_command('sync_fixtures', action, dir=self.directory, stdout=out, **options)
+        return out.getvalue()
+
+    def test_round_trip_upserts_and_skips_unchanged_files(self):
+        # Django's JSON fixtures keep timestamps to the millisecond
+        created_at = self.banku.created_at.replace(microsecond=self.banku.created_at.microsecond // 1000 * 1000)
+        self.assertIn('catalog_items.json: written', self.sync('export'))
+        self.assertIn('catalog_items.json: unchanged', self.sync('export'))
+
+        FoodItems.objects.filter(pk=self.banku.pk).update(name='Renamed')
+        Shop.objects.create(name='Not in the fixture')
+        self.assertIn('catalog_items.json: 1 object(s) loaded', self.sync('import'))
+        self.banku.refresh_from_db()
+        self.assertEqual((self.banku.name, self.banku.created_at), ('Banku', created_at))
+        self.assertEqual(Shop.objects.count(), 2)
+
+        with self.assertNumQueries(2):
+            self.assertIn('catalog_items.json: unchanged, skipped', self.sync('import'))
+        self.assertIn('shops.json: 1 object(s) loaded', self.sync('import', force=True))
+
+    def test_generate_refuses_to_run_twice(self):
+        out = self.sync('generate', shops=3, items=5, orders=20, students=3)
+        self.assertIn('20 order(s)', out)
+        self.assertEqual(Order.objects.count(), 21)
+        with self.assertRaises(CommandError):
+            self.sync('generate', orders=1)
+
+
+class BenchmarkTests(TestCase):
+    def test_every_named_route_has_a_scenario(self):
+        from .management.commands.benchmark import SCENARIOS, named_routes
+        self.assertEqual(named_routes() - {scenario.url_name for scenario in SCENARIOS}, set())
+
+    def test_run_writes_report_and_flags_regressions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            baseline = os.path.join(tmp, 'baseline.json')
+            with transaction.atomic():  # the second run builds the same dataset again
+                call_command('benchmark', '--current-db', '--shops', '3', '--items', '3', '--orders', '30',
+                             '--students', '3', '--days', '3', '--repeat', '1', '--only', 'shop list',
+                             '--output', baseline, stdout=StringIO(), stderr=StringIO())
+                transaction.set_rollback(True)
+            with open(baseline) as handle:
+                report = json.load(handle)
+            self.assertEqual(report['results']['shop list']['errors'], 0)
+
+            report['results']['shop list']['queries'] = 0
+            with open(baseline, 'w') as handle:
+                json.dump(report, handle)
+            with self.assertRaisesMessage(CommandError, '1 regression(s)'):
+                call_command('benchmark', '--current-db', '--shops', '3', '--items', '3', '--orders', '30',
+                             '--students', '3', '--days', '3', '--repeat', '1', '--only', 'shop list',
+                             '--compare', baseline, stdout=StringIO(), stderr=StringIO())
+
+
+class LoadtestTests(TestCase):
+    def test_journeys_run_without_errors(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output = os.path.join(tmp, 'loadtest.json')
+            call_command('loadtest', '--current-db', '--users', '4', '--staff', '0.25', '--iterations', '1',
+                         '--new-users', '1', '--items', '3', '--orders', '10', '--students', '3',
+                         '--output', output, stdout=StringIO())
+            with open(output) as handle:
+                report = json.load(handle)
+        self.assertEqual(report['total']['errors'], 0, report['endpoints'])
+        self.assertEqual(report['meta']['journeys'], 4)
+        for endpoint in ('POST register', 'GET email-verify', 'POST order-list-create', 'POST payment-verify',
+                         'GET order-status', 'PATCH order-detail'):
+            self.assertGreater(report['endpoints'][endpoint]['requests'], 0, endpoint)
+        self.assertGreater(report['endpoints']['POST order-list-create']['queries'], 0)
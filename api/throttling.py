@@ -0,0 +1,134 @@
+"""
+Token-bucket rate limiting for public endpoints.
+
+Views opt in with ``throttle_classes = [TokenBucketThrottle]`` and a
+``throttle_scope``; the budget for each scope comes from
+``REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']``, where "10/min" means bursts of up
+to 10 requests, refilled at 10 a minute. Authenticated clients are keyed by
+user id, anonymous ones by IP address. Behind a reverse proxy, set
+``REST_FRAMEWORK['NUM_PROXIES']`` so the address comes from the proxy's
+X-Forwarded-For entry rather than the proxy itself (or whatever the client
+put in the header).
+
+Buckets use GCRA: a bucket is a single number, the "theoretical arrival
+time" (TAT) by which it would be full again, so each decision is one atomic
+read-modify-write. THROTTLE_STORE picks where TATs live:
+
+  * MemoryStore   - a dict in the worker process, for runserver and tests
+  * DatabaseStore - the ThrottleBucket table, shared by every gunicorn worker;
+                    each decision is a single INSERT ... ON CONFLICT DO UPDATE
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+from django.utils.module_loading import import_string
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .models import ThrottleBucket
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+def parse_rate(rate):
+    """'10/min' → (10, 60): the burst size and the seconds it takes to refill."""
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class MemoryStore:
+    """Buckets of one process; no round-trips at all."""
+
+    # forget idle buckets once there are this many
+    MAX_BUCKETS = 10_000
+
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, interval, burst, now):
+        """Take one token; returns (allowed, seconds until the next token or None)."""
+        tolerance = interval * (burst - 1)
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            if tat - now > tolerance:
+                return False, tat - now - tolerance
+            if len(self._tats) >= self.MAX_BUCKETS:
+                self.purge(now)
+            self._tats[key] = tat + interval
+            return True, None
+
+    def purge(self, now=None):
+        now = time.time() if now is None else now
+        for key in [key for key, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+
+    def clear(self):
+        with self._lock:
+            self._tats.clear()
+
+
+class DatabaseStore:
+    """Buckets shared through the ThrottleBucket table, one statement per decision."""
+
+    def consume(self, key, interval, burst, now):
+        tolerance = interval * (burst - 1)
+        quote = connection.ops.quote_name
+        table = quote(ThrottleBucket._meta.db_table)
+        greatest = 'GREATEST' if connection.vendor == 'postgresql' else 'MAX'
+        # a full (or new) bucket starts from now; the update only happens, and
+        # only returns a row, if the bucket still has a token left
+        sql = (
+            f"INSERT INTO {table} ({quote('key')}, {quote('tat')}) VALUES (%s, %s) "
+            f"ON CONFLICT ({quote('key')}) DO UPDATE "
+            f"SET {quote('tat')} = {greatest}({table}.{quote('tat')}, %s) + %s "
+            f"WHERE {table}.{quote('tat')} - %s <= %s "
+            f"RETURNING {quote('tat')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [key, now + interval, now, interval, now, tolerance])
+            if cursor.fetchone() is not None:
+                return True, None
+        # only a denied request pays for reading the TAT back, for Retry-After
+        tat = ThrottleBucket.objects.filter(key=key).values_list('tat', flat=True).first()
+        return False, (max(tat - now - tolerance, 0.0) if tat is not None else None)
+
+    def purge(self, now=None):
+        """Delete buckets that have refilled completely; they behave exactly like missing ones."""
+        return ThrottleBucket.objects.filter(tat__lte=time.time() if now is None else now).delete()[0]
+
+    def clear(self):
+        ThrottleBucket.objects.all().delete()
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store():
+    path = getattr(settings, 'THROTTLE_STORE', 'api.throttling.MemoryStore')
+    if path not in _stores:
+        with _stores_lock:
+            if path not in _stores:
+                _stores[path] = import_string(path)()
+    return _stores[path]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Throttles a view by its `throttle_scope` (unthrottled if the scope has no rate)."""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+        burst, period = parse_rate(rate)
+        user = getattr(request, 'user', None)
+        ident = f"user:{user.pk}" if user is not None and user.is_authenticated else f"ip:{self.get_ident(request)}"
+        allowed, self._wait = get_store().consume(f"{scope}:{ident}", period / burst, burst, time.time())
+        return allowed
+
+    def wait(self):
+        return self._wait
@@ -7,6 +7,7 @@ from .views import (
     PasswordResetView,
     PaymentInitiateView,
     PaymentVerifyView,
+    PaystackWebhookView,
     FoodAdminListCreateView,
     FoodAdminDetailView,
     ElectronicsAdminListCreateView,
@@ -21,21 +22,32 @@ from .views import (
 
 urlpatterns = [
     path("foodItems/", views.FoodListView.as_view(), name="foodItem-list"),
+    path("catalog/search/", views.CatalogSearchView.as_view(), name="catalog-search"),
     path("foodItems/manage/", FoodAdminListCreateView.as_view(), name="foodItem-manage"),
     path("foodItems/manage/<int:pk>/", FoodAdminDetailView.as_view(), name="foodItem-manage-detail"),
+    path("foodItems/manage/import/", views.FoodImportView.as_view(), name="foodItem-import"),
+    path("foodItems/manage/export/", views.FoodExportView.as_view(), name="foodItem-export"),
     path("electronics/manage/", ElectronicsAdminListCreateView.as_view(), name="electronics-manage"),
     path("electronics/manage/<int:pk>/", ElectronicsAdminDetailView.as_view(), name="electronics-manage-detail"),
+    path("electronics/manage/import/", views.ElectronicsImportView.as_view(), name="electronics-import"),
+    path("electronics/manage/export/", views.ElectronicsExportView.as_view(), name="electronics-export"),
     path("groceries/manage/", GroceryAdminListCreateView.as_view(), name="groceries-manage"),
     path("groceries/manage/<int:pk>/", GroceryAdminDetailView.as_view(), name="groceries-manage-detail"),
+    path("groceries/manage/import/", views.GroceryImportView.as_view(), name="groceries-import"),
+    path("groceries/manage/export/", views.GroceryExportView.as_view(), name="groceries-export"),
     path("shops/", ShopListView.as_view(), name="shop-list"),
     path("shops/<int:pk>/", ShopDetailView.as_view(), name="shop-detail"),
     path("profile/", views.UserProfileView.as_view(), name="profile"),
     path('orders/', OrderListCreateView.as_view(), name='order-list-create'),
     path('orders/manage/', StaffOrderListView.as_view(), name='order-manage'),
+    path('orders/export/', views.OrderExportView.as_view(), name='order-export'),
+    path('orders/manage/events/', views.kitchen_order_events, name='order-manage-events'),
     path('orders/<int:order_id>/', OrderDetailView.as_view(), name='order-detail'),
     path('orders/<int:order_id>/status/', OrderStatusView.as_view(), name='order-status'),
+    path('orders/<int:order_id>/events/', views.order_status_events, name='order-events'),
     path('password-reset/', PasswordResetView.as_view(), name='password-reset'),
     path('payments/initiate/', PaymentInitiateView.as_view(), name='payment-initiate'),
     path('payments/verify/', PaymentVerifyView.as_view(), name='payment-verify'),
+    path('payments/webhook/', PaystackWebhookView.as_view(), name='payment-webhook'),
     path('dashboard/summary/', DashboardSummaryView.as_view(), name='dashboard-summary'),
 ]
\ No newline at end of file
@@ -5,7 +5,7 @@ from rest_framework import generics, status
 from ashesi_offcampus_online_store_backend import settings
 from ashesi_offcampus_online_store_backend.settings import EMAIL_HOST_PASSWORD
 from .serializers import UserProfileSerializer
-from .models import FoodItems, UserProfile, Order, OrderItem, Shop, ElectronicsItems, GroceryItems
+from .models import CatalogItem, FoodItems, UserProfile, Order, OrderItem, Shop, ElectronicsItems, GroceryItems, order_items_prefetch
 from .serializers import (
     UserSerializer,
     FoodSerializer,
@@ -21,7 +21,6 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
 from django.contrib.sites.shortcuts import get_current_site
 from django.urls import reverse
-from django.core.mail import EmailMessage
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from django.contrib.auth.tokens import default_token_generator
@@ -34,9 +33,21 @@ from django.shortcuts import redirect
 from .serializers import PasswordResetSerializer
 from .models import Payment
 from .serializers import PaymentInitiateSerializer
+from .authentication import PrincipalJWTAuthentication, get_principal, set_principal
 from .permissions import IsSuperAdmin, IsStaffMember, IsShopManager
-import requests
+from . import catalog_cache, catalog_io, compact_orders, events, idempotency, inventory, order_export, order_feed, outbox, payments, paystack, sales, search, shop_registry, tabular
+from .paystack import PaystackError
+from .pagination import OrderCursorPagination, SearchPagination
+from .throttling import TokenBucketThrottle
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+import asyncio
+import json
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.views import TokenObtainPairView
 from django.conf import settings as django_settings
+from django.db import transaction
 from django.db.models import Sum, Avg, Q
 from django.utils import timezone
 from datetime import datetime, time
@@ -51,12 +62,14 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 class CreateUserView(generics.CreateAPIView):
     """
     1) Creates user (inactive) + profile
-    2) Sends verification email
+    2) Queues verification email in the outbox
     """
     queryset            = User.objects.all()
     serializer_class    = UserSerializer
     authentication_classes = []
     permission_classes  = [AllowAny]
+    throttle_classes    = [TokenBucketThrottle]
+    throttle_scope      = 'register'
 
     def create(self, request, *args, **kwargs):
         # a) validate & save (user.is_active=False in serializer.create)
@@ -73,7 +86,7 @@ class CreateUserView(generics.CreateAPIView):
         current_site = get_current_site(request).domain
         verify_url   = f"{scheme}://{current_site}{verify_path}?uid={uidb64}&token={token}"
 
-        # c) send it
+        # c) queue it for the outbox worker (manage.py send_outbox)
         email_body = (
             f"Hi {user.username},\n\n"
             "Thanks for registering at Ashesi Off-campus Online Shop.\n"
@@ -81,13 +94,11 @@ class CreateUserView(generics.CreateAPIView):
             f"{verify_url}\n\n"
             "If you didn't register, you can safely ignore this email.\n"
         )
-        msg = EmailMessage(
+        outbox.enqueue(
             subject    = "Verify your email",
             body       = email_body,
             to         = [user.email],
         )
-        msg.encoding = 'utf-8'
-        msg.send(fail_silently=False)
 
         return Response(
             {"detail": "Registration successful. Check your email for a verification link."},
@@ -135,6 +146,12 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
         return profile
 
 
+class ThrottledTokenObtainPairView(TokenObtainPairView):
+    """POST /api/token/ → JWT pair; rate limited, since every attempt checks a password hash."""
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope   = 'token'
+
+
 class PasswordResetView(generics.GenericAPIView):
     """
     POST /api/password-reset/
@@ -144,6 +161,8 @@ class PasswordResetView(generics.GenericAPIView):
     serializer_class    = PasswordResetSerializer
     permission_classes  = [AllowAny]
     authentication_classes = []
+    throttle_classes    = [TokenBucketThrottle]
+    throttle_scope      = 'password_reset'
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -170,49 +189,96 @@ class FoodListView(generics.ListAPIView):
     """
     GET /api/foodItems/ → list all active items (food, electronics, or grocery) based on shop_id
     Optional query param: ?shop_id=<id> to filter by shop
-    Returns items from FoodItems, ElectronicsItems, or GroceryItems based on shop type
+    Returns food, electronics or grocery items according to the shop's catalog_type
     """
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'catalog'
+
+    SERIALIZERS = {
+        Shop.CATALOG_FOOD: FoodSerializer,
+        Shop.CATALOG_ELECTRONICS: ElectronicsSerializer,
+        Shop.CATALOG_GROCERY: GrocerySerializer,
+    }
+
+    def get_shop(self):
+        """Registry entry for an active ?shop_id= shop (no query once the registry is loaded)."""
+        if not hasattr(self, '_shop'):
+            shop = shop_registry.get(self.request.query_params.get('shop_id'))
+            self._shop = shop if shop is not None and shop.is_active else None
+        return self._shop
 
     def get_serializer_class(self):
-        shop_id = self.request.query_params.get('shop_id')
-        if shop_id:
-            try:
-                shop = Shop.objects.get(id=shop_id, is_active=True)
-                shop_name_lower = shop.name.lower()
-                if 'tech' in shop_name_lower or 'electronics' in shop_name_lower:
-                    return ElectronicsSerializer
-                elif 'giyark' in shop_name_lower or 'mart' in shop_name_lower or 'grocery' in shop_name_lower:
-                    return GrocerySerializer
-            except Shop.DoesNotExist:
-                pass
+        shop = self.get_shop()
+        if shop is not None:
+            return self.SERIALIZERS[shop.catalog_type]
         # Default to FoodSerializer for Cassa Bella or if no shop_id
         return FoodSerializer
 
     def get_queryset(self):
-        shop_id = self.request.query_params.get('shop_id')
-        
-        if shop_id:
-            try:
-                shop = Shop.objects.get(id=shop_id, is_active=True)
-                shop_name_lower = shop.name.lower()
-                
-                if 'tech' in shop_name_lower or 'electronics' in shop_name_lower:
-                    # Best Tech Point - return electronics items
-                    return ElectronicsItems.objects.filter(shop=shop, status=True).select_related('shop')
-                elif 'giyark' in shop_name_lower or 'mart' in shop_name_lower or 'grocery' in shop_name_lower:
-                    # Giyark Mini Mart - return grocery items
-                    return GroceryItems.objects.filter(shop=shop, status=True).select_related('shop')
-                else:
-                    # Cassa Bella or other - return food items
-                    return FoodItems.objects.filter(shop=shop, status=True).select_related('shop')
-            except Shop.DoesNotExist:
+        if self.request.query_params.get('shop_id'):
+            shop = self.get_shop()
+            if shop is None:
                 return FoodItems.objects.none()
-        
+            return CatalogItem.objects.filter(
+                shop_id=shop.id, kind=shop.catalog_type, status=True
+            ).select_related('shop')
+
         # Default: return food items (for backward compatibility)
         return FoodItems.objects.filter(status=True).select_related('shop')
 
+    def list(self, request, *args, **kwargs):
+        # Serve the rendered catalog from the versioned cache; repeat clients
+        # revalidate with If-None-Match and get a 304 without touching the ORM.
+        scope = catalog_cache.scope_for_shop(request.query_params.get('shop_id'))
+        if scope is None:
+            return super().list(request, *args, **kwargs)
+
+        version = catalog_cache.get_version(scope)
+        shop = self.get_shop()
+        if shop is not None:
+            # a process whose registry is stale must not fill the cache for the others
+            version = f"{version}.{shop.catalog_type}"
+        cached = catalog_cache.get_payload(scope, version)
+        if cached is None:
+            serializer = self.get_serializer(self.get_queryset(), many=True)
+            body = JSONRenderer().render(serializer.data)
+            etag = catalog_cache.set_payload(scope, version, body)
+        else:
+            etag, body = cached
+
+        if catalog_cache.etag_matches(request.headers.get('If-None-Match'), etag):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(body, content_type='application/json')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+class CatalogSearchView(APIView):
+    """
+    GET /api/catalog/search/?q=<words> → active items of every active shop
+    whose name (or extras) has a word starting with each of the query words,
+    best matches first. Paginated with ?page= and ?page_size=.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'catalog'
+
+    MIN_QUERY_LENGTH = 2
+
+    def get(self, request):
+        query = request.query_params.get('q', '').strip()
+        if len(query) < self.MIN_QUERY_LENGTH:
+            return Response({"error": f"q must be at least {self.MIN_QUERY_LENGTH} characters."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(search.search(query), request, view=self)
+        return paginator.get_paginated_response(page)
+
 
 class FoodAdminListCreateView(generics.ListCreateAPIView):
     """
@@ -224,24 +290,21 @@ class FoodAdminListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = FoodItems.objects.all().select_related('shop').order_by('name')
-        try:
-            profile = self.request.user.userprofile
-            shop_id = self.request.query_params.get('shop_id')
-            
-            if shop_id:
-                # If shop_id is provided, filter by it (for both super_admin and shop_manager)
-                try:
-                    shop_id_int = int(shop_id)
-                    queryset = queryset.filter(shop_id=shop_id_int)
-                except (ValueError, TypeError):
-                    # Invalid shop_id, return empty queryset
-                    queryset = queryset.none()
-            elif profile.is_shop_manager and profile.shop:
-                # Shop managers without shop_id param see only their assigned shop
-                queryset = queryset.filter(shop=profile.shop)
-            # Super admin without shop_id sees all items
-        except UserProfile.DoesNotExist:
-            pass
+        principal = get_principal(self.request)
+        shop_id = self.request.query_params.get('shop_id')
+
+        if shop_id:
+            # If shop_id is provided, filter by it (for both super_admin and shop_manager)
+            try:
+                shop_id_int = int(shop_id)
+                queryset = queryset.filter(shop_id=shop_id_int)
+            except (ValueError, TypeError):
+                # Invalid shop_id, return empty queryset
+                queryset = queryset.none()
+        elif principal.managed_shop_id:
+            # Shop managers without shop_id param see only their assigned shop
+            queryset = queryset.filter(shop_id=principal.managed_shop_id)
+        # Super admin without shop_id sees all items
         return queryset
 
 
@@ -257,12 +320,9 @@ class FoodAdminDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         queryset = FoodItems.objects.all().select_related('shop')
         # Shop managers can only manage items from their shop
-        try:
-            profile = self.request.user.userprofile
-            if profile.is_shop_manager and profile.shop:
-                queryset = queryset.filter(shop=profile.shop)
-        except UserProfile.DoesNotExist:
-            pass
+        managed_shop_id = get_principal(self.request).managed_shop_id
+        if managed_shop_id:
+            queryset = queryset.filter(shop_id=managed_shop_id)
         return queryset
 
 
@@ -276,19 +336,16 @@ class ElectronicsAdminListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = ElectronicsItems.objects.all().select_related('shop').order_by('name')
-        try:
-            profile = self.request.user.userprofile
-            shop_id = self.request.query_params.get('shop_id')
-            
-            if shop_id:
-                # If shop_id is provided, filter by it (for both super_admin and shop_manager)
-                queryset = queryset.filter(shop_id=shop_id)
-            elif profile.is_shop_manager and profile.shop:
-                # Shop managers without shop_id param see only their assigned shop
-                queryset = queryset.filter(shop=profile.shop)
-            # Super admin without shop_id sees all items
-        except UserProfile.DoesNotExist:
-            pass
+        principal = get_principal(self.request)
+        shop_id = self.request.query_params.get('shop_id')
+
+        if shop_id:
+            # If shop_id is provided, filter by it (for both super_admin and shop_manager)
+            queryset = queryset.filter(shop_id=shop_id)
+        elif principal.managed_shop_id:
+            # Shop managers without shop_id param see only their assigned shop
+            queryset = queryset.filter(shop_id=principal.managed_shop_id)
+        # Super admin without shop_id sees all items
         return queryset
 
 
@@ -304,12 +361,9 @@ class ElectronicsAdminDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         queryset = ElectronicsItems.objects.all().select_related('shop')
         # Shop managers can only manage items from their shop
-        try:
-            profile = self.request.user.userprofile
-            if profile.is_shop_manager and profile.shop:
-                queryset = queryset.filter(shop=profile.shop)
-        except UserProfile.DoesNotExist:
-            pass
+        managed_shop_id = get_principal(self.request).managed_shop_id
+        if managed_shop_id:
+            queryset = queryset.filter(shop_id=managed_shop_id)
         return queryset
 
 
@@ -323,19 +377,16 @@ class GroceryAdminListCreateView(generics.ListCreateAPIView):
 
     def get_queryset(self):
         queryset = GroceryItems.objects.all().select_related('shop').order_by('name')
-        try:
-            profile = self.request.user.userprofile
-            shop_id = self.request.query_params.get('shop_id')
-            
-            if shop_id:
-                # If shop_id is provided, filter by it (for both super_admin and shop_manager)
-                queryset = queryset.filter(shop_id=shop_id)
-            elif profile.is_shop_manager and profile.shop:
-                # Shop managers without shop_id param see only their assigned shop
-                queryset = queryset.filter(shop=profile.shop)
-            # Super admin without shop_id sees all items
-        except UserProfile.DoesNotExist:
-            pass
+        principal = get_principal(self.request)
+        shop_id = self.request.query_params.get('shop_id')
+
+        if shop_id:
+            # If shop_id is provided, filter by it (for both super_admin and shop_manager)
+            queryset = queryset.filter(shop_id=shop_id)
+        elif principal.managed_shop_id:
+            # Shop managers without shop_id param see only their assigned shop
+            queryset = queryset.filter(shop_id=principal.managed_shop_id)
+        # Super admin without shop_id sees all items
         return queryset
 
 
@@ -351,73 +402,218 @@ class GroceryAdminDetailView(generics.RetrieveUpdateDestroyAPIView):
     def get_queryset(self):
         queryset = GroceryItems.objects.all().select_related('shop')
         # Shop managers can only manage items from their shop
-        try:
-            profile = self.request.user.userprofile
-            if profile.is_shop_manager and profile.shop:
-                queryset = queryset.filter(shop=profile.shop)
-        except UserProfile.DoesNotExist:
-            pass
+        managed_shop_id = get_principal(self.request).managed_shop_id
+        if managed_shop_id:
+            queryset = queryset.filter(shop_id=managed_shop_id)
         return queryset
 
 
-class OrderListCreateView(generics.ListCreateAPIView):
+class CatalogImportView(APIView):
+    """
+    POST /api/<items>/manage/import/ → create and update items in bulk from a
+    CSV (Content-Type: text/csv) or NDJSON (application/x-ndjson) upload with
+    the columns of the matching export. Rows with an id update that item;
+    their stock is left alone, and an optional restock column adds units.
+    """
+    permission_classes = [IsAuthenticated, IsShopManager]
+    model = None
+    serializer_class = None
+
+    def post(self, request):
+        fmt = tabular.upload_format(request)
+        if fmt is None:
+            return Response({"error": "Upload text/csv or application/x-ndjson."},
+                            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        result = catalog_io.import_rows(self.model, self.serializer_class, get_principal(request),
+                                        tabular.read_rows(request, fmt))
+        nothing_applied = result.errors and not (result.created or result.updated)
+        return Response(result.as_dict(),
+                        status=status.HTTP_400_BAD_REQUEST if nothing_applied else status.HTTP_200_OK)
+
+
+class CatalogExportView(APIView):
+    """
+    GET /api/<items>/manage/export/?output=csv|ndjson&shop_id= → stream every
+    item in scope, oldest first, in the format the import accepts.
+    """
+    permission_classes = [IsAuthenticated, IsShopManager]
+    model = None
+    serializer_class = None
+
+    def get(self, request):
+        fmt = tabular.output_format(request)
+        if fmt is None:
+            return Response({"error": "output must be csv or ndjson."}, status=status.HTTP_400_BAD_REQUEST)
+        rows = catalog_io.export_rows(self.model, self.serializer_class, get_principal(request),
+                                      request.query_params.get('shop_id'))
+        return tabular.streaming_response(fmt, catalog_io.columns(self.serializer_class), rows,
+                                          f"{self.model.KIND}-items")
+
+
+class FoodImportView(CatalogImportView):
+    model = FoodItems
+    serializer_class = FoodSerializer
+
+
+class FoodExportView(CatalogExportView):
+    model = FoodItems
+    serializer_class = FoodSerializer
+
+
+class ElectronicsImportView(CatalogImportView):
+    model = ElectronicsItems
+    serializer_class = ElectronicsSerializer
+
+
+class ElectronicsExportView(CatalogExportView):
+    model = ElectronicsItems
+    serializer_class = ElectronicsSerializer
+
+
+class GroceryImportView(CatalogImportView):
+    model = GroceryItems
+    serializer_class = GrocerySerializer
+
+
+class GroceryExportView(CatalogExportView):
+    model = GroceryItems
+    serializer_class = GrocerySerializer
+
+
+def _prefetch_order_items(queryset, request):
+    """Prefetch nested line items unless a ?fields= sparse fieldset leaves them out."""
+    requested = OrderSerializer.requested_fields(request)
+    if requested is not None and 'order_items' not in requested:
+        return queryset
+    return queryset.prefetch_related(order_items_prefetch())
+
+
+class CompactOrderListMixin:
+    """
+    ?view=compact returns the page built from values() rows, with line items
+    flattened and shops listed once under a top-level `shops` map.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not compact_orders.requested(request):
+            return super().list(request, *args, **kwargs)
+        queryset = compact_orders.order_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        results, shops = compact_orders.serialize(page, self.get_serializer_context())
+        response = self.get_paginated_response(results)
+        response.data['shops'] = shops
+        return response
+
+
+class OrderListCreateView(CompactOrderListMixin, generics.ListCreateAPIView):
     """
-    GET  /api/orders/  → list all orders for the logged-in user
-    POST /api/orders/  → create a new order (with nested items)
+    GET  /api/orders/  → list the logged-in user's orders, newest first (cursor-paginated)
+    POST /api/orders/  → create a new order (with nested items); retries sent with
+                         the same Idempotency-Key header replay the first response
+    Optional query param: ?fields=id,status,... to return only those fields,
+    or ?view=compact for the flattened list format (see compact_orders)
     """
     serializer_class   = OrderSerializer
     permission_classes = [IsAuthenticated]
 
+    pagination_class   = OrderCursorPagination
+
     def get_queryset(self):
         # only your own orders
-        return Order.objects.filter(user=self.request.user).select_related('shop').prefetch_related(
-            'items__food_item',
-            'items__electronics_item',
-            'items__grocery_item'
-        )
+        queryset = Order.objects.filter(user=self.request.user).select_related('shop')
+        return _prefetch_order_items(queryset, self.request)
+
+    @idempotency.idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         # attach the user context so serializer.create() can read it
         serializer.save()
 
 
-class StaffOrderListView(generics.ListAPIView):
+class StaffOrderListView(CompactOrderListMixin, generics.ListAPIView):
     """
     GET /api/orders/manage/ → list all orders for staff (super admin, employee, cook, shop manager)
     Supports optional filtering by status (?status=RECEIVED) and shop (?shop_id=<id>).
     Shop managers only see orders from their shop.
+    Results are cursor-paginated newest first; ?fields=id,status,... returns only those fields
+    and ?view=compact the flattened list format.
     """
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated, IsStaffMember]
+    pagination_class = OrderCursorPagination
 
     def get_queryset(self):
-        queryset = Order.objects.all().select_related(
-            'shop', 'user__userprofile'
-        ).prefetch_related(
-            'items__food_item',
-            'items__electronics_item',
-            'items__grocery_item'
-        ).order_by('-created_at')
-        
-        # Shop managers only see orders from their shop
+        queryset = Order.objects.all().select_related('shop').order_by('-created_at')
+        queryset = _prefetch_order_items(queryset, self.request)
+        return _scope_staff_orders(queryset, get_principal(self.request), self.request.query_params)
+
+
+class OrderExportView(APIView):
+    """
+    GET /api/orders/export/?start=YYYY-MM-DD&end=YYYY-MM-DD&shop_id=&status=&output=csv|ndjson
+    Streams one row per order line, oldest first, with the order's latest payment.
+    Scoped like the staff order list: shop managers only get their shop's orders.
+    """
+    permission_classes = [IsAuthenticated, IsStaffMember]
+
+    @staticmethod
+    def parse_date(params, name):
+        value = params.get(name)
+        if not value:
+            return None
         try:
-            profile = self.request.user.userprofile
-            if profile.is_shop_manager and profile.shop:
-                queryset = queryset.filter(shop=profile.shop)
-        except UserProfile.DoesNotExist:
-            pass
-        
-        # Filter by shop_id if provided (for super admin)
-        shop_id = self.request.query_params.get('shop_id')
-        if shop_id:
-            queryset = queryset.filter(shop_id=shop_id)
-        
-        # Filter by status if provided
-        status_filter = self.request.query_params.get('status')
-        if status_filter:
-            queryset = queryset.filter(status=status_filter)
-        
-        return queryset
+            return datetime.strptime(value, "%Y-%m-%d").date()
+        except ValueError:
+            raise ValidationError({name: "Invalid date format. Use YYYY-MM-DD."})
+
+    def get(self, request):
+        params = request.query_params
+        fmt = tabular.output_format(request)
+        if fmt is None:
+            raise ValidationError({"output": "Must be csv or ndjson."})
+        start, end = self.parse_date(params, 'start'), self.parse_date(params, 'end')
+        if start and end and end < start:
+            raise ValidationError({"detail": "end cannot be earlier than start."})
+        shop_id = params.get('shop_id')
+        if shop_id and not shop_id.isdigit():
+            # checked up front: once rows are streaming, errors can't become a 400
+            raise ValidationError({"shop_id": "Must be a shop id."})
+        start_dt = sales.day_bounds(start, start)[0] if start else None
+        end_dt = sales.day_bounds(end, end)[1] if end else None
+
+        queryset = _scope_staff_orders(Order.objects.all(), get_principal(request), params)
+        rows = order_export.export_rows(queryset, start_dt, end_dt)
+        return tabular.streaming_response(fmt, order_export.COLUMNS, rows, 'orders')
+
+
+def _staff_shop_ids(principal, params):
+    """Shop ids a staff order listing is restricted to (empty = every shop)."""
+    shop_ids = set()
+    # Shop managers only see orders from their shop
+    if principal.managed_shop_id:
+        shop_ids.add(principal.managed_shop_id)
+
+    # Filter by shop_id if provided (for super admin)
+    shop_id = params.get('shop_id')
+    if shop_id:
+        if not shop_id.isdigit():
+            raise ValidationError({"shop_id": "Must be a shop id."})
+        shop_ids.add(int(shop_id))
+    return shop_ids
+
+
+def _scope_staff_orders(queryset, principal, params):
+    for shop_id in _staff_shop_ids(principal, params):
+        queryset = queryset.filter(shop_id=shop_id)
+
+    # Filter by status if provided
+    status_filter = params.get('status')
+    if status_filter:
+        queryset = queryset.filter(status=status_filter)
+
+    return queryset
 
 
 class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -430,25 +626,17 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = 'order_id'
 
     def get_queryset(self):
-        queryset = Order.objects.all().select_related('shop').prefetch_related(
-            'items__food_item',
-            'items__electronics_item',
-            'items__grocery_item'
-        )
-        try:
-            profile = self.request.user.userprofile
-            role = profile.role
-            # Shop managers can only see orders from their shop
-            if profile.is_shop_manager and profile.shop:
-                queryset = queryset.filter(shop=profile.shop)
-            elif role in [UserProfile.ROLE_SUPER_ADMIN, UserProfile.ROLE_EMPLOYEE, UserProfile.ROLE_COOK]:
-                # Super admin and staff can see all orders
-                pass
-            else:
-                # Students can only see their own orders
-                queryset = queryset.filter(user=self.request.user)
-        except UserProfile.DoesNotExist:
-            queryset = queryset.filter(user=self.request.user)
+        queryset = Order.objects.all().select_related('shop').prefetch_related(order_items_prefetch())
+        principal = get_principal(self.request)
+        # Shop managers can only see orders from their shop
+        if principal.managed_shop_id:
+            queryset = queryset.filter(shop_id=principal.managed_shop_id)
+        elif principal.role in [UserProfile.ROLE_SUPER_ADMIN, UserProfile.ROLE_EMPLOYEE, UserProfile.ROLE_COOK]:
+            # Super admin and staff can see all orders
+            pass
+        else:
+            # Students can only see their own orders
+            queryset = queryset.filter(user_id=principal.user_id)
         return queryset
 
     def get_serializer_class(self):
@@ -458,18 +646,18 @@ class OrderDetailView(generics.RetrieveUpdateDestroyAPIView):
 
     def perform_update(self, serializer):
         validated_data = dict(serializer.validated_data)
-        try:
-            role = self.request.user.userprofile.role
-        except UserProfile.DoesNotExist:
-            role = None
-        if 'status' in validated_data and role not in [
-            UserProfile.ROLE_SUPER_ADMIN,
-            UserProfile.ROLE_SHOP_MANAGER,
-            UserProfile.ROLE_EMPLOYEE,
-            UserProfile.ROLE_COOK
-        ]:
+        if 'status' in validated_data and not get_principal(self.request).is_staff:
             raise PermissionDenied("You do not have permission to update order status.")
-        serializer.save()
+        previous_status = serializer.instance.status
+        order = serializer.save()
+        if order.status != previous_status:
+            events.publish_order_status(order)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # before the delete cascades to the lines the reservation is read from
+        inventory.release_order(instance.pk)
+        instance.delete()
 
 
 
@@ -492,9 +680,171 @@ class OrderStatusView(generics.RetrieveAPIView):
             user=self.request.user
         )
 
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _stream_token(request):
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):]
+    # EventSource cannot send headers, so browsers pass the access token in the query string
+    return request.GET.get('token')
+
+
+async def _authenticate_stream(request):
+    """
+    Return (user, None) for a valid access token, or (None, error response).
+    Also sets request.user and the request's principal.
+    """
+    raw_token = _stream_token(request)
+    if not raw_token:
+        return None, JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+    authentication = PrincipalJWTAuthentication()
+    try:
+        token = authentication.get_validated_token(raw_token)
+        user = await sync_to_async(authentication.get_user)(token)
+        principal = await sync_to_async(authentication.get_principal)(user, token)
+    except AuthenticationFailed as exc:
+        return None, JsonResponse({"detail": str(exc.detail)}, status=401)
+    request.user = user
+    set_principal(request, principal)
+    return user, None
+
+
+def _event_stream_response(stream):
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def _published(subscription):
+    """
+    Messages from `subscription`, or None when it has been quiet for the
+    keepalive interval. Ends when the stream's maximum lifetime is up.
+    """
+    loop = asyncio.get_running_loop()
+    keepalive = getattr(django_settings, 'ORDER_EVENTS_KEEPALIVE_SECONDS', 15)
+    deadline = loop.time() + getattr(django_settings, 'ORDER_EVENTS_MAX_STREAM_SECONDS', 300)
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            return
+        try:
+            yield await subscription.get(timeout=min(keepalive, remaining))
+        except asyncio.TimeoutError:
+            yield None
+
+
+async def order_status_events(request, order_id):
+    """
+    GET /api/orders/<order_id>/events/   (text/event-stream; needs the ASGI app)
+    → "status" events { "id": 123, "status": "PREPARING" }: the current status
+      first, then each change as it happens, until the order is delivered.
+    """
+    user, error = await _authenticate_stream(request)
+    if error is not None:
+        return error
+
+    # subscribe before reading the status so a change made in between is not lost
+    subscription = events.subscribe(events.order_channel(order_id))
+    order = await Order.objects.filter(id=order_id, user=user).only('id', 'status').afirst()
+    if order is None:
+        subscription.close()
+        return JsonResponse({"detail": "Not found."}, status=404)
+    return _event_stream_response(_order_status_stream(order, subscription))
+
+
+async def _order_status_stream(order, subscription):
+    status = order.status
+    try:
+        yield _sse('status', {"id": order.pk, "status": status})
+        if status == Order.STATUS_DELIVERED:
+            return
+        async for message in _published(subscription):
+            if message is None:
+                # re-read on each quiet interval, in case an event never reached this process
+                current = await Order.objects.filter(pk=order.pk).values_list('status', flat=True).afirst()
+                if current is None:
+                    return
+                if current == status:
+                    yield ": keepalive\n\n"
+                    continue
+                message = {"id": order.pk, "status": current}
+            if message['status'] != status:
+                status = message['status']
+                yield _sse('status', message)
+                if status == Order.STATUS_DELIVERED:
+                    return
+    finally:
+        subscription.close()
+
+
+async def kitchen_order_events(request):
+    """
+    GET /api/orders/manage/events/   (text/event-stream; needs the ASGI app)
+    Staff only, scoped like /api/orders/manage/ (?shop_id=, ?status=).
+    → "snapshot" with the newest matching orders, then "order.created",
+      "order.status_changed" and "order.deleted" events as they happen.
+      ?status= filters the snapshot and new orders; status changes are always
+      sent so screens can drop orders that move on.
+    """
+    _, error = await _authenticate_stream(request)
+    if error is not None:
+        return error
+    principal = get_principal(request)
+    if not IsStaffMember().has_permission(request, None):
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+    try:
+        shop_ids = _staff_shop_ids(principal, request.GET)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    channel = order_feed.shop_channel(next(iter(shop_ids))) if shop_ids else order_feed.ALL_SHOPS_CHANNEL
+    # subscribe before taking the snapshot so nothing falls between the two
+    subscription = events.subscribe(channel)
+    try:
+        snapshot = await sync_to_async(_kitchen_snapshot)(principal, request.GET)
+    except BaseException:
+        subscription.close()
+        raise
+    return _event_stream_response(
+        _kitchen_stream(snapshot, subscription, shop_ids, request.GET.get('status'))
+    )
+
+
+def _kitchen_snapshot(principal, params):
+    queryset = _scope_staff_orders(order_feed.orders_for_feed(), principal, params).order_by('-created_at', '-id')
+    return order_feed.serialize(queryset[:OrderCursorPagination.max_page_size])
+
+
+async def _kitchen_stream(snapshot, subscription, shop_ids, status_filter):
+    try:
+        yield _sse('snapshot', snapshot)
+        async for message in _published(subscription):
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            if any(message['shop_id'] != shop_id for shop_id in shop_ids):
+                continue
+            if (message['event'] == order_feed.ORDER_CREATED and status_filter
+                    and message['order']['status'] != status_filter):
+                continue
+            yield _sse(message['event'], message['order'])
+    finally:
+        subscription.close()
+
+
 class PaymentInitiateView(APIView):
+    """
+    POST /api/payments/initiate/ → start a Paystack transaction for an order.
+    Send an Idempotency-Key header so a retried request returns the original
+    payment link instead of opening a second transaction.
+    """
     permission_classes = [IsAuthenticated]
 
+    @idempotency.idempotent
     def post(self, request):
         serializer = PaymentInitiateSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
@@ -520,12 +870,10 @@ class PaymentInitiateView(APIView):
         else:
             paystack_data["channels"] = ["card"]
 
-        headers = {
-            "Authorization": f"Bearer {django_settings.PAYSTACK_SECRET_KEY}",
-            "Content-Type": "application/json",
-        }
-        response = requests.post(f"{django_settings.PAYSTACK_BASE_URL}/transaction/initialize", json=paystack_data, headers=headers)
-        resp_json = response.json()
+        try:
+            resp_json = paystack.get_client().initialize_transaction(paystack_data)
+        except PaystackError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
         if not resp_json.get("status"):
             return Response({"error": resp_json.get("message", "Paystack error")}, status=400)
         paystack_ref = resp_json["data"]["reference"]
@@ -543,6 +891,13 @@ class PaymentInitiateView(APIView):
         return Response({"payment_url": payment_url, "reference": paystack_ref})
 
 class PaymentVerifyView(APIView):
+    """
+    POST /api/payments/verify/ { reference }
+    Answers from local state once the Paystack webhook has marked the payment
+    successful; a pending or failed payment triggers a verify call to Paystack,
+    since a failed charge can still succeed later. A charge Paystack still
+    reports as in flight leaves the payment as it is (202, "pending").
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request):
@@ -553,29 +908,60 @@ class PaymentVerifyView(APIView):
             payment = Payment.objects.get(paystack_reference=reference, user=request.user)
         except Payment.DoesNotExist:
             return Response({"error": "Payment not found."}, status=404)
-        headers = {
-            "Authorization": f"Bearer {django_settings.PAYSTACK_SECRET_KEY}",
-        }
-        verify_url = f"{django_settings.PAYSTACK_BASE_URL}/transaction/verify/{reference}"
-        resp = requests.get(verify_url, headers=headers)
-        resp_json = resp.json()
-        if resp_json.get("status") and resp_json["data"]["status"] == "success":
-            payment.status = "success"
-            payment.save()
-            payment.order.status = Order.STATUS_RECEIVED  # or update as needed
-            payment.order.save()
-            return Response({"status": "success"})
+
+        if payment.status != "success":
+            try:
+                resp_json = paystack.get_client().verify_transaction(reference)
+            except PaystackError as exc:
+                # Leave the payment as it is; the client can retry verification later
+                return Response({"error": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            data = resp_json.get("data") if resp_json.get("status") else None
+            new_status = payments.transaction_status(payment, data) if isinstance(data, dict) else "failed"
+            if new_status is not None:
+                with transaction.atomic():
+                    payment = Payment.objects.select_for_update().get(pk=payment.pk)
+                    payments.apply_status(payment, new_status)
+            message = resp_json.get("message", "Payment failed.")
         else:
-            payment.status = "failed"
-            payment.save()
-            return Response({"status": "failed", "message": resp_json.get("message", "Payment failed.")}, status=400)
+            message = "Payment failed."
+
+        if payment.status == "success":
+            return Response({"status": "success"})
+        if payment.status == "pending":
+            return Response({"status": "pending", "message": message}, status=status.HTTP_202_ACCEPTED)
+        return Response({"status": "failed", "message": message}, status=400)
+
+
+class PaystackWebhookView(APIView):
+    """
+    POST /api/payments/webhook/
+    Paystack event callback, authenticated by the X-Paystack-Signature HMAC.
+    Each event is applied once; redeliveries are acknowledged and ignored.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        body = request.body
+        if not payments.verify_signature(body, request.headers.get("X-Paystack-Signature", "")):
+            return Response({"error": "Invalid signature."}, status=status.HTTP_401_UNAUTHORIZED)
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return Response({"error": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST)
+        if not isinstance(payload, dict) or not isinstance(payload.get("data") or {}, dict):
+            return Response({"error": "Expected a JSON object with an object 'data'."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        payments.process_event(payload)
+        return Response({"status": "ok"})
 
 
 class DashboardSummaryView(APIView):
     """
     GET /api/dashboard/summary/?start_date=YYYY-MM-DD&end_date=YYYY-MM-DD
-    Returns total sales and top-performing menu items within the date range.
+    Returns total sales and top-performing items within the date range.
     Defaults to the current day if no dates are supplied.
+    Days before today are answered from the DailyShopSales/DailyItemSales rollups.
     """
 
     permission_classes = [IsAuthenticated, IsSuperAdmin]
@@ -584,7 +970,6 @@ class DashboardSummaryView(APIView):
         start_date_str = request.query_params.get('start_date')
         end_date_str = request.query_params.get('end_date')
 
-        current_tz = timezone.get_current_timezone()
         today = timezone.localdate()
 
         if start_date_str:
@@ -606,54 +991,14 @@ class DashboardSummaryView(APIView):
         if end_date < start_date:
             raise ValidationError({"detail": "end_date cannot be earlier than start_date."})
 
-        start_dt = timezone.make_aware(datetime.combine(start_date, time.min), current_tz)
-        end_dt = timezone.make_aware(datetime.combine(end_date, time.max), current_tz)
-
-        orders = (
-            Order.objects.filter(
-                created_at__range=(start_dt, end_dt),
-                payments__status="success",
-                status=Order.STATUS_DELIVERED,
-            ).distinct()
-        )
-
-        totals = orders.aggregate(
-            total_sales=Sum('total_price'),
-            average_order_value=Avg('total_price'),
-        )
-
-        total_sales = totals.get('total_sales') or 0
-        average_order_value = totals.get('average_order_value') or 0
-        total_orders = orders.count()
-
-        top_items_queryset = (
-            OrderItem.objects.filter(order__in=orders)
-            .values('food_item__id', 'food_item__name')
-            .annotate(
-                quantity_sold=Sum('quantity'),
-                revenue=Sum('price'),
-            )
-            .order_by('-quantity_sold')[:5]
-        )
-
-        top_items = [
-            {
-                "food_item_id": item['food_item__id'],
-                "name": item['food_item__name'],
-                "quantity_sold": item['quantity_sold'],
-                "revenue": item['revenue'],
-            }
-            for item in top_items_queryset
-        ]
+        # Past days come from the daily rollups; only today is queried live
+        summary = sales.summarize(start_date, end_date)
 
         return Response(
             {
                 "start_date": start_date.isoformat(),
                 "end_date": end_date.isoformat(),
-                "total_sales": total_sales,
-                "total_orders": total_orders,
-                "average_order_value": average_order_value,
-                "top_items": top_items,
+                **summary,
             }
         )
 
@@ -671,14 +1016,10 @@ class ShopListView(generics.ListAPIView):
 
     def get_queryset(self):
         # Check if user is authenticated and is staff
-        if self.request.user and self.request.user.is_authenticated:
-            try:
-                profile = self.request.user.userprofile
-                if profile.is_super_admin or profile.is_shop_manager:
-                    # Staff can see all shops (active and inactive) for management
-                    return Shop.objects.all().order_by('name')
-            except (AttributeError, UserProfile.DoesNotExist):
-                pass
+        principal = get_principal(self.request)
+        if principal.is_super_admin or principal.is_shop_manager:
+            # Staff can see all shops (active and inactive) for management
+            return Shop.objects.all().order_by('name')
         
         # Public endpoint shows only active shops
         return Shop.objects.filter(is_active=True).order_by('name')
@@ -14,6 +14,7 @@ from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -36,18 +37,46 @@ ALLOWED_HOSTS = ["*"]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "api.authentication.PrincipalJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    # token-bucket budgets for api.throttling.TokenBucketThrottle, per user or
+    # (for anonymous requests) per IP; campus Wi-Fi puts many students behind
+    # one address, so the anonymous catalog budget is generous
+    "DEFAULT_THROTTLE_RATES": {
+        "register": "20/hour",
+        "password_reset": "10/min",
+        "token": "20/min",
+        "catalog": "300/min",
+    },
+    # requests reach runserver directly, so X-Forwarded-For is never trusted;
+    # set to the number of reverse proxies in front of the app otherwise
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", 0)),
 }
 
+if os.getenv("THROTTLE_UNLIMITED"):
+    # target server for `manage.py loadtest --url`: every virtual user comes
+    # from one address, so the real budgets would turn the run into 429s.
+    # The throttle checks still run, they just never trip.
+    REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"] = {
+        scope: "1000000/s" for scope in REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"]
+    }
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
+    # access tokens carry the caller's role and shop (api.authentication)
+    "TOKEN_OBTAIN_SERIALIZER": "api.authentication.PrincipalTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "api.authentication.PrincipalTokenRefreshSerializer",
 }
 
+# Trust the role/shop claims in access tokens instead of reading UserProfile on
+# every request. Off: demoting staff or moving them to another shop must take
+# effect at once, not when their access token expires (ACCESS_TOKEN_LIFETIME)
+PRINCIPAL_TOKEN_CLAIMS = False
+
 
 # Application definition
 
@@ -105,6 +134,53 @@ DATABASES = {
     }
 }
 
+# The api app has two parallel 0010 migrations that both create api_shop (see
+# load_sample_data.sh), so test databases are built straight from the models.
+if len(sys.argv) > 1 and sys.argv[1] == "test":
+    MIGRATION_MODULES = {"api": None}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Seconds a rendered catalog payload stays cached (entries are also
+# invalidated whenever a shop or item changes)
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Seconds each process keeps its shop id → catalog type map (api.shop_registry)
+SHOP_REGISTRY_TTL = 60
+# ...and reloads it for an id it hasn't seen at most this often
+SHOP_REGISTRY_MISS_RELOAD_SECONDS = 1
+
+# Order status streams (/api/orders/<id>/events/). The in-process backend only
+# reaches clients connected to the same worker process.
+ORDER_EVENTS_BACKEND = "api.events.InProcessBackend"
+ORDER_EVENTS_POLL_SECONDS = 1
+# Seconds OrderEvent rows are kept (api.events.DatabaseBackend)
+ORDER_EVENTS_RETENTION_SECONDS = 5 * 60
+# Streams also re-read the order on each quiet interval of this length
+ORDER_EVENTS_KEEPALIVE_SECONDS = 15
+# Streams are closed after this long; EventSource clients reconnect on their own
+ORDER_EVENTS_MAX_STREAM_SECONDS = 300
+
+# Seconds a POST response stays replayable for retries sent with the same
+# Idempotency-Key header; `manage.py purge_idempotency_keys` removes older ones
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# Seconds before the in-process catalog search index (used when the database
+# isn't PostgreSQL) is rebuilt to pick up changes made by other processes
+CATALOG_SEARCH_TTL = 60
+
+# Where throttle buckets live: MemoryStore is per process, DatabaseStore is
+# shared by every worker (use it whenever more than one process serves the API)
+THROTTLE_STORE = "api.throttling.MemoryStore"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -161,10 +237,25 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD =  os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 
+# Outbox retry policy for queued emails (see api/outbox.py)
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = 30
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = 60 * 60
+# how long a worker may hold a claimed message before another can retry it
+EMAIL_OUTBOX_LEASE_SECONDS = 5 * 60
+
 # Paystack integration settings
 PAYSTACK_SECRET_KEY = os.getenv('PAYSTACK_SECRET_KEY')
 PAYSTACK_PUBLIC_KEY = os.getenv('PAYSTACK_PUBLIC_KEY')
-PAYSTACK_BASE_URL = "https://api.paystack.co"
+PAYSTACK_BASE_URL = os.getenv('PAYSTACK_BASE_URL', "https://api.paystack.co")
+# (connect, read) timeouts in seconds for every Paystack call
+PAYSTACK_TIMEOUT = (3.05, 10)
+# Retries for the idempotent verify call on connection errors and 502/503/504
+PAYSTACK_VERIFY_RETRIES = 2
+PAYSTACK_POOL_SIZE = 10
+# Stop calling Paystack for a while after this many consecutive failures
+PAYSTACK_CIRCUIT_FAILURE_THRESHOLD = 5
+PAYSTACK_CIRCUIT_RESET_SECONDS = 30
 
 # Frontend URL for local development
 FRONTEND_URL = "http://localhost:3000"
\ No newline at end of file
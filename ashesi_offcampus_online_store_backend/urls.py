@@ -1,14 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
-from api.views import CreateUserView, VerifyEmail
+from api.views import CreateUserView, ThrottledTokenObtainPairView, VerifyEmail
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/user/register/", CreateUserView.as_view(), name="register"),
     path('api/email-verify/',      VerifyEmail.as_view(),  name='email-verify'),
-    path("api/token/", TokenObtainPairView.as_view(), name="get_token"),
+    path("api/token/", ThrottledTokenObtainPairView.as_view(), name="get_token"),
     path("api/token/refresh/", TokenRefreshView.as_view(), name="refresh"),
     path("api-auth/", include("rest_framework.urls")),
     path("api/", include("api.urls")),
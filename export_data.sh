@@ -5,29 +5,10 @@
 
 echo "🔄 Exporting database data to fixtures..."
 
-# Create fixtures directory if it doesn't exist
-mkdir -p fixtures
-
-# Export Shops (core data)
-echo "  → Exporting Shops..."
-python manage.py dumpdata api.Shop --indent 2 > fixtures/shops.json
-
-# Export Food Items
-echo "  → Exporting Food Items..."
-python manage.py dumpdata api.FoodItems --indent 2 > fixtures/food_items.json
-
-# Export Electronics Items
-echo "  → Exporting Electronics Items..."
-python manage.py dumpdata api.ElectronicsItems --indent 2 > fixtures/electronics_items.json
-
-# Export Grocery Items
-echo "  → Exporting Grocery Items..."
-python manage.py dumpdata api.GroceryItems --indent 2 > fixtures/grocery_items.json
-
-# Optional: Export sample orders (comment out if you don't want to share order history)
-# echo "  → Exporting Orders..."
-# python manage.py dumpdata api.Order --indent 2 > fixtures/orders.json
-# python manage.py dumpdata api.OrderItem --indent 2 > fixtures/order_items.json
+# Shops and catalog items (food, electronics and groceries share one table),
+# in one process; files whose content hasn't changed are left untouched
+echo "  → Exporting Shops and Catalog Items..."
+python manage.py sync_fixtures export || exit 1
 
 echo ""
 echo "✅ Export complete! Fixture files created in ./fixtures/"
@@ -35,5 +16,5 @@ echo ""
 echo "Files created:"
 ls -la fixtures/
 echo ""
-echo "⚠️  Note: User data and payments were NOT exported for security reasons."
-echo "    To include them, uncomment the relevant lines in this script."
+echo "⚠️  Note: User data, orders and payments are NOT exported for security reasons."
+echo "    For realistic volumes of those, use: python manage.py sync_fixtures generate"
@@ -45,22 +45,9 @@ if ! python manage.py migrate 2>&1; then
 fi
 
 echo ""
-echo "  → Loading Shops..."
-python manage.py loaddata fixtures/shops.json
-
-echo "  → Loading Food Items..."
-python manage.py loaddata fixtures/food_items.json
-
-echo "  → Loading Electronics Items..."
-python manage.py loaddata fixtures/electronics_items.json
-
-echo "  → Loading Grocery Items..."
-python manage.py loaddata fixtures/grocery_items.json
-
-# Uncomment if you exported orders
-# echo "  → Loading Orders..."
-# python manage.py loaddata fixtures/orders.json
-# python manage.py loaddata fixtures/order_items.json
+echo "  → Loading Shops and Catalog Items (food, electronics, groceries)..."
+# one process, bulk upserts; files unchanged since the last load are skipped
+python manage.py sync_fixtures import || exit 1
 
 echo ""
 echo "✅ Sample data loaded successfully!"